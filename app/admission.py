@@ -0,0 +1,249 @@
+"""Admission control in front of the LLM endpoints.
+
+Two layers:
+
+- Rate limiting: a token bucket per client IP and per chat session, per
+  scope ("chat", "intent"). Checked as a route dependency, before any DB
+  or LLM work (a chat turn with an Idempotency-Key right after its key is
+  claimed, so replays are free); an empty bucket is a 429 with Retry-After. Buckets live in
+  worker memory (RATE_LIMIT_BACKEND=memory) or in a small SQLite file that
+  every worker on the host shares (RATE_LIMIT_BACKEND=sqlite).
+- Concurrency: AdmissionGate caps in-flight LLM calls per worker and lets
+  only LLM_MAX_WAITING callers queue, each for at most LLM_MAX_WAIT_SECONDS.
+  Past that, Overloaded is raised and turned into a 503 with Retry-After.
+"""
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, Request
+
+from .metrics import ADMISSION_REJECTIONS, LLM_QUEUE_WAIT, LLM_QUEUE_DEPTH
+from .idempotency import IDEMPOTENCY_HEADER
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Settings
+# ------------------------------
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")   # "memory" or "sqlite"
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "/tmp/barbershop_ratelimit.db")
+RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMITS_PER_MINUTE = {
+    "chat": float(os.getenv("RATE_LIMIT_CHAT_PER_MINUTE", "20")),
+    "intent": float(os.getenv("RATE_LIMIT_INTENT_PER_MINUTE", "60")),
+}
+# Only behind a proxy that sets it; otherwise clients could pick their own IP
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "false").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+LLM_MAX_WAITING = int(os.getenv("LLM_MAX_WAITING", "128"))
+LLM_MAX_WAIT_SECONDS = float(os.getenv("LLM_MAX_WAIT_SECONDS", "10"))
+
+
+class Overloaded(Exception):
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ------------------------------
+# Token buckets
+# ------------------------------
+class MemoryBuckets:
+    """Buckets in this worker's memory; the least recently used are dropped."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        """Take one token: 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / rate
+
+
+_TAKE_SQL = """
+INSERT INTO buckets (key, tokens, updated) VALUES (:key, :capacity - 1, :now)
+ON CONFLICT(key) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + (:now - updated) * :rate) - 1,
+    updated = :now
+WHERE MIN(:capacity, tokens + (:now - updated) * :rate) >= 1
+"""
+
+
+class SQLiteBuckets:
+    """Buckets in a local SQLite file shared by every worker on the host.
+
+    One conditional upsert per check: it refills and takes a token only if
+    one is there, so concurrent workers can't overdraw a bucket.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._calls = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=0.05, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")   # losing a bucket on power loss is fine
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets "
+                "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def _take(self, key: str, capacity: float, rate: float) -> float:
+        conn = self._conn()
+        now = time.time()
+        params = {"key": key, "capacity": capacity, "rate": rate, "now": now}
+        if conn.execute(_TAKE_SQL, params).rowcount == 1:
+            self._calls += 1
+            if self._calls % 1000 == 0:
+                # Full buckets carry no state; drop them
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - capacity / rate,))
+            return 0.0
+        tokens, updated = conn.execute(
+            "SELECT tokens, updated FROM buckets WHERE key = ?", (key,)
+        ).fetchone()
+        return (1 - min(capacity, tokens + (now - updated) * rate)) / rate
+
+    async def take(self, key: str, capacity: float, rate: float) -> float:
+        try:
+            return await asyncio.to_thread(self._take, key, capacity, rate)
+        except sqlite3.Error as e:
+            # Fail open: a locked limiter file must not take the site down
+            logger.warning(f"⚠️ Rate limiter unavailable: {e}")
+            return 0.0
+
+
+def make_buckets():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SQLiteBuckets()
+    return MemoryBuckets()
+
+
+buckets = make_buckets()
+
+
+# ------------------------------
+# Rate limit dependency
+# ------------------------------
+def client_ip(request: Request) -> str:
+    if TRUST_FORWARDED_FOR and (forwarded := request.headers.get("x-forwarded-for")):
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _session_id(request: Request):
+    try:
+        body = await request.json()
+    except Exception:
+        return None
+    return body.get("session_id") if isinstance(body, dict) else None
+
+
+def rate_limited(scope: str, replayable: bool = False):
+    """Route dependency: 429 when the caller's IP or chat session is over its rate.
+
+    On `replayable` routes a request with an Idempotency-Key is charged by
+    idempotency.begin() once it owns the key: retries that get the stored
+    response (or wait for it) don't use up the client's budget.
+    """
+    per_minute = RATE_LIMITS_PER_MINUTE[scope]
+
+    async def charge(request: Request):
+        rate = per_minute / 60
+        keys = [f"{scope}:ip:{client_ip(request)}"]
+        if session_id := await _session_id(request):
+            keys.append(f"{scope}:session:{session_id}")
+        for key in keys:
+            wait = await buckets.take(key, RATE_LIMIT_BURST, rate)
+            if wait > 0:
+                ADMISSION_REJECTIONS.labels(scope, "rate_limited").inc()
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many requests, please slow down",
+                    headers={"Retry-After": str(max(1, round(wait)))},
+                )
+
+    async def dependency(request: Request):
+        if per_minute <= 0:
+            return
+        if replayable and request.headers.get(IDEMPOTENCY_HEADER):
+            request.state.rate_limit = lambda: charge(request)
+            return
+        await charge(request)
+
+    return dependency
+
+
+# ------------------------------
+# LLM concurrency gate
+# ------------------------------
+class AdmissionGate:
+    """A semaphore with a bounded, time-limited wait queue."""
+
+    def __init__(self, limit: int, max_waiting: int = LLM_MAX_WAITING,
+                 max_wait: float = LLM_MAX_WAIT_SECONDS):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+        self.waiting = 0
+        self.in_flight = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    def check(self):
+        """Fail fast if a new caller would be turned away (before starting a stream)."""
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            ADMISSION_REJECTIONS.labels("llm", "queue_full").inc()
+            raise Overloaded("queue_full", self.max_wait)
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.perf_counter()
+        if self._semaphore.locked():
+            self.check()
+            self.waiting += 1
+            LLM_QUEUE_DEPTH.inc()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                ADMISSION_REJECTIONS.labels("llm", "wait_timeout").inc()
+                raise Overloaded("wait_timeout", self.max_wait)
+            finally:
+                self.waiting -= 1
+                LLM_QUEUE_DEPTH.dec()
+        else:
+            await self._semaphore.acquire()
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - start)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+        }
@@ -0,0 +1,285 @@
+"""Availability computed from working hours minus booked intervals.
+
+Each (resource, day) gets a FreeIndex: the free intervals in minutes since
+midnight, sorted, plus a max-segment tree over their lengths. "First free
+window of N minutes at or after t" is a bisect plus one tree descent,
+O(log k) in the number of free intervals. No per-slot rows are stored.
+
+Bookings made on the legacy slot grid (no resource) count as busy on
+every resource; in turn a grid slot is hidden and can't be claimed while
+it overlaps a booking here (helpers.slot_blocked).
+
+That bridge is temporary: while the grid exists there are two sources of
+truth, and the chat still books a fixed CHAT_DEFAULT_SERVICE on a grid
+that knows no resources. Follow-up to retire the grid, in order:
+
+1. Chat books through reserve_interval() with the service it was asked
+   for, and offers start times from FreeIndex.
+2. /api/slots and the WebSocket slot snapshot and deltas are derived from
+   FreeIndex; the dashboard manages working hours instead of slot rows.
+3. The Slot table, the slot and bulk-slot endpoints, the sweeper's slot
+   cleanup and the "grid bridge" in helpers are removed, together with
+   GRID_BOOKING_MINUTES and the resource-less branch in Capacity.
+"""
+import os
+import bisect
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import Booking, Resource, Service, WorkingHours
+from .cache import aread_version, abump_versions
+from .helpers import GRID_BOOKING_MINUTES, add_booking
+
+# Granularity of offered start times (a 45-minute service can start at :00/:15/...)
+AVAILABILITY_STEP_MINUTES = int(os.getenv("AVAILABILITY_STEP_MINUTES", "15"))
+AVAILABILITY_HORIZON_DAYS = int(os.getenv("AVAILABILITY_HORIZON_DAYS", "60"))
+
+
+def to_minutes(t: time) -> int:
+    return t.hour * 60 + t.minute
+
+
+def from_minutes(m: int) -> time:
+    return time(m // 60, m % 60)
+
+
+def subtract(working: list[tuple[int, int]], busy: list[tuple[int, int]]):
+    """Working intervals minus busy ones, as sorted disjoint [start, end) pairs."""
+    # Merge overlaps first so the bisect below can't skip a long booking
+    merged: list[list[int]] = []
+    for b_start, b_end in sorted(busy):
+        if merged and b_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b_end)
+        else:
+            merged.append([b_start, b_end])
+    busy = [tuple(b) for b in merged]
+    free = []
+    for w_start, w_end in sorted(working):
+        cursor = w_start
+        i = bisect.bisect_left(busy, (w_start,)) - 1   # a booking may start before the shift
+        for b_start, b_end in busy[max(i, 0):]:
+            if b_start >= w_end:
+                break
+            if b_end <= cursor:
+                continue
+            if b_start > cursor:
+                free.append((cursor, b_start))
+            cursor = max(cursor, b_end)
+        if cursor < w_end:
+            free.append((cursor, w_end))
+    return free
+
+
+class FreeIndex:
+    """Free intervals of one resource on one day."""
+
+    def __init__(self, free: list[tuple[int, int]]):
+        self.starts = [s for s, _ in free]
+        self.ends = [e for _, e in free]
+        n = len(free)
+        self._size = 1
+        while self._size < n:
+            self._size *= 2
+        self._tree = [0] * (2 * self._size)
+        for i, (s, e) in enumerate(free):
+            self._tree[self._size + i] = e - s
+        for i in range(self._size - 1, 0, -1):
+            self._tree[i] = max(self._tree[2 * i], self._tree[2 * i + 1])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _first_fit_from(self, lo: int, minutes: int):
+        """Index of the first interval at position >= lo with length >= minutes."""
+        if lo >= len(self.starts) or self._tree[1] < minutes:
+            return None
+        # Walk up from leaf `lo`, checking right siblings, then descend
+        i = self._size + lo
+        if self._tree[i] >= minutes:
+            return lo
+        while i > 1:
+            if i % 2 == 0 and self._tree[i + 1] >= minutes:
+                i += 1
+                break
+            i //= 2
+        else:
+            return None
+        while i < self._size:
+            i = 2 * i if self._tree[2 * i] >= minutes else 2 * i + 1
+        index = i - self._size
+        return index if index < len(self.starts) else None
+
+    def first_fit(self, minutes: int, after: int = 0):
+        """Earliest start >= `after` of a free window of `minutes`, or None."""
+        k = bisect.bisect_right(self.ends, after)   # first interval ending after `after`
+        if k < len(self.starts):
+            start = max(self.starts[k], after)
+            if self.ends[k] - start >= minutes:
+                return start
+            k += 1
+        i = self._first_fit_from(k, minutes)
+        return None if i is None else self.starts[i]
+
+    def start_times(self, minutes: int, step: int = AVAILABILITY_STEP_MINUTES, after: int = 0):
+        """Every start on the `step` grid where `minutes` fit."""
+        result = []
+        for s, e in zip(self.starts, self.ends):
+            first = max(s, after)
+            first += -first % step
+            result.extend(range(first, e - minutes + 1, step))
+        return result
+
+    def fits(self, start: int, minutes: int) -> bool:
+        k = bisect.bisect_right(self.starts, start) - 1
+        return k >= 0 and self.ends[k] >= start + minutes
+
+
+# ------------------------------
+# Loading
+# ------------------------------
+class Capacity:
+    """Resources, services and a FreeIndex per (resource, day) for a date range."""
+
+    def __init__(self, resources, services, hours, bookings, day_from: date, day_to: date):
+        self.resources = {r.id: r.name for r in resources}
+        self.services = {s.name.lower(): (s.name, s.duration_minutes) for s in services}
+        shifts: dict[tuple[int, int], list] = {}
+        for h in hours:
+            shifts.setdefault((h.resource_id, h.weekday), []).append(
+                (to_minutes(h.open_time), to_minutes(h.close_time)))
+        busy: dict[tuple[int, date], list] = {}
+        for b in bookings:
+            m = to_minutes(b.time)
+            if b.resource_id is None:
+                # Grid bridge: a slot-grid booking names no chair, so it holds all of them
+                minutes = b.duration_minutes or self.services.get(
+                    (b.service or "").lower(), (None, GRID_BOOKING_MINUTES))[1]
+                for rid in self.resources:
+                    busy.setdefault((rid, b.date), []).append((m, m + minutes))
+            else:
+                busy.setdefault((b.resource_id, b.date), []).append((m, m + (b.duration_minutes or 0)))
+
+        self.day_from, self.day_to = day_from, day_to
+        self.days: dict[tuple[int, date], FreeIndex] = {}
+        day = day_from
+        while day <= day_to:
+            for rid in self.resources:
+                working = shifts.get((rid, day.weekday()))
+                if working:
+                    self.days[(rid, day)] = FreeIndex(subtract(working, busy.get((rid, day), [])))
+            day += timedelta(days=1)
+
+    def service(self, name: str):
+        """(display name, duration) or None."""
+        return self.services.get((name or "").lower())
+
+    def free_starts(self, day: date, minutes: int, resource_id: int | None = None,
+                    now: datetime | None = None):
+        """{"HH:MM": [resource ids]} for one day."""
+        after = _after_minutes(day, now)
+        result: dict[str, list[int]] = {}
+        for rid in ([resource_id] if resource_id else self.resources):
+            index = self.days.get((rid, day))
+            if index is None:
+                continue
+            for m in index.start_times(minutes, after=after):
+                result.setdefault(from_minutes(m).strftime("%H:%M"), []).append(rid)
+        return dict(sorted(result.items()))
+
+    def first_free(self, minutes: int, after: datetime, resource_id: int | None = None):
+        """(date, time, resource id) of the earliest window, or None within the range."""
+        day = max(after.date(), self.day_from)
+        while day <= self.day_to:
+            best = None
+            for rid in ([resource_id] if resource_id else self.resources):
+                index = self.days.get((rid, day))
+                if index is None:
+                    continue
+                start = index.first_fit(minutes, _after_minutes(day, after))
+                if start is not None and (best is None or start < best[0]):
+                    best = (start, rid)
+            if best:
+                return day, from_minutes(best[0]), best[1]
+            day += timedelta(days=1)
+        return None
+
+
+def _after_minutes(day: date, now: datetime | None) -> int:
+    if now is None or day > now.date():
+        return 0
+    if day < now.date():
+        return 24 * 60
+    return now.hour * 60 + now.minute + 1   # strictly in the future
+
+
+def booking_intervals_query(day_from: date, day_to: date, resource_id: int | None = None):
+    """Live bookings that take capacity: on a resource, or on the slot grid."""
+    q = select(Booking).where(
+        Booking.status != "cancelled",
+        Booking.date >= day_from,
+        Booking.date <= day_to,
+    )
+    if resource_id:
+        q = q.where(or_(Booking.resource_id == resource_id, Booking.resource_id.is_(None)))
+    return q
+
+
+async def load_capacity(db: AsyncSession, day_from: date, day_to: date,
+                        resource_id: int | None = None) -> Capacity:
+    resources = (await db.execute(select(Resource).where(Resource.active.is_(True)))).scalars().all()
+    if resource_id:
+        resources = [r for r in resources if r.id == resource_id]
+    services = (await db.execute(select(Service).where(Service.active.is_(True)))).scalars().all()
+    hours = (await db.execute(select(WorkingHours))).scalars().all()
+    bookings = (await db.execute(booking_intervals_query(day_from, day_to, resource_id))).scalars().all()
+    return Capacity(resources, services, hours, bookings, day_from, day_to)
+
+
+# ------------------------------
+# Cached horizon (rebuilt when bookings or capacity change)
+# ------------------------------
+_cached: tuple[tuple, Capacity] | None = None
+
+
+async def get_capacity(db: AsyncSession) -> Capacity:
+    """Capacity for today .. today + horizon, shared until a version bumps."""
+    global _cached
+    today = date.today()
+    key = (await aread_version(db, "bookings"), await aread_version(db, "capacity"), today)
+    if _cached is None or _cached[0] != key:
+        _cached = (key, await load_capacity(db, today, today + timedelta(days=AVAILABILITY_HORIZON_DAYS)))
+    return _cached[1]
+
+
+# ------------------------------
+# Reserving an interval
+# ------------------------------
+async def reserve_interval(db: AsyncSession, service: str, day: date, start: time,
+                           resource_id: int | None = None, **fields) -> Booking | None:
+    """Book `service` at day/start on the given resource, or on any free one.
+
+    The versions are bumped first: that UPDATE takes the write lock
+    (SQLite) or the row lock (Postgres), so concurrent reservations (here
+    or on the slot grid, see create_reservation) queue behind it and the
+    overlap check below sees every committed booking. "slots" too, since
+    grid slots overlapping the new booking are hidden from then on.
+    Returns None (nothing written) when the window is no longer free.
+    """
+    await abump_versions(db, "slots", "bookings")
+    capacity = await load_capacity(db, day, day, resource_id)
+    found = capacity.service(service)
+    if found is None:
+        await db.rollback()
+        return None
+    name, minutes = found
+    m = to_minutes(start)
+    for rid in ([resource_id] if resource_id else capacity.resources):
+        index = capacity.days.get((rid, day))
+        if index is not None and index.fits(m, minutes):
+            booking = add_booking(db, service=name, date=day, time=start,
+                                  resource_id=rid, duration_minutes=minutes, **fields)
+            await db.commit()
+            return booking
+    await db.rollback()
+    return None
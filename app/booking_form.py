@@ -0,0 +1,277 @@
+"""Deterministic booking form for the chat.
+
+Name, email, date and time are picked out of every user message with
+regexes and the date/time parsers from `database`, and kept on the chat
+session. A turn is then answered without the model when it can be:
+
+- all four fields known            -> reserve directly
+- the message only carried fields  -> ask for the next one from a template
+  (the slot picker's "I want 2025-06-01 at 10:00", a bare email, ...)
+- a requested date/time isn't free -> list the free times for that day
+
+Anything else is free text and goes to the LLM, with the collected fields
+in its system prompt.
+"""
+import os
+import re
+from collections import Counter
+from datetime import date, timedelta
+
+from .database import to_date, to_time
+from .prompt import compress_times
+
+CHAT_DEFAULT_SERVICE = os.getenv("CHAT_DEFAULT_SERVICE", "Haircut")
+
+REQUIRED_FIELDS = ("date", "time", "customer_name", "customer_email")
+
+# `expecting` value once the model has read free text (see after_model)
+MODEL = "llm"
+
+# ------------------------------
+# Extraction
+# ------------------------------
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]*\w")
+ISO_DATE_RE = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+DAY_MONTH_RE = re.compile(
+    r"\b(\d{1,2})(?:st|nd|rd|th)?(?: of)? (jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+    r"|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? (\d{1,2})(?:st|nd|rd|th)?\b",
+    re.IGNORECASE,
+)
+SLASH_DATE_RE = re.compile(r"\b(\d{1,2})/(\d{1,2})\b")        # day/month
+RELATIVE_DAY_RE = re.compile(r"\b(today|tomorrow|day after tomorrow)\b", re.IGNORECASE)
+WEEKDAY_RE = re.compile(
+    r"\b(next |this )?(monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b", re.IGNORECASE
+)
+CLOCK_RE = re.compile(r"\b([01]?\d|2[0-3]):([0-5]\d)\s*(am|pm)?\b", re.IGNORECASE)
+HOUR_RE = re.compile(r"\b(1[0-2]|0?[1-9])\s*(am|pm)\b|\bat (1\d|2[0-3]|0?[1-9])(?: ?o'?clock)?\b", re.IGNORECASE)
+NAME_RE = re.compile(
+    # "my name is john" is unambiguous; after "i'm" only a capitalised word is a name
+    r"(?i:\b(?:my name is|name is|name:|call me)\s+)([A-Za-z][a-zA-Z'-]+(?: [A-Za-z][a-zA-Z'-]+){0,2})"
+    r"|(?i:\b(?:i am|i'm|this is)\s+)([A-Z][a-zA-Z'-]+(?: [A-Z][a-zA-Z'-]+){0,2})"
+)
+BARE_NAME_RE = re.compile(r"^\s*([A-Za-z][a-zA-Z'-]+(?: [A-Za-z][a-zA-Z'-]+){0,2})\s*[.!]?\s*$")
+
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+WEEKDAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Words that carry no booking information; a message made only of these
+# plus extracted fields needs no model to understand
+FILLER = set("""
+a an and the at on in for to of by is it it's its my me i i'm i'd am im be can could would will
+want like need get have book booking reserve make please pls thanks thank you ok okay yes yeah
+sure great fine that works sounds good perfect haircut cut appointment slot time date day name
+email e-mail mail address here hi hello hey so then just also with o'clock oclock
+there anyone morning afternoon evening
+""".split())
+NOT_NAMES = {w.lower() for w in FILLER} | {
+    "free", "available", "looking", "interested", "busy", "sorry", "not", "late", "ready", "new",
+    "no", "nope", "maybe", "what", "why", "how", "which", "when", "where", "cancel", "help",
+    "price", "prices", "hours", "open", "today", "tomorrow", "next", "this",
+} | set(WEEKDAYS) | set(MONTHS)
+_WORD = re.compile(r"[a-z'@.-]+")
+
+
+def _in_future(day: date, today: date) -> date:
+    """Day/month without a year: this year, or next year if that has passed."""
+    return day if day >= today else day.replace(year=day.year + 1)
+
+
+def _extract_date(text: str, today: date):
+    if m := ISO_DATE_RE.search(text):
+        return to_date(m.group()), m.span()
+    if m := RELATIVE_DAY_RE.search(text):
+        offset = {"today": 0, "tomorrow": 1}.get(m.group(1).lower(), 2)
+        return today + timedelta(days=offset), m.span()
+    if m := WEEKDAY_RE.search(text):
+        ahead = (WEEKDAYS.index(m.group(2).lower()) - today.weekday()) % 7
+        if m.group(1) and m.group(1).lower().startswith("next") and ahead == 0:
+            ahead = 7
+        return today + timedelta(days=ahead), m.span()
+    if m := DAY_MONTH_RE.search(text):
+        day_num, month = (m.group(1), m.group(2)) if m.group(1) else (m.group(4), m.group(3))
+        try:
+            return _in_future(date(today.year, MONTHS.index(month[:3].lower()) + 1, int(day_num)), today), m.span()
+        except ValueError:
+            return None, None
+    if m := SLASH_DATE_RE.search(text):
+        try:
+            return _in_future(date(today.year, int(m.group(2)), int(m.group(1))), today), m.span()
+        except ValueError:
+            return None, None
+    return None, None
+
+
+def _to_24h(hour: int, suffix: str | None) -> int:
+    if suffix:
+        suffix = suffix.lower()
+        if suffix == "pm" and hour < 12:
+            return hour + 12
+        if suffix == "am" and hour == 12:
+            return 0
+        return hour
+    # "at 3" in a barbershop means the afternoon
+    return hour + 12 if 1 <= hour <= 7 else hour
+
+
+def _extract_time(text: str):
+    if m := CLOCK_RE.search(text):
+        hour = int(m.group(1))
+        # "3:30" reads like "at 3"; a zero-padded "03:30" is a 24h clock
+        if m.group(3) or not m.group(1).startswith("0"):
+            hour = _to_24h(hour, m.group(3))
+        return to_time(f"{hour:02d}:{m.group(2)}"), m.span()
+    if m := HOUR_RE.search(text):
+        hour = _to_24h(int(m.group(1) or m.group(3)), m.group(2))
+        return to_time(f"{hour:02d}:00"), m.span()
+    return None, None
+
+
+def _name_words(text: str):
+    """Words of a name, stopping at the first one that can't be part of it."""
+    words = []
+    for w in text.split():
+        if w.lower() in NOT_NAMES:
+            break
+        words.append(w)
+    return words
+
+
+def _titled(words) -> str:
+    return " ".join(w[:1].upper() + w[1:] for w in words)
+
+
+def extract_fields(text: str, today: date | None = None, expecting: str | None = None):
+    """Booking fields found in one message, and the spans they came from.
+
+    `expecting` is the field the assistant just asked for: a bare "John
+    Smith" is only taken as a name when the name was asked for.
+    """
+    today = today or date.today()
+    found, spans = {}, []
+    if m := EMAIL_RE.search(text):
+        found["customer_email"] = m.group()
+        spans.append(m.span())
+    day, span = _extract_date(text, today)
+    if day:
+        found["date"] = day.isoformat()
+        spans.append(span)
+    t, span = _extract_time(text)
+    if t:
+        found["time"] = t.strftime("%H:%M")
+        spans.append(span)
+    m = NAME_RE.search(text)
+    if m and (words := _name_words(m.group(1) or m.group(2))):
+        found["customer_name"] = _titled(words)
+        spans.append(m.span())
+    elif expecting == "customer_name" and not spans and (m := BARE_NAME_RE.match(text)):
+        words = _name_words(m.group(1))
+        if words and len(words) == len(m.group(1).split()):
+            found["customer_name"] = _titled(words)
+            spans.append(m.span(1))
+    return found, spans
+
+
+def only_form_data(text: str, spans) -> bool:
+    """True when nothing but extracted fields and filler words is left."""
+    rest = text
+    for start, end in sorted(spans, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    words = _WORD.findall(rest.lower())
+    return all(w.strip(".'-") in FILLER or not w.strip(".'-") for w in words)
+
+
+# ------------------------------
+# Turn planning
+# ------------------------------
+QUESTIONS = {
+    "date": "Which day would you like to come in?",
+    "time": "What time suits you on {date}? Free times: {times}.",
+    "customer_name": "Great! What name should I put the booking under?",
+    "customer_email": "Thanks{name}! What email should I send the confirmation to?",
+}
+
+
+def _free_times_reply(day: str, slots: dict[str, list[str]]) -> str:
+    times = slots.get(day)
+    if times:
+        return f"Free times on {day}: {compress_times(times)}."
+    upcoming = sorted(d for d in slots if d > day)
+    if upcoming:
+        return f"Sorry, nothing is free on {day}. The next free day is {upcoming[0]} ({compress_times(slots[upcoming[0]])})."
+    return f"Sorry, nothing is free on {day}."
+
+
+def plan_turn(form: dict, message: str, slots: dict[str, list[str]],
+              expecting: str | None = None, today: date | None = None):
+    """Decide a chat turn locally.
+
+    Returns (action, fields, reply) where action is "reserve", "ask" or
+    "llm". `fields` is the updated form in every case; `reply` is set for
+    "ask". `expecting` is the field the last reply asked for, or MODEL.
+    """
+    found, spans = extract_fields(message, today, expecting)
+    fields = {**form, **found}
+
+    # A date/time that isn't free is answered from the snapshot, not the model
+    if "date" in fields and (found.keys() & {"date", "time"}):
+        day_times = slots.get(fields["date"], [])
+        if "time" in fields and fields["time"] not in day_times:
+            reply = f"Sorry, {fields['date']} at {fields['time']} isn't available. " + \
+                _free_times_reply(fields["date"], slots)
+            fields.pop("time")
+            return "ask", fields, reply
+        if not day_times:
+            reply = _free_times_reply(fields.pop("date"), slots)
+            return "ask", fields, reply
+
+    missing = next_missing(fields)
+    if missing is None:
+        return "reserve", fields, None
+    # Emails, dates and times are caught in any message, but a name can hide
+    # in free text the model has already read ("it's Fatima here")
+    if expecting == MODEL and missing == "customer_name":
+        return "llm", fields, None
+    if found and only_form_data(message, spans):
+        return "ask", fields, question(missing, fields, slots)
+    return "llm", fields, None
+
+
+def after_model(message: str, expecting: str | None = None, today: date | None = None):
+    """`expecting` once the model has answered `message`.
+
+    MODEL when the message had free text the model may have read a name in.
+    A bare greeting ("hi", "good morning") can't carry one, so `expecting`
+    is kept and the next form-only turn is still answered locally.
+    """
+    _, spans = extract_fields(message, today, expecting)
+    return expecting if only_form_data(message, spans) else MODEL
+
+
+def next_missing(fields: dict):
+    return next((f for f in REQUIRED_FIELDS if not fields.get(f)), None)
+
+
+def question(field: str, fields: dict, slots: dict[str, list[str]]) -> str:
+    name = fields.get("customer_name")
+    return QUESTIONS[field].format(
+        date=fields.get("date", ""),
+        times=compress_times(slots.get(fields.get("date", ""), [])),
+        name=f", {name.split()[0]}" if name else "",
+    )
+
+
+def booking_request(fields: dict) -> dict:
+    """Form fields in the shape reserve_booking() takes."""
+    return {"service": CHAT_DEFAULT_SERVICE, **{f: fields[f] for f in REQUIRED_FIELDS}}
+
+
+# ------------------------------
+# Counters
+# ------------------------------
+stats = Counter()
+
+
+def record(action: str):
+    """Count who answered a session turn: local "reserve"/"ask" or "llm"."""
+    stats["turns"] += 1
+    stats[action] += 1
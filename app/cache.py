@@ -0,0 +1,117 @@
+import time
+import asyncio
+import threading
+from sqlalchemy import update, select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .database import StateVersion
+
+
+# ------------------------------
+# Version counters
+# ------------------------------
+def _bump_stmt(names):
+    return (
+        update(StateVersion)
+        .where(StateVersion.name.in_(names))
+        .values(version=StateVersion.version + 1, updated_at=time.time())
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _version_stmt(name: str):
+    return select(StateVersion.version).where(StateVersion.name == name)
+
+
+def bump_versions(db: Session, *names: str):
+    """Mark datasets as changed. Call inside the write transaction, before commit."""
+    db.execute(_bump_stmt(names))
+
+
+async def abump_versions(db: AsyncSession, *names: str):
+    await db.execute(_bump_stmt(names))
+
+
+def read_version(db: Session, name: str) -> int:
+    """Current version of a dataset (single primary-key lookup)."""
+    return db.execute(_version_stmt(name)).scalar() or 0
+
+
+async def aread_version(db: AsyncSession, name: str) -> int:
+    return (await db.execute(_version_stmt(name))).scalar() or 0
+
+
+async def aread_state(db: AsyncSession, name: str) -> tuple[int, float]:
+    """(version, updated_at) in one primary-key lookup, for ETag/Last-Modified."""
+    row = (await db.execute(
+        select(StateVersion.version, StateVersion.updated_at).where(StateVersion.name == name)
+    )).first()
+    return (row[0], row[1] or 0.0) if row else (0, 0.0)
+
+
+# ------------------------------
+# Snapshot cache
+# ------------------------------
+class SnapshotCache:
+    """In-process copy of a read model, keyed on its DB version counter.
+
+    Each read costs one version lookup; the loader only runs when another
+    request (in this or any other worker) has bumped the version since the
+    snapshot was taken. Cached values are shared, so callers must not mutate
+    them.
+    """
+
+    def __init__(self, name: str, loader, aloader=None):
+        self.name = name
+        self.loader = loader
+        self.aloader = aloader
+        self._lock = threading.Lock()
+        self._alock = asyncio.Lock()
+        self._entry: tuple[int, object] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, db: Session):
+        version = read_version(db, self.name)
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        with self._lock:
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = self.loader(db)
+            self._entry = (version, value)
+            return value
+
+    async def aget(self, db: AsyncSession, version: int | None = None):
+        """Pass `version` when the caller already read it (saves a lookup)."""
+        if version is None:
+            version = await aread_version(db, self.name)
+        entry = self._entry
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+
+        async with self._alock:
+            entry = self._entry
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            value = await self.aloader(db)
+            self._entry = (version, value)
+            return value
+
+    def invalidate(self):
+        self._entry = None
+
+    @property
+    def version(self) -> int | None:
+        entry = self._entry
+        return entry[0] if entry else None
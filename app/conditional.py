@@ -0,0 +1,53 @@
+from email.utils import formatdate, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+
+# ------------------------------
+# Conditional GET (ETag / Last-Modified)
+# ------------------------------
+# Validators come from the state_versions counters, so deciding on a 304
+# costs one primary-key lookup instead of loading and serialising rows.
+def make_etag(name: str, *parts) -> str:
+    # Weak: equal versions mean equal data, not byte-identical JSON
+    return 'W/"' + "-".join([name, *map(str, parts)]) + '"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_fresh(request: Request, etag: str, last_modified: float) -> bool:
+    """True if the client's cached copy is still current."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since when both are sent
+        tags = [_opaque(t) for t in if_none_match.split(",")]
+        return "*" in tags or _opaque(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def validator_headers(etag: str, last_modified: float, private: bool = False) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        # Always revalidate; the 304 path is cheap
+        "Cache-Control": "private, no-cache" if private else "no-cache",
+    }
+
+
+def conditional_json(request: Request, content, etag: str, last_modified: float,
+                     private: bool = False) -> Response:
+    headers = validator_headers(etag, last_modified, private)
+    if is_fresh(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content, headers=headers)
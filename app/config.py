@@ -1,34 +1,16 @@
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
 load_dotenv()
 
+# Checked when the OpenAI client is first built, not at import
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("❌ Missing OPENAI_API_KEY in environment")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+def require_openai_key() -> str:
+    if not OPENAI_API_KEY:
+        raise RuntimeError("❌ Missing OPENAI_API_KEY in environment")
+    return OPENAI_API_KEY
 
-SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-FROM_EMAIL = os.getenv("FROM_EMAIL", "noreply@yourdomain.com")
-
-def send_email(to_email: str, subject: str, html_content: str):
-    if not SENDGRID_API_KEY:
-        print("⚠️ Missing SENDGRID_API_KEY")
-        return
-    message = Mail(
-        from_email=FROM_EMAIL,
-        to_emails=to_email,
-        subject=subject,
-        html_content=html_content,
-    )
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"📧 Email sent to {to_email}, status {response.status_code}")
-    except Exception as e:
-        print(f"❌ Email error: {e}")
+# The OpenAI client itself lives in app/llm.py
+# Outgoing email goes through the outbox (app/outbox.py, app/email_utils.py)
@@ -1,26 +1,59 @@
 import os
+import time
+import logging
+from contextlib import contextmanager
 from datetime import datetime, date as DateType, time as TimeType
 from sqlalchemy import (
-    create_engine, Column, String, Integer, Boolean,
-    inspect, text, Date, Time, UniqueConstraint
+    create_engine, Column, String, Integer, Boolean, Float,
+    inspect, text, Text, Date, Time, UniqueConstraint, Index, insert, select, update
 )
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 
+logger = logging.getLogger(__name__)
+
 # ------------------------------
 # Database URL (Postgres recommended, fallback SQLite)
 # ------------------------------
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./barbershop.db")
 
+# Pool tuning (ignored for SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+def async_database_url(url: str) -> str:
+    """Map a sync URL onto its async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
 if DATABASE_URL.startswith("sqlite"):
     engine = create_engine(
         DATABASE_URL, connect_args={"check_same_thread": False}
     )
+    async_engine = create_async_engine(async_database_url(DATABASE_URL))
 else:
     # Works with postgresql://... from Supabase, Neon, Render, etc.
-    engine = create_engine(DATABASE_URL)
+    pool_options = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    engine = create_engine(DATABASE_URL, **pool_options)
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_options)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # ------------------------------
@@ -37,6 +70,49 @@ class Booking(Base):
     time = Column(Time)     # ✅ Proper TIME type
     status = Column(String, default="pending")  # pending / paid / cancelled
     created_at = Column(String, default=lambda: datetime.utcnow().isoformat())
+    # Capacity model (NULL for bookings made against the legacy slot grid)
+    resource_id = Column(Integer)
+    duration_minutes = Column(Integer)
+
+    __table_args__ = (
+        # ✅ Lets the sweeper find stale pending bookings without a table scan
+        Index("ix_bookings_status_created_at", "status", "created_at"),
+        # ✅ Keyset pagination of GET /api/bookings, ordered by (date, time, id)
+        Index("ix_bookings_date_time_id", "date", "time", "id"),
+        Index("ix_bookings_status_date_time_id", "status", "date", "time", "id"),
+        Index("ix_bookings_email_date_time_id", "customer_email", "date", "time", "id"),
+        # ✅ Busy intervals of one chair for a range of days
+        Index("ix_bookings_resource_date", "resource_id", "date"),
+    )
+
+
+class Resource(Base):
+    """A bookable chair / barber."""
+    __tablename__ = "resources"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+
+
+class Service(Base):
+    __tablename__ = "services"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    name = Column(String, nullable=False, unique=True)
+    duration_minutes = Column(Integer, nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+
+
+class WorkingHours(Base):
+    """Weekly opening hours of a resource; several rows per day = split shifts."""
+    __tablename__ = "working_hours"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    resource_id = Column(Integer, nullable=False, index=True)
+    weekday = Column(Integer, nullable=False)   # 0 = Monday
+    open_time = Column(Time, nullable=False)
+    close_time = Column(Time, nullable=False)
 
 
 class Slot(Base):
@@ -47,14 +123,92 @@ class Slot(Base):
     time = Column(Time)
     available = Column(Boolean, default=True)
 
-    # ✅ Prevent duplicate slots for same date+time
+    # ✅ Prevent duplicate slots for same date+time (also serves as the
+    # (date, time) index used by the expiry sweep)
     __table_args__ = (UniqueConstraint("date", "time", name="uq_slot_datetime"),)
 
 
-# ------------------------------
-# Create tables (if not exist)
-# ------------------------------
-Base.metadata.create_all(bind=engine)
+class OutboxEmail(Base):
+    """Outgoing email, written in the same transaction as the change it reports.
+
+    The outbox worker drains due rows; `next_attempt_at` doubles as the claim
+    lease while a row is being sent.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")  # pending / sending / sent / dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float, nullable=False, default=0)  # epoch seconds
+    last_error = Column(Text)
+    created_at = Column(Float, nullable=False, default=lambda: time.time())
+    sent_at = Column(Float)
+
+    # ✅ Lets the worker find due messages without a table scan
+    __table_args__ = (Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),)
+
+
+class ScheduledJob(Base):
+    """Time-ordered job (reminder / follow-up) tied to a booking.
+
+    One row per (booking, kind) so a job can only ever be scheduled once;
+    the scheduler claims due rows with a conditional UPDATE.
+    """
+    __tablename__ = "scheduled_jobs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    booking_id = Column(String, nullable=False, index=True)
+    kind = Column(String, nullable=False)       # reminder_24h / reminder_2h / follow_up
+    run_at = Column(Float, nullable=False)      # epoch seconds
+    status = Column(String, nullable=False, default="pending")  # pending / done / skipped / cancelled
+
+    __table_args__ = (
+        UniqueConstraint("booking_id", "kind", name="uq_job_booking_kind"),
+        # ✅ Each tick reads only the due head of this index
+        Index("ix_scheduled_jobs_status_run_at", "status", "run_at"),
+    )
+
+
+class IdempotencyKey(Base):
+    """Outcome of a request made with an Idempotency-Key header.
+
+    The first request inserts the row (primary key = scope:key) and owns
+    it; retries wait for it to finish and replay the stored response.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)    # hash of scope + body
+    status = Column(String, nullable=False, default="in_progress")  # in_progress / done
+    status_code = Column(Integer)
+    response = Column(Text)                         # JSON body
+    created_at = Column(Float, nullable=False, index=True)   # claim / completion time
+
+
+class ChatSessionRecord(Base):
+    """A chat session (sessions.py) as JSON, readable by every worker."""
+    __tablename__ = "chat_sessions"
+
+    id = Column(String, primary_key=True)
+    state = Column(Text, nullable=False)
+    updated_at = Column(Float, nullable=False, index=True)   # for expiry
+
+
+class StateVersion(Base):
+    """Monotonic per-dataset counter, bumped in every write transaction.
+
+    Workers compare it against their in-memory snapshot to know when the
+    cached slots/bookings are out of date; the API turns it into an ETag.
+    """
+    __tablename__ = "state_versions"
+
+    name = Column(String, primary_key=True)   # "slots" / "bookings" / "capacity" / "schema"
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(Float, nullable=False, default=0)  # epoch seconds, for Last-Modified
+
 
 # ------------------------------
 # Helpers for safe parsing
@@ -91,12 +245,12 @@ def to_time(v):
             return datetime.strptime(text_v, "%H:%M:%S").time()
         return datetime.fromisoformat(f"2000-01-01T{text_v}").time()
     except Exception as e:
-        print(f"to_time parse error for {v}: {e}")
+        logger.warning(f"to_time parse error for {v}: {e}")
         return None
 
 
 # ------------------------------
-# SQLite-only migration helper
+# Migration steps (run by migrate(), never at import)
 # ------------------------------
 def ensure_created_at_column():
     if DATABASE_URL.startswith("sqlite"):
@@ -107,7 +261,132 @@ def ensure_created_at_column():
                 conn.execute(text("ALTER TABLE bookings ADD COLUMN created_at VARCHAR"))
                 conn.commit()
 
-ensure_created_at_column()
+
+def ensure_capacity_columns():
+    # create_all() doesn't add columns to an existing bookings table
+    cols = [c["name"] for c in inspect(engine).get_columns("bookings")]
+    with engine.connect() as conn:
+        for name in ("resource_id", "duration_minutes"):
+            if name not in cols:
+                conn.execute(text(f"ALTER TABLE bookings ADD COLUMN {name} INTEGER"))
+        conn.commit()
+
+
+# ------------------------------
+# Indexes added after the tables already existed
+# ------------------------------
+def ensure_indexes():
+    # create_all() only builds indexes for brand new tables
+    with engine.connect() as conn:
+        for index in Booking.__table__.indexes:
+            if index.name and index.name.startswith("ix_bookings_") and len(index.columns) > 1:
+                cols = ", ".join(c.name for c in index.columns)
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON bookings ({cols})"))
+        conn.commit()
+
+
+# ------------------------------
+# Seed version counters
+# ------------------------------
+STATE_NAMES = ("slots", "bookings", "capacity")
+
+def ensure_state_versions():
+    cols = [c["name"] for c in inspect(engine).get_columns("state_versions")]
+    if "updated_at" not in cols:
+        with engine.connect() as conn:
+            conn.execute(text("ALTER TABLE state_versions ADD COLUMN updated_at FLOAT DEFAULT 0"))
+            conn.commit()
+
+    db = SessionLocal()
+    try:
+        existing = {name for (name,) in db.query(StateVersion.name).all()}
+        for name in STATE_NAMES:
+            if name not in existing:
+                db.add(StateVersion(name=name, version=0, updated_at=time.time()))
+        db.commit()
+    except Exception:
+        # Another worker seeded the rows first
+        db.rollback()
+    finally:
+        db.close()
+
+
+# ------------------------------
+# Migrate: python -m app.migrate (or MIGRATE_ON_STARTUP)
+# ------------------------------
+# Bump when a table or an ensure_* step is added; a database at this revision is skipped
+SCHEMA_REVISION = 2   # 2: chat_sessions
+SCHEMA_STATE_NAME = "schema"   # state_versions row holding the applied revision
+_MIGRATION_LOCK_ID = 7_024_025  # pg_advisory_lock key
+
+
+def schema_revision():
+    """Revision recorded by the last migrate(), or None for a fresh/old database."""
+    try:
+        with engine.connect() as conn:
+            return conn.execute(
+                select(StateVersion.version).where(StateVersion.name == SCHEMA_STATE_NAME)
+            ).scalar()
+    except (OperationalError, ProgrammingError):
+        return None   # no state_versions table yet
+
+
+def schema_is_current() -> bool:
+    revision = schema_revision()
+    return revision is not None and revision >= SCHEMA_REVISION
+
+
+@contextmanager
+def _migration_lock():
+    """Serialize migrations across processes (Postgres); SQLite serializes DDL itself."""
+    if DATABASE_URL.startswith("sqlite"):
+        yield
+        return
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": _MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": _MIGRATION_LOCK_ID})
+
+
+def migrate(force: bool = False) -> bool:
+    """Create tables, add late columns/indexes and seed counters. True if anything ran.
+
+    One SELECT when the database is already at SCHEMA_REVISION, so every
+    worker can call it on startup; only the first one does the DDL.
+    """
+    with _migration_lock():
+        if not force and schema_is_current():
+            return False
+        start = time.perf_counter()
+        for attempt in range(2):
+            try:
+                Base.metadata.create_all(bind=engine)
+                ensure_created_at_column()
+                ensure_capacity_columns()
+                ensure_indexes()
+                ensure_state_versions()
+                break
+            except (OperationalError, ProgrammingError):
+                # Another process got to a table/column first (no advisory lock on
+                # SQLite); every step checks before it acts, so one rerun settles it
+                if attempt:
+                    raise
+        with engine.begin() as conn:
+            updated = conn.execute(
+                update(StateVersion)
+                .where(StateVersion.name == SCHEMA_STATE_NAME)
+                .values(version=SCHEMA_REVISION, updated_at=time.time())
+            ).rowcount
+            if not updated:
+                conn.execute(insert(StateVersion).values(
+                    name=SCHEMA_STATE_NAME, version=SCHEMA_REVISION, updated_at=time.time()
+                ))
+    logger.info(f"🗄️ Database migrated to schema revision {SCHEMA_REVISION} "
+                f"in {time.perf_counter() - start:.2f}s")
+    return True
+
 
 # ------------------------------
 # DB dependency for FastAPI
@@ -119,3 +398,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """Async counterpart of get_db: queries don't block the event loop."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,4 +1,4 @@
-from .database import SessionLocal
+from .database import SessionLocal, get_async_db
 
 def get_db():
     db = SessionLocal()
@@ -1,42 +1,154 @@
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email
+import random
+import httpx
 
 # Load environment variables
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")  # 👈 must be verified in SendGrid (Single Sender)
+# 👈 must be verified in SendGrid (Single Sender); FROM_EMAIL is the old name
+SENDER_EMAIL = os.getenv("SENDER_EMAIL") or os.getenv("FROM_EMAIL")
 REPLY_TO_EMAIL = os.getenv("REPLY_TO_EMAIL", SENDER_EMAIL)  # default same as sender
 
+# "sendgrid" in production, "fake" for local runs and benchmarks
+EMAIL_TRANSPORT = os.getenv("EMAIL_TRANSPORT", "sendgrid")
+SENDGRID_URL = os.getenv("SENDGRID_URL", "https://api.sendgrid.com/v3/mail/send")
+EMAIL_TIMEOUT_SECONDS = float(os.getenv("EMAIL_TIMEOUT_SECONDS", "15"))
+EMAIL_FAKE_FAIL_RATE = float(os.getenv("EMAIL_FAKE_FAIL_RATE", "0"))
 
-def send_email(to_email: str, subject: str, html_content: str):
+# SendGrid accepts up to 1000 personalizations per request
+SENDGRID_MAX_RECIPIENTS = 1000
+
+
+class EmailFailure:
+    """Why one message was not sent; permanent failures are not retried."""
+
+    def __init__(self, error: str, permanent: bool = False):
+        self.error = error
+        self.permanent = permanent
+
+    def __repr__(self):
+        return f"EmailFailure({self.error!r}, permanent={self.permanent})"
+
+
+# ------------------------------
+# Templates
+# ------------------------------
+def booking_confirmation(booking):
+    """(subject, html) for a new booking."""
+    subject = "Your Barbershop Appointment Confirmation"
+    html = f"""
+    <h2>Hi {booking.customer_name},</h2>
+    <p>Your {booking.service} is booked for
+    {booking.date} at {booking.time.strftime('%H:%M')}.</p>
+    <p>We look forward to seeing you! 💈</p>
     """
-    Send an email using SendGrid.
+    return subject, html
 
-    Args:
-        to_email (str): recipient email address
-        subject (str): subject of the email
-        html_content (str): HTML content of the email
+
+def booking_reminder(booking, hours: int):
+    """(subject, html) sent `hours` before the appointment."""
+    when = "tomorrow" if hours >= 24 else f"in {hours} hours"
+    subject = f"Reminder: your {booking.service} is {when}"
+    html = f"""
+    <h2>Hi {booking.customer_name},</h2>
+    <p>Just a reminder: your {booking.service} is on
+    {booking.date} at {booking.time.strftime('%H:%M')}.</p>
+    <p>Can't make it? Reply to this email so we can free the slot. 💈</p>
+    """
+    return subject, html
+
+
+def booking_follow_up(booking):
+    """(subject, html) sent after the visit."""
+    subject = "Thanks for visiting the Barbershop"
+    html = f"""
+    <h2>Hi {booking.customer_name},</h2>
+    <p>Thanks for coming in for your {booking.service}.</p>
+    <p>Ready for the next one? Just chat with us to book again. 💈</p>
     """
-    if not SENDGRID_API_KEY:
-        raise RuntimeError("Missing SENDGRID_API_KEY in environment")
-    if not SENDER_EMAIL:
-        raise RuntimeError("Missing SENDER_EMAIL in environment")
-
-    message = Mail(
-        from_email=SENDER_EMAIL,
-        to_emails=to_email,
-        subject=subject,
-        html_content=html_content,
-    )
-
-    # 👇 Add Reply-To header
-    message.reply_to = Email(REPLY_TO_EMAIL)
-
-    try:
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        response = sg.send(message)
-        print(f"✅ Email sent to {to_email}, status {response.status_code}")
-        return response
-    except Exception as e:
-        print(f"❌ Error sending email: {e}")
-        return None
+    return subject, html
+
+
+# ------------------------------
+# Transports
+# ------------------------------
+# send_batch(messages) takes dicts with to_email/subject/html and returns
+# one entry per message: None if sent, or an EmailFailure.
+class SendGridTransport:
+    def __init__(self):
+        # One pooled client per worker instead of a new SDK client per email
+        self._client = httpx.AsyncClient(
+            timeout=EMAIL_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+
+    async def send_batch(self, messages: list[dict]):
+        if not SENDGRID_API_KEY or not SENDER_EMAIL:
+            # Retryable: the operator can fix the environment
+            return [EmailFailure("Missing SENDGRID_API_KEY or SENDER_EMAIL")] * len(messages)
+
+        # Identical subject + body go out as one request with one
+        # personalization (private recipient) per message
+        groups: dict[tuple[str, str], list[int]] = {}
+        for i, m in enumerate(messages):
+            groups.setdefault((m["subject"], m["html"]), []).append(i)
+
+        results = [None] * len(messages)
+        for (subject, html), indexes in groups.items():
+            for start in range(0, len(indexes), SENDGRID_MAX_RECIPIENTS):
+                chunk = indexes[start:start + SENDGRID_MAX_RECIPIENTS]
+                failure = await self._post(subject, html, [messages[i]["to_email"] for i in chunk])
+                for i in chunk:
+                    results[i] = failure
+        return results
+
+    async def _post(self, subject: str, html: str, recipients: list[str]):
+        payload = {
+            "personalizations": [{"to": [{"email": to}]} for to in recipients],
+            "from": {"email": SENDER_EMAIL},
+            "reply_to": {"email": REPLY_TO_EMAIL},
+            "subject": subject,
+            "content": [{"type": "text/html", "value": html}],
+        }
+        try:
+            response = await self._client.post(
+                SENDGRID_URL, json=payload,
+                headers={"Authorization": f"Bearer {SENDGRID_API_KEY}"},
+            )
+        except httpx.HTTPError as e:
+            return EmailFailure(f"{type(e).__name__}: {e}")
+        if response.status_code < 300:
+            return None
+        # 4xx (bad address, bad payload) won't succeed on retry; 429/5xx might
+        permanent = 400 <= response.status_code < 500 and response.status_code != 429
+        return EmailFailure(f"HTTP {response.status_code}: {response.text[:200]}", permanent)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class FakeTransport:
+    """Records messages instead of sending them; can fail at random."""
+
+    def __init__(self, fail_rate: float = EMAIL_FAKE_FAIL_RATE, seed: int | None = None):
+        self.fail_rate = fail_rate
+        self.sent: list[dict] = []
+        self._random = random.Random(seed)
+
+    async def send_batch(self, messages: list[dict]):
+        results = []
+        for m in messages:
+            if self._random.random() < self.fail_rate:
+                results.append(EmailFailure("fake transport failure"))
+            else:
+                self.sent.append(m)
+                results.append(None)
+        return results
+
+    async def aclose(self):
+        pass
+
+
+def make_transport():
+    if EMAIL_TRANSPORT == "fake":
+        return FakeTransport()
+    return SendGridTransport()
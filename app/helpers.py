@@ -1,63 +1,544 @@
-from datetime import datetime, timedelta
+import os
+import json
+import uuid
+import base64
+from datetime import date, datetime, time, timedelta
 from sqlalchemy.orm import Session
-from .database import Slot, Booking, to_date, to_time
-from sqlalchemy import not_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, select, update, delete, tuple_
+from .database import Slot, Booking, ScheduledJob, engine, to_date, to_time
+from .cache import SnapshotCache, bump_versions, abump_versions, aread_state
+from .email_utils import booking_confirmation
+from .outbox import enqueue_email
+from .scheduler import schedule_booking_jobs
+
+# Pending bookings older than this release their slot
+PENDING_TTL = timedelta(minutes=10)
+
+# How long a grid booking (a Slot row, no resource) holds the shop when
+# its service has no duration; the capacity model treats it as busy on
+# every resource, and a grid slot is hidden while any resource is booked.
+# Part of the temporary grid bridge below.
+GRID_BOOKING_MINUTES = int(os.getenv("GRID_BOOKING_MINUTES", "30"))
+
+
+# ------------------------------
+# Filters
+# ------------------------------
+def future_slot_filter(now: datetime | None = None):
+    """SQL condition matching slots that start strictly after `now`."""
+    now = now or datetime.now()
+    today = now.date()
+    return or_(
+        Slot.date > today,
+        and_(Slot.date == today, Slot.time > now.time()),
+    )
+
+
+def stale_booking_filter(now: datetime | None = None):
+    """SQL condition matching pending bookings past their TTL.
+
+    `created_at` is stored as an ISO string, so a string comparison against
+    the cutoff orders correctly. Rows without a timestamp count as stale.
+    """
+    now = now or datetime.utcnow()
+    cutoff = (now - PENDING_TTL).isoformat()
+    return and_(
+        Booking.status == "pending",
+        or_(Booking.created_at.is_(None), Booking.created_at < cutoff),
+    )
+
+
+# ------------------------------
+# Grid bridge (temporary): slot grid vs capacity-model bookings
+#
+# Until the grid is retired (see the follow-up in app/availability.py)
+# both models hold bookings, so each must treat the other's as busy.
+# Everything here, and the call sites marked "grid bridge", goes with it.
+# ------------------------------
+def _window(t: time, minutes: int):
+    start = t.hour * 60 + t.minute
+    return start, start + minutes
+
+
+def interval_bookings_query(day_from: date, day_to: date | None = None):
+    """(date, time, duration) of live bookings held on a resource."""
+    q = select(Booking.date, Booking.time, Booking.duration_minutes).where(
+        Booking.resource_id.isnot(None),
+        Booking.status != "cancelled",
+        Booking.date >= day_from,
+    )
+    return q if day_to is None else q.where(Booking.date <= day_to)
+
+
+def busy_windows(rows):
+    """{date: [(start, end) minutes]} from interval_bookings_query rows."""
+    busy: dict[date, list] = {}
+    for d, t, minutes in rows:
+        busy.setdefault(d, []).append(_window(t, minutes or 0))
+    return busy
+
+
+def slot_blocked(busy, d: date, t: time) -> bool:
+    start, end = _window(t, GRID_BOOKING_MINUTES)
+    return any(s < end and start < e for s, e in busy.get(d, ()))
+
+
+def _grid_slots_query(d: date):
+    return select(Slot.date, Slot.time).where(Slot.date == d, Slot.available.is_(True), future_slot_filter())
+
+
+def _overlapping(rows, d: date, t: time, minutes: int, busy=None):
+    start, end = _window(t, minutes)
+    hit = []
+    for slot_date, slot_time in rows:
+        s, e = _window(slot_time, GRID_BOOKING_MINUTES)
+        if s < end and start < e and not (busy is not None and slot_blocked(busy, slot_date, slot_time)):
+            hit.append(slot_payload(slot_date, slot_time))
+    return hit
+
+
+async def agrid_slots_overlapping(db: AsyncSession, d: date, t: time, minutes: int, free_only: bool = False):
+    """Open grid slots whose window overlaps an interval booking's.
+
+    After booking the interval they are hidden (slot_removed); after
+    cancelling it, the `free_only` ones are offered again (slot_added).
+    """
+    rows = (await db.execute(_grid_slots_query(d))).all()
+    busy = busy_windows((await db.execute(interval_bookings_query(d, d))).all()) if free_only else None
+    return _overlapping(rows, d, t, minutes, busy)
+
+
+def grid_slots_overlapping(db: Session, d: date, t: time, minutes: int, free_only: bool = False):
+    rows = db.execute(_grid_slots_query(d)).all()
+    busy = busy_windows(db.execute(interval_bookings_query(d, d)).all()) if free_only else None
+    return _overlapping(rows, d, t, minutes, busy)
+
+
+# ------------------------------
+# Wire format shared by the API and WebSocket deltas
+# ------------------------------
+def slot_payload(d, t):
+    return {"date": to_date(d).isoformat(), "time": to_time(t).strftime("%H:%M")}
+
+
+def booking_payload(b: Booking):
+    return {
+        "id": b.id,
+        "customer_name": b.customer_name,
+        "service": b.service,
+        "date": b.date.isoformat() if b.date else None,
+        "time": b.time.strftime("%H:%M") if b.time else None,
+        "status": b.status
+    }
+
+
+# ------------------------------
+# Cleanup (run by the sweeper, not by read endpoints)
+# ------------------------------
 def clean_expired_slots(db: Session):
-    now = datetime.now()
-    for s in db.query(Slot).all():
-        try:
-            slot_dt = datetime.combine(to_date(s.date), to_time(s.time))
-            if slot_dt <= now:
-                db.delete(s)
-        except Exception:
-            continue
+    """Delete every slot that has already started. Returns the removed slots."""
+    removed = db.execute(
+        delete(Slot)
+        .where(~future_slot_filter())
+        .returning(Slot.date, Slot.time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if removed:
+        bump_versions(db, "slots")
     db.commit()
+    return [slot_payload(d, t) for d, t in removed]
+
 
 def clean_stale_bookings(db: Session):
-    now = datetime.utcnow()
-    stale = db.query(Booking).filter_by(status="pending").all()
-    for b in stale:
-        try:
-            created = datetime.fromisoformat(b.created_at)
-        except Exception:
-            created = now - timedelta(hours=1)
-        if created + timedelta(minutes=10) < now:
-            slot = db.query(Slot).filter_by(date=b.date, time=b.time).first()
-            if slot:
-                slot.available = True
-            db.delete(b)
+    """Free the slots held by stale pending bookings, cancel their
+    reminders, then delete them.
+
+    Returns (freed slots, number of bookings deleted).
+    """
+    stale = stale_booking_filter()
+    stale_intervals = db.execute(
+        select(Booking.date, Booking.time, Booking.duration_minutes)
+        .where(stale, Booking.resource_id.isnot(None))
+    ).all()
+    held = (
+        select(Booking.id)
+        .where(stale, Booking.resource_id.is_(None),
+               Booking.date == Slot.date, Booking.time == Slot.time)
+        .exists()
+    )
+    freed = db.execute(
+        update(Slot)
+        .where(held)
+        .values(available=True)
+        .returning(Slot.date, Slot.time)
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.status == "pending",
+               ScheduledJob.booking_id.in_(select(Booking.id).where(stale)))
+        .values(status="cancelled")
+        .execution_options(synchronize_session=False)
+    )
+    result = db.execute(
+        delete(Booking)
+        .where(stale)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        bump_versions(db, "slots", "bookings")
     db.commit()
+    freed = [slot_payload(d, t) for d, t in freed]
+    # Grid bridge: grid slots that a deleted interval booking was hiding
+    for d, t, minutes in stale_intervals:
+        for slot in grid_slots_overlapping(db, d, t, minutes or 0, free_only=True):
+            if slot not in freed:
+                freed.append(slot)
+    return freed, result.rowcount
 
-def get_slots_sync(db: Session):
-    clean_expired_slots(db)
-    clean_stale_bookings(db)
-    slots = db.query(Slot).filter_by(available=True).all()
+
+# ------------------------------
+# Reservations (atomic, no read-then-write)
+# ------------------------------
+async def claim_slot(db: AsyncSession, d: date, t: time) -> bool:
+    """Take a free future slot in the current transaction.
+
+    A single conditional UPDATE: of any number of concurrent callers, exactly
+    one sees rowcount 1. The caller commits (or rolls back) afterwards.
+    """
+    result = await db.execute(
+        update(Slot)
+        .where(Slot.date == d, Slot.time == t, Slot.available.is_(True), future_slot_filter())
+        .values(available=False)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+async def release_slot(db: AsyncSession, d: date, t: time) -> bool:
+    """Give a taken slot back; False if it was already free or no longer exists."""
+    result = await db.execute(
+        update(Slot)
+        .where(Slot.date == d, Slot.time == t, Slot.available.is_(False))
+        .values(available=True)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def add_booking(db, **fields) -> Booking:
+    """Add a pending booking with its confirmation email and reminder jobs."""
+    booking = Booking(id=str(uuid.uuid4()), status="pending", **fields)
+    db.add(booking)
+    if booking.customer_email:
+        # Same transaction: no booking without its email, and vice versa
+        enqueue_email(db, booking.customer_email, *booking_confirmation(booking))
+        schedule_booking_jobs(db, booking)
+    return booking
+
+
+async def create_reservation(db: AsyncSession, **fields) -> Booking | None:
+    """Claim the slot and insert a pending booking in one transaction.
+
+    `fields` are Booking columns and must include date and time. The
+    confirmation email and the reminder jobs go in the same transaction.
+    Returns None (nothing written) when someone else holds the slot or a
+    resource is booked through the capacity model at that time.
+    """
+    if not await claim_slot(db, fields["date"], fields["time"]):
+        await db.rollback()
+        return None
+    # Grid bridge: the version bump queues this behind any reserve_interval()
+    # in flight (it bumps first too), so the overlap check sees its booking
+    await abump_versions(db, "slots", "bookings")
+    busy = busy_windows((await db.execute(interval_bookings_query(fields["date"], fields["date"]))).all())
+    if slot_blocked(busy, fields["date"], fields["time"]):
+        await db.rollback()
+        return None
+    booking = add_booking(db, **fields)
+    await db.commit()
+    return booking
+
+
+async def set_booking_status(db: AsyncSession, booking_id: str, status: str) -> bool:
+    """Move a booking to `status` unless it is already there (single UPDATE)."""
+    result = await db.execute(
+        update(Booking)
+        .where(Booking.id == booking_id, Booking.status != status)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+# ------------------------------
+# Bulk slot generation / removal
+# ------------------------------
+SLOTS_BULK_MAX = 5000
+BULK_CHUNK = 500
+
+
+def expand_slot_range(r, now: datetime | None = None):
+    """Turn a SlotRange into sorted future (date, time) pairs. Raises ValueError."""
+    now = now or datetime.now()
+    d_from, d_to = to_date(r.date_from), to_date(r.date_to)
+    t_open, t_close = to_time(r.open_time), to_time(r.close_time)
+    if not (d_from and d_to and t_open and t_close):
+        raise ValueError("Invalid date or time")
+    if d_to < d_from or t_close <= t_open:
+        raise ValueError("Range ends before it starts")
+    if r.interval_minutes < 5:
+        raise ValueError("interval_minutes must be at least 5")
+    if any(w not in range(7) for w in r.weekdays):
+        raise ValueError("weekdays are 0 (Monday) to 6 (Sunday)")
+
+    skip_dates = {to_date(d) for d in r.exclude_dates}
+    skip_times = {to_time(t) for t in r.exclude_times}
+    step = timedelta(minutes=r.interval_minutes)
+    times = []
+    t = datetime.combine(date.min, t_open)
+    while t.time() < t_close and t.date() == date.min:
+        if t.time() not in skip_times:
+            times.append(t.time())
+        t += step
+
+    pairs = []
+    day = d_from
+    while day <= d_to:
+        if day.weekday() in r.weekdays and day not in skip_dates:
+            pairs.extend((day, t) for t in times if datetime.combine(day, t) > now)
+            if len(pairs) > SLOTS_BULK_MAX:
+                raise ValueError(f"At most {SLOTS_BULK_MAX} slots per request")
+        day += timedelta(days=1)
+    return pairs
+
+
+def _insert_ignoring_duplicates():
+    # Both dialects spell ON CONFLICT DO NOTHING the same way
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(Slot)
+
+
+async def bulk_add_slots(db: AsyncSession, pairs):
+    """Insert available slots in one transaction; returns the ones created."""
+    created = []
+    for i in range(0, len(pairs), BULK_CHUNK):
+        rows = [{"date": d, "time": t, "available": True} for d, t in pairs[i:i + BULK_CHUNK]]
+        stmt = (
+            _insert_ignoring_duplicates()
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["date", "time"])
+            .returning(Slot.date, Slot.time)
+        )
+        created += (await db.execute(stmt)).all()
+    if created:
+        await abump_versions(db, "slots")
+    await db.commit()
+    return [slot_payload(d, t) for d, t in created]
+
+
+async def bulk_remove_slots(db: AsyncSession, pairs):
+    """Delete the matching slots that are still available; returns the ones removed."""
+    removed = []
+    for i in range(0, len(pairs), BULK_CHUNK):
+        stmt = (
+            delete(Slot)
+            .where(Slot.available.is_(True), tuple_(Slot.date, Slot.time).in_(pairs[i:i + BULK_CHUNK]))
+            .returning(Slot.date, Slot.time)
+            .execution_options(synchronize_session=False)
+        )
+        removed += (await db.execute(stmt)).all()
+    if removed:
+        await abump_versions(db, "slots")
+    await db.commit()
+    return [slot_payload(d, t) for d, t in removed]
+
+
+# ------------------------------
+# Read models (served from the snapshot cache)
+# ------------------------------
+def _slots_query():
+    return select(Slot).where(Slot.available.is_(True), future_slot_filter())
+
+
+def _bookings_query():
+    # only show confirmed or cancelled, from today on (the dashboard window)
+    return (
+        select(Booking)
+        .where(Booking.status != "pending", Booking.date >= datetime.now().date())
+        .order_by(Booking.date, Booking.time, Booking.id)
+    )
+
+
+def _format_slots(slots, busy=None):
     result: dict[str, list[str]] = {}
     for s in slots:
         d = to_date(s.date)
         t = to_time(s.time)
-        if not d or not t:
+        if not d or not t or (busy and slot_blocked(busy, d, t)):
             continue
         result.setdefault(d.isoformat(), []).append(t.strftime("%H:%M"))
     for d, times in result.items():
         result[d] = sorted(set(times))
     return result
 
-def get_bookings_sync(db: Session):
-    clean_stale_bookings(db)
-    bookings = (
-        db.query(Booking)
-        .filter(Booking.status != "pending")   # only show confirmed or cancelled
-        .all()
-    )
-    result = []
-    for b in bookings:
-        result.append({
-            "id": b.id,
-            "customer_name": b.customer_name,
-            "service": b.service,
-            "date": b.date.isoformat() if b.date else None,
-            "time": b.time.strftime("%H:%M") if b.time else None,
-            "status": b.status
-        })
+
+def _format_bookings(bookings):
+    return [booking_payload(b) for b in bookings]
+
+
+def _load_slots(db: Session):
+    # Grid bridge: hide slots an interval booking overlaps
+    busy = busy_windows(db.execute(interval_bookings_query(date.today())).all())
+    return _format_slots(db.execute(_slots_query()).scalars(), busy)
+
+
+def _load_bookings(db: Session):
+    return _format_bookings(db.execute(_bookings_query()).scalars())
+
+
+async def _aload_slots(db: AsyncSession):
+    # Grid bridge: hide slots an interval booking overlaps
+    busy = busy_windows((await db.execute(interval_bookings_query(date.today()))).all())
+    return _format_slots((await db.execute(_slots_query())).scalars(), busy)
+
+
+async def _aload_bookings(db: AsyncSession):
+    return _format_bookings((await db.execute(_bookings_query())).scalars())
+
+
+slots_cache = SnapshotCache("slots", _load_slots, _aload_slots)
+bookings_cache = SnapshotCache("bookings", _load_bookings, _aload_bookings)
+
+
+def _drop_past(slots: dict[str, list[str]], now: datetime):
+    """Hide slots that started after the snapshot was taken (sweeper lag)."""
+    today = now.date().isoformat()
+    if not slots or min(slots) > today:
+        return slots
+    cutoff = now.strftime("%H:%M")
+    result = {}
+    for d, times in slots.items():
+        if d < today:
+            continue
+        if d == today:
+            times = [t for t in times if t > cutoff]
+            if not times:
+                continue
+        result[d] = times
     return result
+
+
+def get_slots_sync(db: Session):
+    return _drop_past(slots_cache.get(db), datetime.now())
+
+
+def get_bookings_sync(db: Session):
+    return bookings_cache.get(db)
+
+
+async def get_slots_async(db: AsyncSession):
+    return _drop_past(await slots_cache.aget(db), datetime.now())
+
+
+async def get_bookings_async(db: AsyncSession):
+    return _drop_past_bookings(await bookings_cache.aget(db), datetime.now())
+
+
+def _drop_past_bookings(bookings: list[dict], now: datetime):
+    """The snapshot may predate midnight; keep it to the upcoming window."""
+    today = now.date().isoformat()
+    if not bookings or (bookings[0]["date"] or "") >= today:
+        return bookings
+    return [b for b in bookings if (b["date"] or "") >= today]
+
+
+# ------------------------------
+# Bookings search (keyset pagination)
+# ------------------------------
+BOOKING_STATUSES = ("pending", "paid", "cancelled")
+
+
+def encode_cursor(b: dict) -> str:
+    raw = json.dumps([b["date"], b["time"], b["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(date, time, id) of the last row on the previous page, or None if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        d, t, booking_id = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    d, t = to_date(d), to_time(t)
+    return (d, t, str(booking_id)) if d and t else None
+
+
+def _after(d: date, t: time, booking_id: str):
+    """SQL condition for rows ordered after (d, t, id)."""
+    return or_(
+        Booking.date > d,
+        and_(Booking.date == d, or_(
+            Booking.time > t,
+            and_(Booking.time == t, Booking.id > booking_id),
+        )),
+    )
+
+
+def bookings_page_query(date_from: date | None = None, date_to: date | None = None,
+                        status: str | None = None, email: str | None = None,
+                        after: tuple | None = None, limit: int = 50):
+    q = select(Booking).where(Booking.date.isnot(None))
+    if status:
+        q = q.where(Booking.status == status)
+    else:
+        q = q.where(Booking.status != "pending")
+    if email:
+        q = q.where(Booking.customer_email == email)
+    if date_from:
+        q = q.where(Booking.date >= date_from)
+    if date_to:
+        q = q.where(Booking.date <= date_to)
+    if after:
+        q = q.where(_after(*after))
+    # One extra row tells us whether there is a next page
+    return q.order_by(Booking.date, Booking.time, Booking.id).limit(limit + 1)
+
+
+async def get_bookings_page(db: AsyncSession, limit: int = 50, **filters):
+    """Returns (bookings, next_cursor); next_cursor is None on the last page."""
+    rows = (await db.execute(bookings_page_query(limit=limit, **filters))).scalars().all()
+    items = _format_bookings(rows[:limit])
+    next_cursor = encode_cursor(items[-1]) if len(rows) > limit else None
+    return items, next_cursor
+
+
+# ------------------------------
+# Versioned reads for conditional GET
+# ------------------------------
+async def slots_validators(db: AsyncSession):
+    """(slots, etag parts, last_modified) for GET /api/slots.
+
+    _drop_past can hide slots between version bumps, so the ETag also
+    carries the earliest visible slot. Served from the snapshot cache.
+    """
+    version, updated_at = await aread_state(db, "slots")
+    cached = await slots_cache.aget(db, version=version)
+    now = datetime.now()
+    slots = _drop_past(cached, now)
+    first = min(slots) if slots else ""
+    parts = (version, f"{first}T{slots[first][0]}" if first else "none")
+    if slots is not cached and sum(map(len, slots.values())) != sum(map(len, cached.values())):
+        # Something expired since the last sweep; it changed just now
+        updated_at = max(updated_at, now.replace(second=0, microsecond=0).timestamp())
+    return slots, parts, updated_at
+
+
+async def bookings_validators(db: AsyncSession):
+    """(version, last_modified) for GET /api/bookings, without loading rows."""
+    return await aread_state(db, "bookings")
@@ -0,0 +1,201 @@
+"""Idempotency keys for requests that create or change bookings.
+
+A client sends `Idempotency-Key: <uuid>` and reuses it when it retries.
+The first request with a key inserts an in_progress row and runs; when it
+finishes, its status code and JSON body are stored on the row. Retries
+(concurrent or later) wait for that and replay the stored response: no
+DB writes, LLM calls, broadcasts or emails happen twice.
+
+A failed (5xx) run deletes its row so a retry can try again. A run whose
+worker died is taken over after IDEMPOTENCY_LEASE_SECONDS; completed rows
+are purged by the sweeper after IDEMPOTENCY_TTL_SECONDS.
+"""
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, or_, update
+from sqlalchemy.exc import IntegrityError
+
+from .database import AsyncSessionLocal, IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Settings
+# ------------------------------
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# A chat turn can wait on the LLM for a while; after this the owner is presumed dead
+IDEMPOTENCY_LEASE_SECONDS = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "120"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.2"))
+MAX_KEY_LENGTH = 200
+
+
+class IdempotencyConflict(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def fingerprint(scope: str, body: bytes) -> str:
+    return hashlib.sha256(scope.encode() + b"\n" + body).hexdigest()
+
+
+# ------------------------------
+# Claim / complete / release
+# ------------------------------
+async def claim(record_key: str, digest: str):
+    """None when this request owns the key, else the stored (status, body).
+
+    Raises IdempotencyConflict when the key belongs to a different request
+    or the original is still running after IDEMPOTENCY_WAIT_SECONDS.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        now = time.time()
+        async with AsyncSessionLocal() as db:
+            db.add(IdempotencyKey(key=record_key, fingerprint=digest, status="in_progress", created_at=now))
+            try:
+                await db.commit()
+                return None
+            except IntegrityError:
+                await db.rollback()
+
+            row = await db.get(IdempotencyKey, record_key, populate_existing=True)
+            if row is None:   # released between our insert and read
+                continue
+            stale = (
+                (row.status == "done" and row.created_at < now - IDEMPOTENCY_TTL_SECONDS)
+                or (row.status == "in_progress" and row.created_at < now - IDEMPOTENCY_LEASE_SECONDS)
+            )
+            if stale:
+                # Conditional takeover: of several retries, one wins
+                result = await db.execute(
+                    update(IdempotencyKey)
+                    .where(IdempotencyKey.key == record_key, IdempotencyKey.created_at == row.created_at)
+                    .values(status="in_progress", fingerprint=digest, status_code=None,
+                            response=None, created_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+                if result.rowcount == 1:
+                    return None
+                continue
+            if row.fingerprint != digest:
+                raise IdempotencyConflict(422, f"{IDEMPOTENCY_HEADER} was already used for a different request")
+            if row.status == "done":
+                return row.status_code, json.loads(row.response)
+
+        if time.monotonic() >= deadline:
+            raise IdempotencyConflict(409, "A request with this idempotency key is still in progress")
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+
+async def complete(record_key: str, status_code: int, body):
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.key == record_key)
+            .values(status="done", status_code=status_code,
+                    response=json.dumps(body, default=str), created_at=time.time())
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+async def release(record_key: str):
+    """Forget an unfinished run so a retry executes it again."""
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(IdempotencyKey)
+            .where(IdempotencyKey.key == record_key, IdempotencyKey.status == "in_progress")
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+
+def purge_expired(db, now: float | None = None) -> int:
+    """Delete finished keys past their TTL and abandoned ones (sync, for the sweeper)."""
+    now = now or time.time()
+    result = db.execute(
+        delete(IdempotencyKey)
+        .where(or_(
+            IdempotencyKey.created_at < now - max(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LEASE_SECONDS),
+            (IdempotencyKey.status == "in_progress")
+            & (IdempotencyKey.created_at < now - IDEMPOTENCY_LEASE_SECONDS),
+        ))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+# ------------------------------
+# Route helpers
+# ------------------------------
+async def begin(request: Request, scope: str):
+    """(record key, stored response or None) for this request; (None, None) without a key.
+
+    `scope` names the operation (routes that are retries of each other, like
+    /chat/stream and its /chat fallback, share one). Raises HTTPException
+    for a malformed key or an IdempotencyConflict.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if not key:
+        return None, None
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} is too long")
+    record_key = f"{scope}:{key}"
+    digest = fingerprint(scope, await request.body())
+    try:
+        stored = await claim(record_key, digest)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    # Deferred by admission.rate_limited(replayable=True): only the run is charged
+    charge = getattr(request.state, "rate_limit", None)
+    if stored is None and charge:
+        try:
+            await charge()
+        except HTTPException:
+            await release(record_key)
+            raise
+    return record_key, stored
+
+
+def replayed(stored) -> JSONResponse:
+    status_code, body = stored
+    return JSONResponse(body, status_code=status_code, headers={"Idempotent-Replayed": "true"})
+
+
+async def idempotent(request: Request, scope: str, run):
+    """Run `run()` at most once per Idempotency-Key; retries get its response.
+
+    4xx outcomes are stored like successes (a retry of "slot taken" is still
+    "slot taken"); 5xx and other errors release the key.
+    """
+    record_key, stored = await begin(request, scope)
+    if record_key is None:
+        return await run()
+    if stored is not None:
+        logger.info("🔁 Replayed idempotent response", extra={"key": record_key})
+        return replayed(stored)
+    try:
+        result = await run()
+    except HTTPException as e:
+        if e.status_code < 500:
+            await complete(record_key, e.status_code, {"detail": e.detail})
+        else:
+            await release(record_key)
+        raise
+    except BaseException:
+        await release(record_key)
+        raise
+    await complete(record_key, 200, result)
+    return result
@@ -0,0 +1,168 @@
+"""Local intent classifier that answers obvious messages without the LLM.
+
+Rules catch the clear-cut cases; an optional naive-Bayes token scorer
+(trained offline, stored as JSON) covers the next tier. Anything below the
+confidence threshold is escalated to OpenAI by the /intent route.
+
+Train a scorer from a labelled JSONL corpus ({"message": ..., "intent": ...}):
+
+    python -m app.intent_rules corpus.jsonl intent_model.json
+"""
+import os
+import re
+import json
+import math
+from collections import Counter
+
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "")
+INTENT_CONFIDENCE = float(os.getenv("INTENT_CONFIDENCE", "0.9"))
+
+_WORD = re.compile(r"[a-z']+")
+
+# ------------------------------
+# Rules
+# ------------------------------
+BOOK_RULES = [
+    re.compile(r"\b(book|booking|reserve|reservation|schedule)\b.*\b(haircut|cut|trim|shave|appointment|slot|time|me|in)\b"),
+    re.compile(r"\b(i want|i'd like|i would like|can i get|can i have|need)\b.*\b(haircut|cut|trim|shave|appointment)\b"),
+    re.compile(r"\b(make|get|set up) an? appointment\b"),
+    re.compile(r"\bappointment (for|on|at|tomorrow|today)\b"),
+]
+
+OTHER_RULES = [
+    re.compile(r"^(hi|hello|hey|yo|hiya|good (morning|afternoon|evening))[\s!.,]*$"),
+    re.compile(r"^(thanks|thank you|thx|ok|okay|cool|great|bye|goodbye)[\s!.,]*$"),
+    re.compile(r"\b(what|which) services\b"),
+    re.compile(r"\b(how much|price|prices|cost|costs)\b"),
+    re.compile(r"\b(opening hours|open on|are you open|when do you (open|close)|where are you|address|located|parking)\b"),
+    re.compile(r"\b(cancel|refund)\b"),
+]
+
+
+def normalize(message: str) -> str:
+    return " ".join(message.lower().split())
+
+
+def match_rules(text: str):
+    """Return 'book' / 'other' when exactly one side's rules fire."""
+    book = any(r.search(text) for r in BOOK_RULES)
+    other = any(r.search(text) for r in OTHER_RULES)
+    if book and not other:
+        return "book"
+    if other and not book:
+        return "other"
+    return None
+
+
+# ------------------------------
+# Optional token scorer (naive Bayes, two classes)
+# ------------------------------
+class TokenScorer:
+    def __init__(self, weights: dict[str, float], bias: float):
+        self.weights = weights
+        self.bias = bias
+
+    def prob_book(self, text: str) -> float:
+        score = self.bias + sum(self.weights.get(w, 0.0) for w in _WORD.findall(text))
+        return 1.0 / (1.0 + math.exp(-max(min(score, 30.0), -30.0)))
+
+    @classmethod
+    def train(cls, examples: list[tuple[str, str]], alpha: float = 1.0):
+        counts = {"book": Counter(), "other": Counter()}
+        docs = Counter()
+        for message, intent in examples:
+            label = "book" if intent == "book" else "other"
+            docs[label] += 1
+            counts[label].update(_WORD.findall(normalize(message)))
+
+        vocab = set(counts["book"]) | set(counts["other"])
+        total_b = sum(counts["book"].values()) + alpha * len(vocab)
+        total_o = sum(counts["other"].values()) + alpha * len(vocab)
+        weights = {
+            w: math.log((counts["book"][w] + alpha) / total_b)
+            - math.log((counts["other"][w] + alpha) / total_o)
+            for w in vocab
+        }
+        bias = math.log((docs["book"] + 1) / (docs["other"] + 1))
+        return cls(weights, bias)
+
+    def to_dict(self):
+        return {"bias": self.bias, "weights": self.weights}
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["weights"], data["bias"])
+
+
+_scorer: TokenScorer | None = None
+if INTENT_MODEL_PATH and os.path.exists(INTENT_MODEL_PATH):
+    _scorer = TokenScorer.load(INTENT_MODEL_PATH)
+
+
+# ------------------------------
+# Counters
+# ------------------------------
+stats = Counter()
+
+
+def classify(message: str, scorer: TokenScorer | None = None, threshold: float = INTENT_CONFIDENCE):
+    """Return (intent, confidence, source). intent is None when unsure."""
+    text = normalize(message)
+    intent = match_rules(text)
+    if intent:
+        return intent, 1.0, "rules"
+
+    scorer = scorer or _scorer
+    if scorer:
+        p = scorer.prob_book(text)
+        intent = "book" if p >= 0.5 else "other"
+        confidence = max(p, 1.0 - p)
+        if confidence >= threshold:
+            return intent, confidence, "model"
+        return None, confidence, "model"
+    return None, 0.0, "none"
+
+
+def guess(message: str) -> str | None:
+    """Best local answer regardless of confidence (used to track agreement)."""
+    scorer = _scorer
+    if scorer:
+        return "book" if scorer.prob_book(normalize(message)) >= 0.5 else "other"
+    return None
+
+
+def record(source: str, local_guess: str | None = None, llm_intent: str | None = None):
+    stats["requests"] += 1
+    if source in ("rules", "model", "cache"):
+        stats[f"local_{source}"] += 1
+        return
+    stats["escalated"] += 1
+    if local_guess and llm_intent:
+        stats["compared"] += 1
+        if local_guess == llm_intent:
+            stats["agreed"] += 1
+
+
+def snapshot():
+    requests = stats["requests"]
+    local = stats["local_rules"] + stats["local_model"] + stats["local_cache"]
+    compared = stats["compared"]
+    return {
+        **stats,
+        "hit_rate": round(local / requests, 4) if requests else 0.0,
+        "agreement": round(stats["agreed"] / compared, 4) if compared else None,
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    corpus, out = sys.argv[1], sys.argv[2]
+    with open(corpus) as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    scorer = TokenScorer.train([(r["message"], r["intent"]) for r in rows])
+    with open(out, "w") as f:
+        json.dump(scorer.to_dict(), f)
+    print(f"Trained on {len(rows)} examples, {len(scorer.weights)} tokens → {out}")
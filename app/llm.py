@@ -0,0 +1,131 @@
+import os
+import time
+import httpx
+
+from .config import require_openai_key
+from .metrics import record_llm
+from .admission import AdmissionGate
+
+# ------------------------------
+# Settings
+# ------------------------------
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # e.g. a local stub for benchmarks
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", str(LLM_MAX_CONCURRENCY)))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "1"))
+
+# ------------------------------
+# Shared client (one connection pool per worker), built on first use:
+# the openai SDK is the slowest import in the app and most workers
+# answer plenty of requests before the first one needs the model
+# ------------------------------
+_http_client: httpx.AsyncClient | None = None
+_client = None
+
+
+def get_client():
+    global _http_client, _client
+    if _client is None:
+        from openai import AsyncOpenAI
+
+        api_key = require_openai_key()
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+        )
+        _client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            http_client=_http_client,
+            max_retries=LLM_MAX_RETRIES,
+        )
+    return _client
+
+
+# Caps in-flight completions so a burst can't exhaust the pool or the quota;
+# the wait queue is bounded too (raises admission.Overloaded when full)
+gate = AdmissionGate(LLM_MAX_CONCURRENCY)
+
+
+async def chat_completion(messages: list[dict], timeout: float | None = None, **kwargs):
+    """Await a chat completion without blocking the event loop."""
+    async with gate.slot():
+        start = time.perf_counter()
+        try:
+            response = await get_client().chat.completions.create(
+                model=kwargs.pop("model", LLM_MODEL),
+                messages=messages,
+                timeout=timeout or LLM_TIMEOUT_SECONDS,
+                **kwargs,
+            )
+        except Exception:
+            record_llm("complete", "error", time.perf_counter() - start)
+            raise
+        record_llm("complete", "ok", time.perf_counter() - start, response.usage)
+        return response
+
+
+async def stream_completion(messages: list[dict], timeout: float | None = None, **kwargs):
+    """Yield reply text deltas as they arrive.
+
+    If the model calls tools instead, the last item yielded is a list of
+    {"id", "name", "arguments"} dicts assembled from the streamed fragments.
+    The concurrency slot is held until the stream is exhausted or closed.
+    """
+    async with gate.slot():
+        start = time.perf_counter()
+        outcome, usage = "error", None
+        try:
+            stream = await get_client().chat.completions.create(
+                model=kwargs.pop("model", LLM_MODEL),
+                messages=messages,
+                timeout=timeout or LLM_TIMEOUT_SECONDS,
+                stream=True,
+                stream_options={"include_usage": True},  # usage arrives in a final chunk
+                **kwargs,
+            )
+        except Exception:
+            record_llm("stream", outcome, time.perf_counter() - start)
+            raise
+        tool_calls: dict[int, dict] = {}
+        try:
+            async for chunk in stream:
+                if chunk.usage:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    yield delta.content
+                for tc in delta.tool_calls or []:
+                    call = tool_calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                    if tc.id:
+                        call["id"] = tc.id
+                    if tc.function and tc.function.name:
+                        call["name"] += tc.function.name
+                    if tc.function and tc.function.arguments:
+                        call["arguments"] += tc.function.arguments
+            if tool_calls:
+                yield [tool_calls[i] for i in sorted(tool_calls)]
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "closed"   # client went away mid-stream
+            raise
+        finally:
+            record_llm("stream", outcome, time.perf_counter() - start, usage)
+            await stream.close()
+
+
+async def aclose():
+    """Release pooled connections on shutdown."""
+    global _http_client, _client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = _client = None
@@ -1,16 +1,70 @@
 import os
-from fastapi import FastAPI, WebSocket, Depends, Request
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, WebSocket, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from sqlalchemy.orm import Session
 
-from .routes import pages, intent, chat, slots, bookings, payment, auth, test_email
-from .database import get_db
-from .websocket_manager import connect_ws
+from .logging_config import configure_logging
+
+# Before anything logs
+configure_logging()
+logger = logging.getLogger(__name__)
+
+from .routes import pages, intent, chat, slots, bookings, payment, auth, test_email, capacity
+from .database import engine, async_engine, migrate
+from .metrics import MetricsMiddleware, instrument_engine, render as render_metrics
+from .websocket_manager import connect_ws, registry
+from .pubsub import backplane
 from .routes.auth import require_login
+from .sweeper import run_sweeper
+from .scheduler import run_scheduler
+from .outbox import run_outbox_worker, outbox_stats, requeue_dead
+from .deps import get_async_db
+from .admission import Overloaded
+from . import llm, outbox
+
+
+# ------------------------------
+# Lifespan: schema check, pub/sub backplane, sweeper/outbox/reminder workers, client shutdown
+# ------------------------------
+# Off in deployments that run `python -m app.migrate` once before the workers start
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        # A single SELECT unless the schema is behind; then one worker migrates
+        await asyncio.to_thread(migrate)
+    await backplane.start()
+    sweeper = asyncio.create_task(run_sweeper())
+    mailer = asyncio.create_task(run_outbox_worker())
+    reminders = asyncio.create_task(run_scheduler())
+    try:
+        yield
+    finally:
+        sweeper.cancel()
+        mailer.cancel()
+        reminders.cancel()
+        await outbox.aclose()
+        await backplane.stop()
+        await llm.aclose()
+        await async_engine.dispose()
 
-app = FastAPI(title="Barbershop Booking AI Agent")
+
+app = FastAPI(title="Barbershop Booking AI Agent", lifespan=lifespan)
+
+# ------------------------------
+# Metrics: request latency + SQL timing
+# ------------------------------
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # optional bearer token for /metrics
+
+app.add_middleware(MetricsMiddleware)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
 
 # ------------------------------
 # Session Middleware
@@ -35,16 +89,69 @@ app.include_router(intent.router)
 app.include_router(chat.router)
 app.include_router(slots.router)
 app.include_router(bookings.router)
+app.include_router(capacity.router)
 app.include_router(payment.router)
 
 # ------------------------------
 # WebSockets
 # ------------------------------
+# Dashboard: admin topic (bookings with customer details), login required
 @app.websocket("/ws/dashboard")
-async def dashboard_ws(websocket: WebSocket, db: Session = Depends(get_db)):
-    await connect_ws(websocket)
+async def dashboard_ws(websocket: WebSocket):
+    if "user" not in websocket.session:
+        await websocket.close(code=1008)  # policy violation
+        return
+    await connect_ws(websocket, topic="admin")
 
+# Chat widget: public topic (availability only)
 @app.websocket("/ws")
-async def chat_ws(websocket: WebSocket, db: Session = Depends(get_db)):
-    await connect_ws(websocket)
-print("🔑 Session secret:", os.getenv("SESSION_SECRET", "CHANGE_ME_SECRET"))
+async def chat_ws(websocket: WebSocket):
+    await connect_ws(websocket, topic="public")
+
+@app.get("/api/ws/stats")
+async def ws_stats(auth=Depends(require_login)):
+    return registry.stats()
+
+# ------------------------------
+# Email outbox
+# ------------------------------
+@app.get("/api/outbox/stats")
+async def email_outbox_stats(auth=Depends(require_login)):
+    return await outbox_stats()
+
+@app.post("/api/outbox/{message_id}/retry")
+async def retry_dead_email(message_id: int, auth=Depends(require_login), db=Depends(get_async_db)):
+    if not await requeue_dead(db, message_id):
+        raise HTTPException(status_code=404, detail="No dead-lettered email with that id")
+    return {"status": "requeued", "id": message_id}
+
+# ------------------------------
+# Admission control: LLM gate full → 503
+# ------------------------------
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    return JSONResponse(
+        {"detail": "The assistant is busy, please try again shortly", "reason": exc.reason},
+        status_code=503,
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+@app.get("/api/admission/stats")
+async def admission_stats(auth=Depends(require_login)):
+    return llm.gate.stats()
+
+# ------------------------------
+# Prometheus metrics
+# ------------------------------
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+if os.getenv("SESSION_SECRET") is None:
+    logger.warning("🔑 SESSION_SECRET not set, using the insecure default")
+
+if not os.getenv("OPENAI_API_KEY"):
+    logger.warning("🔑 OPENAI_API_KEY not set, turns that need the model will fail")
@@ -0,0 +1,163 @@
+import time
+import asyncio
+import contextvars
+from weakref import WeakKeyDictionary
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest,
+)
+from sqlalchemy import event
+
+# ------------------------------
+# Metric definitions
+# ------------------------------
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency (until the body is sent)",
+    ["method", "route", "status"],
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled")
+
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "OpenAI call duration (streams: until exhausted)",
+    ["mode", "outcome"],
+    buckets=(0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60),
+)
+LLM_TOKENS = Counter("llm_tokens_total", "Tokens reported by the API", ["kind"])
+LLM_QUEUE_WAIT = Histogram(
+    "llm_queue_wait_seconds", "Wait for an LLM concurrency slot (admitted calls)",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10),
+)
+LLM_QUEUE_DEPTH = Gauge("llm_queue_waiting", "Calls queued for an LLM concurrency slot")
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "Requests turned away by rate limits or the LLM gate",
+    ["scope", "reason"],
+)
+
+DB_QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Single SQL statement duration",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_seconds_per_request", "Time in SQL per HTTP request", ["route"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+WS_CONNECTIONS = Gauge("ws_connections", "Open WebSocket connections", ["topic"])
+WS_BROADCAST_LATENCY = Histogram(
+    "ws_broadcast_duration_seconds", "Time to queue one delta for every subscriber", ["topic"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+WS_SEND_LATENCY = Histogram(
+    "ws_send_duration_seconds", "Queue wait + send time per WebSocket message",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10),
+)
+WS_EVICTIONS = Counter("ws_evictions_total", "Slow or broken consumers dropped", ["reason"])
+
+
+# ------------------------------
+# Per-request SQL accounting
+# ------------------------------
+# Statements from the async engine run inside SQLAlchemy's greenlet, which
+# may not see the request's contextvars; the task map covers that case.
+class _RequestDB:
+    __slots__ = ("queries", "seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_db: contextvars.ContextVar[_RequestDB | None] = contextvars.ContextVar("request_db", default=None)
+_task_db: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def _current_request_db():
+    holder = _request_db.get()
+    if holder is None:
+        try:
+            holder = _task_db.get(asyncio.current_task())
+        except RuntimeError:  # no running loop (worker thread)
+            return None
+    return holder
+
+
+def instrument_engine(engine):
+    """Time every statement on a (sync) engine; pass `async_engine.sync_engine` for async."""
+
+    # The start time lives on the statement's own context, so a statement
+    # that fails (no after_cursor_execute) leaves nothing behind
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        DB_QUERY_LATENCY.observe(elapsed)
+        holder = _current_request_db()
+        if holder is not None:
+            holder.queries += 1
+            holder.seconds += elapsed
+
+
+# ------------------------------
+# ASGI middleware
+# ------------------------------
+class MetricsMiddleware:
+    """Records latency per route template (not raw path, to bound label cardinality)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        holder = _RequestDB()
+        token = _request_db.set(holder)
+        task = asyncio.current_task()
+        _task_db[task] = holder
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            _request_db.reset(token)
+            _task_db.pop(task, None)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            if path != "/metrics":
+                HTTP_LATENCY.labels(scope["method"], path, str(status)).observe(elapsed)
+                DB_QUERIES_PER_REQUEST.labels(path).observe(holder.queries)
+                DB_SECONDS_PER_REQUEST.labels(path).observe(holder.seconds)
+
+
+# ------------------------------
+# LLM hooks
+# ------------------------------
+def record_llm(mode: str, outcome: str, seconds: float, usage=None):
+    LLM_LATENCY.labels(mode, outcome).observe(seconds)
+    if usage is not None:
+        LLM_TOKENS.labels("prompt").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        LLM_TOKENS.labels("completion").inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def render():
+    """(body, content type) for GET /metrics."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
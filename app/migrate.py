@@ -0,0 +1,35 @@
+"""Apply the database schema once, before starting the web workers.
+
+    python -m app.migrate            # no-op if already at SCHEMA_REVISION
+    python -m app.migrate --check    # exit 1 if a migration is pending
+    python -m app.migrate --force    # re-run every step
+
+With MIGRATE_ON_STARTUP=false the app never touches the schema itself,
+so run this in the deploy/release step.
+"""
+import argparse
+import sys
+
+from .logging_config import configure_logging
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.migrate")
+    parser.add_argument("--check", action="store_true", help="only report whether a migration is pending")
+    parser.add_argument("--force", action="store_true", help="run every step even if the schema is current")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    from .database import SCHEMA_REVISION, migrate, schema_revision
+
+    if args.check:
+        current = schema_revision()
+        print(f"schema revision {current}, expected {SCHEMA_REVISION}")
+        return 0 if current is not None and current >= SCHEMA_REVISION else 1
+    if not migrate(force=args.force):
+        print(f"schema already at revision {SCHEMA_REVISION}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,4 +2,38 @@ from pydantic import BaseModel
 
 class ChatMessage(BaseModel):
     message: str
-    history: list | None = None
+    session_id: str | None = None   # server-held conversation (preferred)
+    history: list | None = None     # full history from older clients
+
+class SlotRange(BaseModel):
+    """Recurring opening hours, expanded into slots by the bulk endpoints."""
+    date_from: str
+    date_to: str
+    weekdays: list[int] = [0, 1, 2, 3, 4, 5, 6]   # 0 = Monday
+    open_time: str = "09:00"
+    close_time: str = "18:00"                      # last slot starts before this
+    interval_minutes: int = 30
+    exclude_dates: list[str] = []
+    exclude_times: list[str] = []                  # e.g. a lunch break
+
+class ServiceIn(BaseModel):
+    name: str
+    duration_minutes: int
+
+class WorkingHoursIn(BaseModel):
+    weekday: int           # 0 = Monday
+    open_time: str = "09:00"
+    close_time: str = "18:00"
+
+class ResourceIn(BaseModel):
+    """A chair / barber with its weekly hours (several rows per day = split shift)."""
+    name: str
+    hours: list[WorkingHoursIn] = []
+
+class IntervalBooking(BaseModel):
+    service: str
+    date: str
+    time: str
+    resource_id: int | None = None   # None = any free chair
+    customer_name: str
+    customer_email: str | None = None
@@ -0,0 +1,198 @@
+import os
+import time
+import random
+import asyncio
+import logging
+from collections import Counter, deque
+from sqlalchemy import select, update, func
+
+from .database import AsyncSessionLocal, OutboxEmail
+from .email_utils import EmailFailure, make_transport
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Settings
+# ------------------------------
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", "30"))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", "3600"))
+# A claimed row becomes due again if its worker dies mid-send
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+# Built on first send, not at import
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = make_transport()
+    return _transport
+
+
+# ------------------------------
+# Producer side
+# ------------------------------
+def enqueue_email(db, to_email: str, subject: str, html: str) -> OutboxEmail:
+    """Add an email to the caller's transaction; it is sent after commit."""
+    message = OutboxEmail(
+        to_email=to_email, subject=subject, html=html,
+        status="pending", attempts=0, next_attempt_at=0,
+    )
+    db.add(message)
+    return message
+
+
+# ------------------------------
+# Worker side
+# ------------------------------
+class OutboxStats:
+    def __init__(self):
+        self.counters = Counter()
+        self._sent_times: deque[float] = deque(maxlen=10_000)
+        self.last_batch_seconds = 0.0
+
+    def record_batch(self, seconds: float, sent: int, retried: int, dead: int):
+        now = time.time()
+        self.counters["batches"] += 1
+        self.counters["sent"] += sent
+        self.counters["retried"] += retried
+        self.counters["dead"] += dead
+        self._sent_times.extend([now] * sent)
+        self.last_batch_seconds = seconds
+
+    def sent_per_minute(self) -> int:
+        cutoff = time.time() - 60
+        return sum(1 for t in self._sent_times if t >= cutoff)
+
+
+stats = OutboxStats()
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with jitter: base, 2x base, 4x base ... capped."""
+    delay = min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+async def claim_batch(db, limit: int = OUTBOX_BATCH_SIZE):
+    """Lease up to `limit` due messages to this worker.
+
+    The conditional UPDATE re-checks `next_attempt_at`, so when two workers
+    pick the same ids only the first one gets them.
+    """
+    now = time.time()
+    due = (
+        OutboxEmail.status.in_(("pending", "sending")),
+        OutboxEmail.next_attempt_at <= now,
+    )
+    ids = (await db.execute(
+        select(OutboxEmail.id).where(*due).order_by(OutboxEmail.next_attempt_at).limit(limit)
+    )).scalars().all()
+    if not ids:
+        return []
+    claimed = (await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id.in_(ids), *due)
+        .values(status="sending", next_attempt_at=now + OUTBOX_LEASE_SECONDS)
+        .returning(OutboxEmail.id, OutboxEmail.to_email, OutboxEmail.subject,
+                   OutboxEmail.html, OutboxEmail.attempts)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return [row._asdict() for row in claimed]
+
+
+async def drain_once(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    """Send one batch of due messages. Returns how many were claimed."""
+    async with AsyncSessionLocal() as db:
+        batch = await claim_batch(db, limit)
+        if not batch:
+            return 0
+
+        start = time.perf_counter()
+        try:
+            results = await get_transport().send_batch(batch)
+        except Exception as e:
+            # A transport bug must not strand the batch until the lease expires
+            logger.error(f"Email transport error: {e}")
+            results = [EmailFailure(str(e))] * len(batch)
+
+        now = time.time()
+        sent = retried = dead = 0
+        for message, failure in zip(batch, results):
+            if failure is None:
+                values = dict(status="sent", sent_at=now, attempts=message["attempts"] + 1,
+                              last_error=None)
+                sent += 1
+            else:
+                attempts = message["attempts"] + 1
+                if failure.permanent or attempts >= OUTBOX_MAX_ATTEMPTS:
+                    values = dict(status="dead", attempts=attempts, last_error=failure.error)
+                    dead += 1
+                    logger.error(f"📪 Email {message['id']} to {message['to_email']} dead-lettered: {failure.error}")
+                else:
+                    values = dict(status="pending", attempts=attempts, last_error=failure.error,
+                                  next_attempt_at=now + backoff_seconds(attempts))
+                    retried += 1
+            await db.execute(
+                update(OutboxEmail).where(OutboxEmail.id == message["id"]).values(**values)
+            )
+        await db.commit()
+
+    stats.record_batch(time.perf_counter() - start, sent, retried, dead)
+    if sent:
+        logger.info(f"📧 Sent {sent} emails ({retried} to retry, {dead} dead)")
+    return len(batch)
+
+
+async def run_outbox_worker(interval: float = OUTBOX_POLL_SECONDS):
+    """Background loop: drain full batches back to back, otherwise poll."""
+    while True:
+        try:
+            claimed = await drain_once()
+        except Exception as e:
+            logger.error(f"Outbox worker error: {e}")
+            claimed = 0
+        if claimed < OUTBOX_BATCH_SIZE:
+            await asyncio.sleep(interval)
+
+
+async def requeue_dead(db, message_id: int) -> bool:
+    """Give a dead-lettered email a fresh set of attempts."""
+    result = await db.execute(
+        update(OutboxEmail)
+        .where(OutboxEmail.id == message_id, OutboxEmail.status == "dead")
+        .values(status="pending", attempts=0, next_attempt_at=0)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def outbox_stats():
+    """Throughput counters plus the backlog by status."""
+    async with AsyncSessionLocal() as db:
+        by_status = dict((await db.execute(
+            select(OutboxEmail.status, func.count()).group_by(OutboxEmail.status)
+        )).all())
+        oldest = (await db.execute(
+            select(func.min(OutboxEmail.created_at)).where(OutboxEmail.status.in_(("pending", "sending")))
+        )).scalar()
+    return {
+        **stats.counters,
+        "sent_last_minute": stats.sent_per_minute(),
+        "last_batch_seconds": round(stats.last_batch_seconds, 3),
+        "backlog": by_status.get("pending", 0) + by_status.get("sending", 0),
+        "oldest_pending_age_seconds": round(time.time() - oldest, 1) if oldest else 0,
+        "by_status": by_status,
+    }
+
+
+async def aclose():
+    global _transport
+    if _transport is not None:
+        await _transport.aclose()
+        _transport = None
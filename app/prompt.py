@@ -0,0 +1,109 @@
+"""System prompt for the booking assistant.
+
+Availability is compressed into per-day ranges ("09:00–12:00 every 30m")
+and capped to PROMPT_HORIZON_DAYS, so the prompt stays roughly the same
+size however many slots exist. Dates past the horizon are reachable
+through the `check_availability` tool.
+"""
+import os
+import json
+from datetime import date, timedelta
+
+PROMPT_HORIZON_DAYS = int(os.getenv("PROMPT_HORIZON_DAYS", "14"))
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "2"))
+
+AVAILABILITY_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "check_availability",
+            "description": "List free appointment times for one date.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "YYYY-MM-DD"},
+                },
+                "required": ["date"],
+            },
+        },
+    }
+]
+
+
+# ------------------------------
+# Compression
+# ------------------------------
+def _minutes(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+def compress_times(times: list[str]) -> str:
+    """["09:00", "09:30", "10:00", "14:00"] → "09:00–10:00 every 30m, 14:00".
+
+    Runs of three or more equally spaced times collapse into one range.
+    """
+    parts = []
+    i = 0
+    while i < len(times):
+        j = i
+        if i + 1 < len(times):
+            step = _minutes(times[i + 1]) - _minutes(times[i])
+            while j + 1 < len(times) and _minutes(times[j + 1]) - _minutes(times[j]) == step:
+                j += 1
+        if j - i >= 2:
+            parts.append(f"{times[i]}–{times[j]} every {step}m")
+            i = j + 1
+        else:
+            parts.append(times[i])
+            i += 1
+    return ", ".join(parts)
+
+
+def availability_summary(slots: dict[str, list[str]], today: date | None = None,
+                         horizon_days: int = PROMPT_HORIZON_DAYS) -> str:
+    today = today or date.today()
+    last = (today + timedelta(days=horizon_days)).isoformat()
+    lines = [
+        f"{d}: {compress_times(times)}"
+        for d, times in sorted(slots.items())
+        if d <= last
+    ]
+    if not lines:
+        lines.append(f"No free slots until {last}.")
+    if any(d > last for d in slots):
+        lines.append(f"More dates after {last}: use check_availability.")
+    return "\n".join(lines)
+
+
+# ------------------------------
+# Prompt + tool execution
+# ------------------------------
+def build_system_prompt(slots: dict[str, list[str]], today: date | None = None) -> str:
+    today = today or date.today()
+    return (
+        "You are a polite barbershop assistant. "
+        f"Today is {today.isoformat()}.\n"
+        f"Available slots:\n{availability_summary(slots, today)}\n\n"
+        "Your task:\n"
+        "- Collect the customer's name\n"
+        "- Collect the customer's email\n"
+        "- Collect a valid available date (YYYY-MM-DD)\n"
+        "- Collect a valid available time (HH:MM)\n\n"
+        "Rules:\n"
+        '- If the user already gave all four (name, email, date, time), respond ONLY with valid JSON:\n'
+        '{"service":"Haircut","date":"YYYY-MM-DD","time":"HH:MM","customer_name":"NAME","customer_email":"EMAIL"}\n'
+        "- Use double quotes for all keys and string values.\n"
+        "- Do NOT add any extra words or formatting. If something is missing, only ask for that piece."
+    )
+
+
+def run_tool(name: str, arguments: str, slots: dict[str, list[str]]) -> str:
+    """Execute a tool call from the model and return its JSON result."""
+    if name != "check_availability":
+        return json.dumps({"error": f"unknown tool {name}"})
+    try:
+        day = json.loads(arguments or "{}").get("date", "")
+    except json.JSONDecodeError:
+        return json.dumps({"error": "invalid arguments"})
+    return json.dumps({"date": day, "times": slots.get(day, [])})
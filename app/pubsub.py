@@ -0,0 +1,214 @@
+"""Pub/sub backplane that carries WebSocket deltas between worker processes.
+
+Every worker hands its deltas to the backplane and receives all deltas,
+its own included, through the same handler. With PUBSUB_BACKEND:
+
+- "memory" (default): delivers in-process. Fine for a single worker.
+- "postgres": LISTEN/NOTIFY on the app's own Postgres database, so every
+  worker sees every delta in the same (commit) order.
+"""
+import os
+import json
+import random
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "memory")
+PUBSUB_CHANNEL = os.getenv("PUBSUB_CHANNEL", "barbershop_events")
+PUBSUB_RETRY_MIN_SECONDS = float(os.getenv("PUBSUB_RETRY_MIN_SECONDS", "0.5"))
+PUBSUB_RETRY_MAX_SECONDS = float(os.getenv("PUBSUB_RETRY_MAX_SECONDS", "30"))
+# How often the LISTEN connection is pinged; a dead one is only noticed then
+PUBSUB_HEALTH_CHECK_SECONDS = float(os.getenv("PUBSUB_HEALTH_CHECK_SECONDS", "5"))
+
+# NOTIFY payloads must stay under 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+
+def retry_delay(attempt: int) -> float:
+    delay = min(PUBSUB_RETRY_MAX_SECONDS, PUBSUB_RETRY_MIN_SECONDS * 2 ** (attempt - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+class MemoryBackplane:
+    def __init__(self):
+        self.handler = None
+
+    def subscribe(self, handler, on_gap=None):
+        self.handler = handler
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def send(self, message: dict):
+        self.handler(message)
+
+
+class PostgresBackplane:
+    """Two connections: one LISTENs, one sends this worker's NOTIFYs in order.
+
+    Both are owned by supervised loops that reconnect with backoff, so a
+    database restart delays deltas instead of silently ending fan-out.
+    Deltas NOTIFYed while this worker wasn't listening are lost; after
+    re-LISTEN the `on_gap` callback lets subscribers resend full state.
+    """
+
+    def __init__(self, dsn: str, channel: str = PUBSUB_CHANNEL):
+        self.dsn = dsn
+        self.channel = channel
+        self.handler = None
+        self.on_gap = None
+        self._queue: asyncio.Queue[dict] = asyncio.Queue()
+        self._listen_conn = None
+        self._send_conn = None
+        self._tasks: list[asyncio.Task] = []
+
+    def subscribe(self, handler, on_gap=None):
+        self.handler = handler
+        self.on_gap = on_gap
+
+    async def start(self):
+        import asyncpg
+
+        # Connect up front so a bad DSN still fails startup
+        self._listen_conn = await asyncpg.connect(self.dsn)
+        await self._listen_conn.add_listener(self.channel, self._on_notify)
+        self._send_conn = await asyncpg.connect(self.dsn)
+        self._tasks = [
+            asyncio.create_task(self._supervise("sender", self._send_loop)),
+            asyncio.create_task(self._supervise("listener", self._listen_loop)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for conn in (self._listen_conn, self._send_conn):
+            await _close(conn)
+
+    def send(self, message: dict):
+        # Queue + single sender keeps this worker's deltas in order
+        self._queue.put_nowait(message)
+
+    async def _supervise(self, name: str, loop):
+        """Restart a loop that died of an unexpected error."""
+        while True:
+            try:
+                await loop()
+            except Exception:
+                logger.exception(f"❌ Pub/sub {name} crashed, restarting")
+                await asyncio.sleep(PUBSUB_RETRY_MIN_SECONDS)
+
+    # ------------------------------
+    # Sending
+    # ------------------------------
+    async def _send_loop(self):
+        while True:
+            message = await self._queue.get()
+            for payload in split_payload(message):
+                await self._notify(payload)
+
+    async def _notify(self, payload: str):
+        """NOTIFY one payload, reconnecting until the database is back."""
+        import asyncpg
+
+        attempt = 0
+        while True:
+            try:
+                if self._send_conn is None or self._send_conn.is_closed():
+                    self._send_conn = await asyncpg.connect(self.dsn)
+                    if attempt:
+                        logger.info(f"🔌 Pub/sub sender reconnected after {attempt} attempts")
+                await self._send_conn.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+                return
+            except asyncpg.PostgresError as e:
+                if self._send_conn is not None and not self._send_conn.is_closed():
+                    # The server rejected this payload; retrying won't help
+                    logger.error(f"Dropping pub/sub message, NOTIFY failed: {e}")
+                    return
+                error = e
+            except (OSError, asyncio.TimeoutError, asyncpg.InterfaceError) as e:
+                error = e
+            attempt += 1
+            delay = retry_delay(attempt)
+            logger.error(f"NOTIFY failed ({self._queue.qsize()} queued), "
+                         f"reconnecting in {delay:.1f}s: {error!r}")
+            await _close(self._send_conn)
+            self._send_conn = None
+            await asyncio.sleep(delay)
+
+    # ------------------------------
+    # Listening
+    # ------------------------------
+    async def _listen_loop(self):
+        """Ping the LISTEN connection; on failure reconnect and re-LISTEN."""
+        import asyncpg
+
+        attempt = 0
+        while True:
+            try:
+                if self._listen_conn is None or self._listen_conn.is_closed():
+                    conn = await asyncpg.connect(self.dsn)
+                    await conn.add_listener(self.channel, self._on_notify)
+                    self._listen_conn = conn
+                    logger.info("🔌 Pub/sub listener reconnected, LISTEN restored")
+                    attempt = 0
+                    if self.on_gap:
+                        self.on_gap()
+                await asyncio.sleep(PUBSUB_HEALTH_CHECK_SECONDS)
+                await asyncio.wait_for(self._listen_conn.fetchval("SELECT 1"), PUBSUB_HEALTH_CHECK_SECONDS)
+            except (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError) as e:
+                attempt += 1
+                delay = retry_delay(attempt)
+                logger.error(f"Pub/sub listener lost, reconnecting in {delay:.1f}s: {e!r}")
+                await _close(self._listen_conn)
+                self._listen_conn = None
+                await asyncio.sleep(delay)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            self.handler(json.loads(payload))
+        except Exception as e:
+            logger.error(f"Dropping bad pub/sub message: {e}")
+
+
+async def _close(conn):
+    if conn is None:
+        return
+    try:
+        await asyncio.wait_for(conn.close(), 5)
+    except Exception:
+        conn.terminate()
+
+
+def split_payload(message: dict) -> list[str]:
+    """Serialise, halving a `slots` list until each part fits in one NOTIFY."""
+    payload = json.dumps(message)
+    slots = message.get("slots")
+    if len(payload.encode()) <= MAX_PAYLOAD_BYTES or not slots or len(slots) < 2:
+        return [payload]
+    mid = len(slots) // 2
+    return (split_payload({**message, "slots": slots[:mid]})
+            + split_payload({**message, "slots": slots[mid:]}))
+
+
+def postgres_dsn(url: str) -> str:
+    """asyncpg wants a plain postgresql:// URL without a driver suffix."""
+    for prefix in ("postgresql+psycopg2://", "postgresql+asyncpg://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql://" + url[len(prefix):]
+    return url
+
+
+def make_backplane():
+    if PUBSUB_BACKEND == "postgres":
+        from .database import DATABASE_URL
+        return PostgresBackplane(postgres_dsn(DATABASE_URL))
+    return MemoryBackplane()
+
+
+backplane = make_backplane()
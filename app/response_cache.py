@@ -0,0 +1,168 @@
+"""Bounded LRU/TTL cache for LLM answers (/intent and simple /chat turns).
+
+Backends are pluggable via RESPONSE_CACHE_BACKEND:
+
+- "memory" (default): per-worker OrderedDict.
+- "sqlite:///path/to/cache.db": a local file shared by every worker on the
+  host, standing in for a networked cache. Its calls run in a thread so
+  lock contention between workers never stalls the event loop.
+"""
+import os
+import asyncio
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(str(text).lower().split())
+
+
+def make_key(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+# ------------------------------
+# Backends
+# ------------------------------
+class MemoryBackend:
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteBackend:
+    blocking = True
+
+    def __init__(self, path: str, maxsize: int, ttl: float, table: str):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.table = table
+        self.evictions = 0
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT, expires REAL, used REAL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_used ON {table} (used)")
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, expires FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+            self._conn.execute(f"UPDATE {self.table} SET used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            overflow = len(self) - self.maxsize
+            if overflow > 0:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN "
+                    f"(SELECT key FROM {self.table} ORDER BY used LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+def make_backend(name: str, spec: str = RESPONSE_CACHE_BACKEND,
+                 maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL_SECONDS):
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):], maxsize, ttl, table=f"cache_{name}")
+    return MemoryBackend(maxsize, ttl)
+
+
+# ------------------------------
+# Cache front-end with metrics
+# ------------------------------
+class ResponseCache:
+    def __init__(self, name: str, backend=None):
+        self.name = name
+        self.backend = backend if backend is not None else make_backend(name)
+        self.hits = 0
+        self.misses = 0
+
+    async def _call(self, fn, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def get(self, key: str):
+        value = await self._call(self.backend.get, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value):
+        await self._call(self.backend.set, key, value)
+
+    async def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": await self._call(len, self.backend),
+            "max_size": self.backend.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.backend.evictions,
+        }
+
+
+intent_cache = ResponseCache("intent")
+chat_cache = ResponseCache("chat")
@@ -4,6 +4,9 @@ from starlette.templating import Jinja2Templates
 from fastapi import HTTPException
 from fastapi import Request
 from fastapi.responses import RedirectResponse
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
@@ -36,11 +39,10 @@ from fastapi import Request, HTTPException
 
 def require_login(request: Request):
     if "user" not in request.session:
-        print("🚨 No user in session, redirecting")  # debug print
+        logger.debug("🚨 No user in session, redirecting")
         raise HTTPException(
             status_code=303,
             detail="Redirect",
             headers={"Location": "/login"},
         )
-    print("✅ User in session:", request.session["user"])  # debug print
     return request.session["user"]
\ No newline at end of file
@@ -1,50 +1,119 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..database import Booking, Slot, get_db
-from ..helpers import get_slots_sync, get_bookings_sync
-from ..websocket_manager import trigger_broadcast
+import os
+import hashlib
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..database import Booking, get_async_db, to_date
+from ..helpers import (
+    BOOKING_STATUSES, agrid_slots_overlapping, bookings_validators, booking_payload, slot_payload,
+    decode_cursor, get_bookings_page, release_slot, set_booking_status,
+)
+from ..cache import abump_versions
+from ..scheduler import cancel_booking_jobs
+from ..conditional import make_etag, is_fresh, validator_headers
+from ..idempotency import idempotent
+from ..websocket_manager import publish
 
 router = APIRouter(prefix="/api/bookings", tags=["bookings"])
 
-# Get all bookings
+BOOKINGS_PAGE_SIZE = int(os.getenv("BOOKINGS_PAGE_SIZE", "50"))
+BOOKINGS_MAX_PAGE_SIZE = int(os.getenv("BOOKINGS_MAX_PAGE_SIZE", "200"))
+
+
+# ------------------------------
+# Search bookings (filtered, keyset-paginated, ETag / 304 aware)
+# ------------------------------
+# Without a date range this returns upcoming bookings (from today).
+# Pass the returned next_cursor as ?cursor= to fetch the following page.
 @router.get("")
-async def get_bookings(db: Session = Depends(get_db)):
-    return get_bookings_sync(db)
+async def get_bookings(
+    request: Request,
+    date_from: str | None = None,
+    date_to: str | None = None,
+    status: str | None = None,
+    email: str | None = None,
+    cursor: str | None = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+):
+    d_from, d_to = to_date(date_from), to_date(date_to)
+    if (date_from and not d_from) or (date_to and not d_to):
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    if status and status not in BOOKING_STATUSES:
+        raise HTTPException(status_code=400, detail=f"status must be one of {', '.join(BOOKING_STATUSES)}")
+    after = decode_cursor(cursor) if cursor else None
+    if cursor and not after:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not d_from and not d_to:
+        d_from = datetime.now().date()
+
+    filters = dict(date_from=d_from, date_to=d_to, status=status,
+                   email=email.strip() if email else None)
+
+    # Same version + same resolved query = same page
+    version, last_modified = await bookings_validators(db)
+    query_key = repr(sorted({**filters, "after": after, "limit": limit}.items()))
+    etag = make_etag("bookings", version, hashlib.sha1(query_key.encode()).hexdigest()[:12])
+    headers = validator_headers(etag, last_modified, private=True)
+    if is_fresh(request, etag, last_modified):
+        # Answered from the version row alone
+        return Response(status_code=304, headers=headers)
+
+    items, next_cursor = await get_bookings_page(db, limit=limit, after=after, **filters)
+    return JSONResponse({"bookings": items, "next_cursor": next_cursor}, headers=headers)
 
 # Cancel a booking
 @router.post("/{booking_id}/cancel")
-async def cancel_booking(booking_id: str, db: Session = Depends(get_db)):
-    booking = db.query(Booking).filter_by(id=booking_id).first()
+async def cancel_booking(booking_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await idempotent(request, f"booking:{booking_id}:cancel", lambda: _cancel(db, booking_id))
+
+
+async def _cancel(db: AsyncSession, booking_id: str):
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    booking.status = "cancelled"
-    slot = db.query(Slot).filter_by(date=booking.date, time=booking.time).first()
-    if slot:
-        slot.available = True
-
-    db.commit()
+    # Conditional updates: a repeated cancel must not free a slot someone
+    # else has booked since
+    if not await set_booking_status(db, booking_id, "cancelled"):
+        return {"status": "cancelled", "booking_id": booking_id}
+    # Capacity-model bookings hold an interval, not a grid slot
+    freed = booking.resource_id is None and await release_slot(db, booking.date, booking.time)
+    await cancel_booking_jobs(db, booking_id)
+    await abump_versions(db, "slots", "bookings")
+    await db.commit()
+    if freed:
+        freed = [slot_payload(booking.date, booking.time)]
+    elif booking.resource_id is not None:
+        # Grid bridge: slots the interval was hiding, unless another booking still does
+        freed = await agrid_slots_overlapping(db, booking.date, booking.time,
+                                              booking.duration_minutes or 0, free_only=True)
 
-    # 👇 broadcast latest slots + bookings
-    slots = get_slots_sync(db)
-    bookings = get_bookings_sync(db)
-    trigger_broadcast(slots, bookings)
+    # 👇 broadcast the changes
+    publish("booking_status_changed", booking={**booking_payload(booking), "status": "cancelled"})
+    if freed:
+        publish("slot_added", slots=freed)
 
     return {"status": "cancelled", "booking_id": booking_id}
 
 # Mark booking as paid
 @router.post("/{booking_id}/paid")
-async def mark_booking_paid(booking_id: str, db: Session = Depends(get_db)):
-    booking = db.query(Booking).filter_by(id=booking_id).first()
+async def mark_booking_paid(booking_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await idempotent(request, f"booking:{booking_id}:paid", lambda: _mark_paid(db, booking_id))
+
+
+async def _mark_paid(db: AsyncSession, booking_id: str):
+    booking = await db.get(Booking, booking_id)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    booking.status = "paid"
-    db.commit()
+    if not await set_booking_status(db, booking_id, "paid"):
+        return {"status": "paid", "booking_id": booking_id}
+    await abump_versions(db, "bookings")
+    await db.commit()
 
-    # 👇 broadcast latest slots + bookings
-    slots = get_slots_sync(db)
-    bookings = get_bookings_sync(db)
-    trigger_broadcast(slots, bookings)
+    # 👇 broadcast the change
+    publish("booking_status_changed", booking={**booking_payload(booking), "status": "paid"})
 
     return {"status": "paid", "booking_id": booking_id}
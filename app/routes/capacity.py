@@ -0,0 +1,192 @@
+import logging
+from datetime import date, datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import Resource, Service, WorkingHours, to_date, to_time, get_async_db
+from ..models import ResourceIn, ServiceIn, WorkingHoursIn, IntervalBooking
+from ..availability import AVAILABILITY_HORIZON_DAYS, get_capacity, reserve_interval
+from ..helpers import agrid_slots_overlapping, booking_payload
+from ..cache import abump_versions
+from ..idempotency import idempotent
+from ..websocket_manager import publish
+from .auth import require_login
+
+# Logger
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api", tags=["capacity"])
+
+
+# ------------------------------
+# Services
+# ------------------------------
+@router.get("/services")
+async def list_services(db: AsyncSession = Depends(get_async_db)):
+    services = (await db.execute(
+        select(Service).where(Service.active.is_(True)).order_by(Service.name)
+    )).scalars().all()
+    return [{"id": s.id, "name": s.name, "duration_minutes": s.duration_minutes} for s in services]
+
+
+@router.post("/services")
+async def add_service(service: ServiceIn, auth=Depends(require_login),
+                      db: AsyncSession = Depends(get_async_db)):
+    if service.duration_minutes <= 0:
+        raise HTTPException(status_code=400, detail="duration_minutes must be positive")
+    row = Service(name=service.name.strip(), duration_minutes=service.duration_minutes, active=True)
+    db.add(row)
+    await abump_versions(db, "capacity")
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Service already exists")
+    logger.info(f"✅ Service added: {row.name} ({row.duration_minutes} min)")
+    return {"status": "ok", "id": row.id}
+
+
+# ------------------------------
+# Resources (chairs / barbers) and their weekly hours
+# ------------------------------
+def _hours_rows(resource_id: int, hours: list[WorkingHoursIn]):
+    rows = []
+    for h in hours:
+        open_t, close_t = to_time(h.open_time), to_time(h.close_time)
+        if not 0 <= h.weekday <= 6 or not open_t or not close_t or open_t >= close_t:
+            raise HTTPException(status_code=400, detail=f"Invalid working hours: {h}")
+        rows.append(WorkingHours(resource_id=resource_id, weekday=h.weekday,
+                                 open_time=open_t, close_time=close_t))
+    return rows
+
+
+@router.get("/resources")
+async def list_resources(db: AsyncSession = Depends(get_async_db)):
+    resources = (await db.execute(
+        select(Resource).where(Resource.active.is_(True)).order_by(Resource.id)
+    )).scalars().all()
+    hours = (await db.execute(
+        select(WorkingHours).order_by(WorkingHours.weekday, WorkingHours.open_time)
+    )).scalars().all()
+    by_resource: dict[int, list] = {}
+    for h in hours:
+        by_resource.setdefault(h.resource_id, []).append({
+            "weekday": h.weekday,
+            "open_time": h.open_time.strftime("%H:%M"),
+            "close_time": h.close_time.strftime("%H:%M"),
+        })
+    return [{"id": r.id, "name": r.name, "hours": by_resource.get(r.id, [])} for r in resources]
+
+
+@router.post("/resources")
+async def add_resource(resource: ResourceIn, auth=Depends(require_login),
+                       db: AsyncSession = Depends(get_async_db)):
+    row = Resource(name=resource.name.strip(), active=True)
+    db.add(row)
+    await db.flush()
+    db.add_all(_hours_rows(row.id, resource.hours))
+    await abump_versions(db, "capacity")
+    await db.commit()
+    logger.info(f"✅ Resource added: {row.name}")
+    return {"status": "ok", "id": row.id}
+
+
+@router.put("/resources/{resource_id}/hours")
+async def set_resource_hours(resource_id: int, hours: list[WorkingHoursIn],
+                             auth=Depends(require_login), db: AsyncSession = Depends(get_async_db)):
+    if not await db.get(Resource, resource_id):
+        raise HTTPException(status_code=404, detail="Resource not found")
+    rows = _hours_rows(resource_id, hours)
+    await db.execute(delete(WorkingHours).where(WorkingHours.resource_id == resource_id))
+    db.add_all(rows)
+    await abump_versions(db, "capacity")
+    await db.commit()
+    return {"status": "ok", "id": resource_id, "hours": len(rows)}
+
+
+# ------------------------------
+# Availability
+# ------------------------------
+def _service_or_404(capacity, name: str):
+    found = capacity.service(name)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown service: {name}")
+    return found
+
+
+@router.get("/availability")
+async def availability(service: str, date: str, resource_id: int | None = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    """Start times for `service` on one day: {"HH:MM": [resource ids]}."""
+    day = to_date(date)
+    if not day:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {date}")
+    capacity = await get_capacity(db)
+    name, minutes = _service_or_404(capacity, service)
+    return {
+        "service": name,
+        "duration_minutes": minutes,
+        "date": day.isoformat(),
+        "times": capacity.free_starts(day, minutes, resource_id, now=datetime.now()),
+    }
+
+
+@router.get("/availability/first")
+async def first_availability(service: str, after: str | None = None, resource_id: int | None = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    """Earliest window for `service` at or after `after` (ISO datetime, default now)."""
+    now = datetime.now()
+    try:
+        start = max(datetime.fromisoformat(after), now) if after else now
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime: {after}")
+    capacity = await get_capacity(db)
+    name, minutes = _service_or_404(capacity, service)
+    found = capacity.first_free(minutes, start, resource_id)
+    if found is None:
+        return {"service": name, "found": False, "horizon_days": AVAILABILITY_HORIZON_DAYS}
+    day, t, rid = found
+    return {
+        "service": name,
+        "found": True,
+        "date": day.isoformat(),
+        "time": t.strftime("%H:%M"),
+        "resource_id": rid,
+        "resource": capacity.resources.get(rid),
+    }
+
+
+@router.post("/availability/book")
+async def book_interval(req: IntervalBooking, request: Request, db: AsyncSession = Depends(get_async_db)):
+    return await idempotent(request, "availability:book", lambda: _book_interval(db, req))
+
+
+async def _book_interval(db: AsyncSession, req: IntervalBooking):
+    day, t = to_date(req.date), to_time(req.time)
+    if not day or not t:
+        raise HTTPException(status_code=400, detail=f"Invalid date/time: {req.date} {req.time}")
+    if datetime.combine(day, t) <= datetime.now() or day > date.today() + timedelta(days=AVAILABILITY_HORIZON_DAYS):
+        raise HTTPException(status_code=400, detail="Time is outside the booking window")
+
+    try:
+        booking = await reserve_interval(
+            db, req.service, day, t, req.resource_id,
+            customer_name=req.customer_name, customer_email=req.customer_email,
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error booking interval: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    if booking is None:
+        raise HTTPException(status_code=409, detail="That time is no longer available")
+
+    # Grid bridge: the grid slots this booking now covers
+    hidden = await agrid_slots_overlapping(db, day, t, booking.duration_minutes)
+    if hidden:
+        publish("slot_removed", slots=hidden)
+    publish("booking_status_changed", booking=booking_payload(booking))
+    logger.info(f"✅ Booked {booking.service} on resource {booking.resource_id}: {day} {t}")
+    return {"status": "pending", "booking_id": booking.id, "resource_id": booking.resource_id}
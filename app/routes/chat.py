@@ -1,163 +1,400 @@
-import re, json, uuid, ast
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
-from sqlalchemy.orm import Session
+import os, json, ast, logging
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import ChatMessage
-from ..deps import get_db
-from ..config import client
-from ..database import Booking, Slot, to_date, to_time
+from ..deps import get_async_db
+from ..llm import chat_completion, stream_completion, gate
+from ..admission import Overloaded, rate_limited
+from ..database import AsyncSessionLocal, to_date, to_time
 from ..helpers import (
-    clean_expired_slots,
-    clean_stale_bookings,
-    get_slots_sync,
-    get_bookings_sync,
+    create_reservation,
+    get_slots_async,
+    booking_payload,
+    slot_payload,
+    slots_cache,
 )
-from ..websocket_manager import trigger_broadcast
-from ..email_utils import send_email
+from ..streaming import JSONObjectScanner, sse_event
+from ..prompt import AVAILABILITY_TOOLS, MAX_TOOL_ROUNDS, build_system_prompt, run_tool
+from ..response_cache import chat_cache, intent_cache, make_key, normalize_text
+from ..sessions import ChatSession, sessions
+from .. import booking_form
+from ..idempotency import begin, complete, idempotent, release
+from ..websocket_manager import publish
+from .auth import require_login
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Only early turns repeat across customers; later ones carry personal details
+CHAT_CACHE_MAX_HISTORY = int(os.getenv("CHAT_CACHE_MAX_HISTORY", "2"))
 
-@router.post("/chat")
-async def chat_with_agent(
-    user_input: ChatMessage,
-    db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks  # ✅ FastAPI injects automatically
-):
-    try:
-        # ------------------------------
-        # Housekeeping
-        # ------------------------------
-        clean_expired_slots(db)
-        clean_stale_bookings(db)
 
-        # Build slots summary for assistant
-        slots_now = get_slots_sync(db)
-        future_slots = [f"{d} {t}" for d, times in slots_now.items() for t in times]
-        slot_info = ", ".join(future_slots) if future_slots else "No slots available"
+# ------------------------------
+# Shared steps for /chat and /chat/stream
+# ------------------------------
+async def open_session(user_input: ChatMessage):
+    """Server-held session for this turn, or None for clients that send history."""
+    if user_input.history and not user_input.session_id:
+        return None
+    return await sessions.get_or_create(user_input.session_id)
 
-        # ------------------------------
-        # Prompt setup
-        # ------------------------------
-        messages = [
+
+def build_messages(slots_now: dict, user_input: ChatMessage, session: ChatSession | None = None):
+    system = build_system_prompt(slots_now)
+    if session and session.context():
+        system += "\n\n" + session.context()
+    messages = [{"role": "system", "content": system}]
+    if session:
+        messages.extend(session.turns)
+    elif user_input.history:
+        messages.extend(user_input.history)
+    messages.append({"role": "user", "content": user_input.message})
+    return messages
+
+
+async def finish_turn(session: ChatSession | None, user_input: ChatMessage, result: dict):
+    """Record the exchange in the session, store it and tell the client its id."""
+    if session is None:
+        return result
+    session.add_turn("user", user_input.message)
+    session.add_turn("assistant", result["reply"])
+    await sessions.save(session)
+    return {**result, "session_id": session.id}
+
+
+def tool_messages(calls: list[dict], slots_now: dict):
+    """The assistant's tool-call turn followed by one result per call."""
+    return [
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": c["id"],
+                    "type": "function",
+                    "function": {"name": c["name"], "arguments": c["arguments"]},
+                }
+                for c in calls
+            ],
+        },
+        *(
             {
-                "role": "system",
-                "content": (
-                    "You are a polite barbershop assistant. "
-                    f"Available slots are: {slot_info}.\n\n"
-                    "Your task:\n"
-                    "- Collect the customer's name\n"
-                    "- Collect the customer's email\n"
-                    "- Collect a valid available date (YYYY-MM-DD)\n"
-                    "- Collect a valid available time (HH:MM)\n\n"
-                    "Rules:\n"
-                    '- If the user already gave all four (name, email, date, time), respond ONLY with valid JSON:\n'
-                    '{"service":"Haircut","date":"YYYY-MM-DD","time":"HH:MM","customer_name":"NAME","customer_email":"EMAIL"}\n'
-                    "- Use double quotes for all keys and string values.\n"
-                    "- Do NOT add any extra words or formatting. If something is missing, only ask for that piece."
-                ),
+                "role": "tool",
+                "tool_call_id": c["id"],
+                "content": run_tool(c["name"], c["arguments"], slots_now),
             }
+            for c in calls
+        ),
+    ]
+
+
+def tool_options(round_no: int):
+    # Last round forbids further tool calls so the model must answer
+    if round_no == MAX_TOOL_ROUNDS:
+        return {"tools": AVAILABILITY_TOOLS, "tool_choice": "none"}
+    return {"tools": AVAILABILITY_TOOLS}
+
+
+async def complete_with_tools(messages: list[dict], slots_now: dict) -> str:
+    for round_no in range(MAX_TOOL_ROUNDS + 1):
+        response = await chat_completion(messages, **tool_options(round_no))
+        message = response.choices[0].message
+        if not message.tool_calls:
+            return (message.content or "").strip()
+        calls = [
+            {"id": tc.id, "name": tc.function.name, "arguments": tc.function.arguments}
+            for tc in message.tool_calls
         ]
-        if user_input.history:
-            messages.extend(user_input.history)
-        messages.append({"role": "user", "content": user_input.message})
+        messages = messages + tool_messages(calls, slots_now)
+    return ""
+
+
+def chat_cache_key(messages: list[dict]):
+    """Key on availability + normalised turns, or None if the turn isn't cacheable.
+
+    The system prompt embeds the near-term free slots and the slots version
+    covers the rest (reachable through tools), so a cached reply is tied to
+    the availability snapshot it was generated from.
+    """
+    # messages = system prompt + prior turns + current message
+    if len(messages) - 2 > CHAT_CACHE_MAX_HISTORY:
+        return None
+    system, *turns = messages
+    return make_key(
+        make_key(system["content"]),
+        slots_cache.version,
+        [(t.get("role"), normalize_text(t.get("content", ""))) for t in turns],
+    )
+
+
+def first_json_object(reply: str) -> str | None:
+    """The first balanced {...} in a reply (not first-brace-to-last-brace)."""
+    scanner = JSONObjectScanner()
+    scanner.feed(reply)
+    return scanner.obj
+
+
+def parse_booking_json(raw_json: str) -> dict:
+    try:
+        return json.loads(raw_json)
+    except json.JSONDecodeError:
+        return ast.literal_eval(raw_json)
+
+
+async def reserve_booking(db: AsyncSession, booking_data: dict):
+    """Create a pending booking for the requested slot and notify everyone."""
+    # Atomic claim: concurrent chats for the same slot get exactly one winner
+    booking = await create_reservation(
+        db,
+        customer_name=booking_data["customer_name"],
+        service=booking_data["service"],
+        date=to_date(booking_data["date"]),
+        time=to_time(booking_data["time"]),
+        customer_email=booking_data.get("customer_email"),
+    )
+    if booking is None:
+        return {
+            "status": "unavailable",
+            "reply": "❌ Sorry, that slot is not available."
+        }
+    booking_id = booking.id
+
+    logger.info("📩 Booking saved", extra={"booking_id": booking.id})
+
+    # ------------------------------
+    # Broadcast to dashboard
+    # ------------------------------
+    publish("slot_removed", slots=[slot_payload(booking.date, booking.time)])
+    publish("booking_status_changed", booking=booking_payload(booking))
+
+    # Confirmation email was queued in the outbox with the booking
+    return {
+        "status": "reserved",
+        "reply": (
+            f"✅ Reserved! Booking ID: {booking_id} for {booking.customer_name} "
+            f"at {booking.time.strftime('%H:%M')} on {booking.date.isoformat()}."
+        ),
+        "booking_id": booking_id,
+    }
+
+
+async def local_turn(db: AsyncSession, session: ChatSession | None,
+                     user_input: ChatMessage, slots_now: dict):
+    """Answer the turn from the booking form; None means the model is needed."""
+    if session is None:
+        return None
+    action, fields, reply = booking_form.plan_turn(
+        session.fields, user_input.message, slots_now, session.expecting
+    )
+    session.fields = fields
+    booking_form.record(action)
+    if action == "llm":
+        session.expecting = booking_form.after_model(user_input.message, session.expecting)
+        return None
+
+    if action == "ask":
+        session.expecting = booking_form.next_missing(fields)
+        result = {"status": "ok", "reply": reply}
+    else:
+        result = await reserve_booking(db, booking_form.booking_request(fields))
+        # Keep who they are for another booking; the slot is spent either way
+        session.fields = {k: fields[k] for k in ("customer_name", "customer_email")}
+        session.expecting = None if result["status"] == "reserved" else "time"
+    logger.info("🧾 Chat turn answered locally", extra={"action": action})
+    return await finish_turn(session, user_input, result)
+
+
+# ------------------------------
+# Non-streaming chat (fallback)
+# ------------------------------
+@router.post("/chat", dependencies=[Depends(rate_limited("chat", replayable=True))])
+async def chat_with_agent(
+    request: Request,
+    user_input: ChatMessage,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # A retried turn (same Idempotency-Key) replays the first answer
+    return await idempotent(request, "chat", lambda: chat_turn(user_input, db))
+
+
+async def chat_turn(user_input: ChatMessage, db: AsyncSession):
+    try:
+        session = await open_session(user_input)
+        slots_now = await get_slots_async(db)
+        local = await local_turn(db, session, user_input, slots_now)
+        if local:
+            return local
+
+        messages = build_messages(slots_now, user_input, session)
+        cache_key = chat_cache_key(messages)
+        if cache_key:
+            cached = await chat_cache.get(cache_key)
+            if cached:
+                return await finish_turn(session, user_input, cached)
 
         # ------------------------------
         # Call OpenAI
         # ------------------------------
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        reply = (response.choices[0].message.content or "").strip()
+        reply = await complete_with_tools(messages, slots_now)
 
         # ------------------------------
         # Try to extract booking JSON
         # ------------------------------
-        match = re.search(r"\{.*\}", reply, re.DOTALL)
-        if match:
-            raw_json = match.group()
-            try:
-                booking_data = json.loads(raw_json)
-            except json.JSONDecodeError:
-                booking_data = ast.literal_eval(raw_json)
-
-            # Verify slot exists & is available
-            slot_exists = (
-                db.query(Slot)
-                .filter_by(
-                    date=to_date(booking_data["date"]),
-                    time=to_time(booking_data["time"]),
-                    available=True,
-                )
-                .first()
-            )
-            if not slot_exists:
-                return {
-                    "status": "unavailable",
-                    "reply": "❌ Sorry, that slot is not available."
-                }
-
-            # ------------------------------
-            # Create booking
-            # ------------------------------
-            booking_id = str(uuid.uuid4())
-            booking = Booking(
-                id=booking_id,
-                customer_name=booking_data["customer_name"],
-                service=booking_data["service"],
-                date=to_date(booking_data["date"]),
-                time=to_time(booking_data["time"]),
-                status="pending",  # default status
-                customer_email=booking_data.get("customer_email"),
-            )
-            db.add(booking)
-            slot_exists.available = False
-            db.commit()
-            db.refresh(booking)
-
-            print(f"📩 Booking saved: {booking.id}, {booking.customer_email}")
-
-            # ------------------------------
-            # Broadcast to dashboard
-            # ------------------------------
-            updated_slots = get_slots_sync(db)
-            updated_bookings = get_bookings_sync(db)
-            trigger_broadcast(updated_slots, updated_bookings)
-
-            # ------------------------------
-            # Send confirmation email
-            # ------------------------------
-            if booking.customer_email:
-                subject = "Your Barbershop Appointment Confirmation"
-                html = f"""
-                <h2>Hi {booking.customer_name},</h2>
-                <p>Your {booking.service} is booked for 
-                {booking.date} at {booking.time.strftime('%H:%M')}.</p>
-                <p>We look forward to seeing you! 💈</p>
-                """
-                background_tasks.add_task(
-                    send_email,
-                    booking.customer_email,
-                    subject,
-                    html
-                )
-                print(f"📧 Email queued for {booking.customer_email}")
-
-            return {
-                "status": "reserved",
-                "reply": (
-                    f"✅ Reserved! Booking ID: {booking_id} for {booking.customer_name} "
-                    f"at {booking.time.strftime('%H:%M')} on {booking.date.isoformat()}."
-                ),
-                "booking_id": booking_id,
-            }
+        raw_json = first_json_object(reply)
+        if raw_json:
+            booking_data = parse_booking_json(raw_json)
+            result = await reserve_booking(db, booking_data)
+            return await finish_turn(session, user_input, result)
 
         # ------------------------------
         # No JSON → just ask for missing info
         # ------------------------------
-        return {"status": "ok", "reply": reply}
+        result = {"status": "ok", "reply": reply}
+        if cache_key:
+            await chat_cache.set(cache_key, result)
+        return await finish_turn(session, user_input, result)
 
+    except Overloaded:
+        raise
     except Exception as e:
-        print("❌ Chat error:", e)
+        logger.exception("❌ Chat error")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+# ------------------------------
+# Streaming chat (SSE)
+# ------------------------------
+def sse_reply(result: dict, headers: dict | None = None):
+    """A whole answer as one `token` event and the `done` event."""
+    async def events():
+        yield sse_event({"type": "token", "text": result.get("reply", "")})
+        yield sse_event({"type": "done", **result})
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", **(headers or {})})
+
+
+@router.post("/chat/stream", dependencies=[Depends(rate_limited("chat", replayable=True))])
+async def chat_stream(
+    request: Request,
+    user_input: ChatMessage,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Forward reply tokens as SSE `token` events, then one `done` event.
+
+    The `done` event carries the same fields as the /chat response. A
+    booking JSON object is never shown to the user: it is reserved as soon
+    as its closing brace arrives and the rest of the stream is dropped.
+    Shares its Idempotency-Key scope with /chat, the client's fallback.
+    """
+    record_key, stored = await begin(request, "chat")
+    if stored is not None:
+        status_code, body = stored
+        if status_code != 200:
+            raise HTTPException(status_code=status_code, detail=body.get("detail"))
+        return sse_reply(body, {"Idempotent-Replayed": "true"})
+
+    try:
+        session = await open_session(user_input)
+        slots_now = await get_slots_async(db)
+        local = await local_turn(db, session, user_input, slots_now)
+    except BaseException:
+        if record_key:
+            await release(record_key)
+        raise
+    if local:
+        if record_key:
+            await complete(record_key, 200, local)
+        return sse_reply(local)
+
+    messages = build_messages(slots_now, user_input, session)
+    cache_key = chat_cache_key(messages)
+    cached = await chat_cache.get(cache_key) if cache_key else None
+    if not cached:
+        # Once the stream has started, overload can only be an error event
+        try:
+            gate.check()
+        except Overloaded:
+            if record_key:
+                await release(record_key)
+            raise
+
+    async def events():
+        done = None
+        try:
+            async for event in turn_events():
+                if event.get("type") == "done":
+                    done = {k: v for k, v in event.items() if k != "type"}
+                    if record_key:
+                        # Stored before the client sees it: a retry after a
+                        # dropped connection must not book twice
+                        await complete(record_key, 200, done)
+                yield sse_event(event)
+        finally:
+            if record_key and done is None:
+                await release(record_key)
+
+    async def turn_events():
+        if cached:
+            yield {"type": "token", "text": cached["reply"]}
+            yield {"type": "done", **await finish_turn(session, user_input, cached)}
+            return
+
+        scanner = JSONObjectScanner()
+        shown = []
+        try:
+            turn = messages
+            for round_no in range(MAX_TOOL_ROUNDS + 1):
+                calls = None
+                stream = stream_completion(turn, **tool_options(round_no))
+                try:
+                    async for delta in stream:
+                        if isinstance(delta, list):
+                            calls = delta
+                            break
+                        visible = scanner.feed(delta)
+                        if visible:
+                            shown.append(visible)
+                            yield {"type": "token", "text": visible}
+                        if scanner.obj is not None:
+                            break
+                finally:
+                    await stream.aclose()
+                if not calls:
+                    break
+                turn = turn + tool_messages(calls, slots_now)
+
+            if scanner.obj is None:
+                reply = ("".join(shown) + scanner.pending).strip()
+                result = {"status": "ok", "reply": reply}
+                if cache_key and not scanner.started:
+                    await chat_cache.set(cache_key, result)
+                yield {"type": "done", **await finish_turn(session, user_input, result)}
+                return
+
+            booking_data = parse_booking_json(scanner.obj)
+            # The request-scoped session may already be closed while streaming
+            async with AsyncSessionLocal() as db_session:
+                result = await reserve_booking(db_session, booking_data)
+            yield {"type": "done", **await finish_turn(session, user_input, result)}
+
+        except Exception as e:
+            logger.exception("❌ Chat stream error")
+            yield {"type": "error", "detail": f"Error: {str(e)}"}
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------------------------
+# Cache metrics
+# ------------------------------
+@router.get("/chat/cache/stats")
+async def cache_stats(auth=Depends(require_login)):
+    return {"chat": await chat_cache.stats(), "intent": await intent_cache.stats(), "form": dict(booking_form.stats)}
@@ -1,24 +1,49 @@
-from fastapi import APIRouter, Body
-from ..config import client
+from fastapi import APIRouter, Body, Depends
+from ..llm import chat_completion
+from ..admission import Overloaded, rate_limited
+from .. import intent_rules
+from .auth import require_login
+from ..response_cache import intent_cache, make_key, normalize_text
 
 router = APIRouter()
 
-@router.post("/intent")
+@router.post("/intent", dependencies=[Depends(rate_limited("intent"))])
 async def detect_intent(payload: dict = Body(...)):
     message = payload.get("message", "")
     if not message:
         return {"intent": "unknown"}
+
+    # Fast path: obvious messages never reach the LLM
+    intent, _, source = intent_rules.classify(message)
+    if intent:
+        intent_rules.record(source)
+        return {"intent": intent}
+
+    cache_key = make_key(normalize_text(message))
+    cached = await intent_cache.get(cache_key)
+    if cached:
+        intent_rules.record("cache")
+        return {"intent": cached}
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
+        response = await chat_completion(
+            [
                 {"role": "system", "content": "You are an intent classifier. Decide if the user wants to BOOK an appointment (haircut). Answer only 'book' or 'other'."},
                 {"role": "user", "content": message}
-            ]
+            ],
+            timeout=10,
         )
         intent = response.choices[0].message.content.strip().lower()
-        if "book" in intent:
-            return {"intent": "book"}
-        return {"intent": "other"}
+        intent = "book" if "book" in intent else "other"
+        await intent_cache.set(cache_key, intent)
+        intent_rules.record("llm", intent_rules.guess(message), intent)
+        return {"intent": intent}
+    except Overloaded:
+        raise
     except Exception as e:
         return {"intent": "error", "detail": str(e)}
+
+
+@router.get("/intent/stats")
+async def intent_stats(auth=Depends(require_login)):
+    return intent_rules.snapshot()
@@ -1,11 +1,16 @@
 import logging
-from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
-
-from ..database import Slot, to_date, to_time, get_db
-from ..helpers import get_slots_sync, get_bookings_sync
-from ..websocket_manager import trigger_broadcast
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, select
+
+from ..database import Slot, to_date, to_time, get_async_db
+from ..helpers import (
+    slots_validators, slot_payload, expand_slot_range, bulk_add_slots, bulk_remove_slots,
+)
+from ..models import SlotRange
+from ..conditional import make_etag, conditional_json
+from ..cache import abump_versions
+from ..websocket_manager import publish
 
 # Logger
 logger = logging.getLogger(__name__)
@@ -14,13 +19,13 @@ router = APIRouter(prefix="/api/slots", tags=["slots"])
 
 
 # ------------------------------
-# Get all available slots
+# Get all available slots (ETag / 304 aware)
 # ------------------------------
 @router.get("")
-async def get_slots(db: Session = Depends(get_db)):
+async def get_slots(request: Request, db: AsyncSession = Depends(get_async_db)):
     try:
-        slots = get_slots_sync(db)
-        return slots
+        slots, parts, last_modified = await slots_validators(db)
+        return conditional_json(request, slots, make_etag("slots", *parts), last_modified)
     except Exception as e:
         logger.error(f"Error fetching slots: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch slots")
@@ -30,7 +35,7 @@ async def get_slots(db: Session = Depends(get_db)):
 # Add a new slot
 # ------------------------------
 @router.post("")
-async def add_slot(slot: dict = Body(...), db: Session = Depends(get_db)):
+async def add_slot(slot: dict = Body(...), db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Received add_slot request: {slot}")
 
     d = to_date(slot.get("date"))
@@ -43,20 +48,19 @@ async def add_slot(slot: dict = Body(...), db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Please select a valid time")
 
     try:
-        existing = db.query(Slot).filter(
-            and_(Slot.date == d, Slot.time == t)
-        ).first()
+        existing = (await db.execute(
+            select(Slot).where(and_(Slot.date == d, Slot.time == t))
+        )).scalars().first()
         if existing:
             raise HTTPException(status_code=400, detail="Slot already exists")
 
         new_slot = Slot(date=d, time=t, available=True)
         db.add(new_slot)
-        db.commit()
+        await abump_versions(db, "slots")
+        await db.commit()
 
-        # Broadcast updated state
-        slots = get_slots_sync(db)
-        bookings = get_bookings_sync(db)
-        trigger_broadcast(slots, bookings)
+        # Broadcast the change
+        publish("slot_added", slots=[slot_payload(d, t)])
 
         logger.info(f"✅ Slot added successfully: {d} {t}")
         return {"status": "ok"}
@@ -64,7 +68,7 @@ async def add_slot(slot: dict = Body(...), db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error adding slot: {e}")
         raise HTTPException(status_code=500, detail="Database error")
 
@@ -73,7 +77,7 @@ async def add_slot(slot: dict = Body(...), db: Session = Depends(get_db)):
 # Delete a slot
 # ------------------------------
 @router.delete("")
-async def delete_slot(date: str, time: str, db: Session = Depends(get_db)):
+async def delete_slot(date: str, time: str, db: AsyncSession = Depends(get_async_db)):
     logger.info(f"Received delete_slot request: {date} {time}")
 
     d = to_date(date)
@@ -85,21 +89,20 @@ async def delete_slot(date: str, time: str, db: Session = Depends(get_db)):
         )
 
     try:
-        slot = db.query(Slot).filter(
-            and_(Slot.date == d, Slot.time == t)
-        ).first()
+        slot = (await db.execute(
+            select(Slot).where(and_(Slot.date == d, Slot.time == t))
+        )).scalars().first()
 
         if not slot:
             logger.warning(f"❌ Slot not found: {d} {t}")
             raise HTTPException(status_code=404, detail="Slot not found")
 
-        db.delete(slot)
-        db.commit()
+        await db.delete(slot)
+        await abump_versions(db, "slots")
+        await db.commit()
 
-        # Broadcast updated state
-        slots = get_slots_sync(db)
-        bookings = get_bookings_sync(db)
-        trigger_broadcast(slots, bookings)
+        # Broadcast the change
+        publish("slot_removed", slots=[slot_payload(d, t)])
 
         logger.info(f"🗑️ Slot deleted successfully: {d} {t}")
         return {"status": "deleted"}
@@ -107,6 +110,54 @@ async def delete_slot(date: str, time: str, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error deleting slot: {e}")
         raise HTTPException(status_code=500, detail="Database error")
+
+
+# ------------------------------
+# Bulk: open or close a recurring range of slots
+# ------------------------------
+def _expand(slot_range: SlotRange):
+    try:
+        return expand_slot_range(slot_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/bulk")
+async def add_slots_bulk(slot_range: SlotRange, db: AsyncSession = Depends(get_async_db)):
+    pairs = _expand(slot_range)
+    try:
+        created = await bulk_add_slots(db, pairs)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error adding slots in bulk: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    # One broadcast for the whole range
+    if created:
+        publish("slot_added", slots=created)
+
+    logger.info(f"✅ Bulk add: {len(created)} created, {len(pairs) - len(created)} skipped")
+    return {"status": "ok", "requested": len(pairs), "created": len(created),
+            "skipped": len(pairs) - len(created)}
+
+
+@router.delete("/bulk")
+async def delete_slots_bulk(slot_range: SlotRange, db: AsyncSession = Depends(get_async_db)):
+    # Booked slots are left alone
+    pairs = _expand(slot_range)
+    try:
+        removed = await bulk_remove_slots(db, pairs)
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error deleting slots in bulk: {e}")
+        raise HTTPException(status_code=500, detail="Database error")
+
+    if removed:
+        publish("slot_removed", slots=removed)
+
+    logger.info(f"🗑️ Bulk delete: {len(removed)} removed")
+    return {"status": "deleted", "requested": len(pairs), "deleted": len(removed),
+            "skipped": len(pairs) - len(removed)}
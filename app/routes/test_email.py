@@ -1,11 +1,13 @@
-from fastapi import APIRouter
-from ..email_utils import send_email
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..deps import get_async_db
+from ..outbox import enqueue_email
 
 router = APIRouter(prefix="/test", tags=["test"])
 
 
 @router.get("/email")
-async def test_email():
+async def test_email(db: AsyncSession = Depends(get_async_db)):
     subject = "📧 Test Email from Barbershop Booking"
     html = """
     <h2>✅ Test Successful!</h2>
@@ -16,8 +18,8 @@ async def test_email():
     # ⚠️ Replace with your verified email in SendGrid
     to_email = "your_verified_email@example.com"
 
-    response = send_email(to_email, subject, html)
-
-    if response:
-        return {"status": "sent", "to": to_email}
-    return {"status": "failed", "error": "Could not send email"}
+    # Goes through the outbox like every other email; the outbox worker
+    # sends it (see /api/outbox/stats for the result)
+    message = enqueue_email(db, to_email, subject, html)
+    await db.commit()
+    return {"status": "queued", "to": to_email, "id": message.id}
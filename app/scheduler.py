@@ -0,0 +1,133 @@
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime
+from sqlalchemy import select, update
+
+from .database import AsyncSessionLocal, Booking, ScheduledJob
+from .email_utils import booking_reminder, booking_follow_up
+from .outbox import enqueue_email
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Settings
+# ------------------------------
+REMINDER_HOURS = [int(h) for h in os.getenv("REMINDER_HOURS", "24,2").split(",") if h.strip()]
+FOLLOW_UP_HOURS = float(os.getenv("FOLLOW_UP_HOURS", "3"))   # after the start time; <0 disables
+SCHEDULER_POLL_SECONDS = float(os.getenv("SCHEDULER_POLL_SECONDS", "30"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "200"))
+
+
+def booking_start(booking) -> float:
+    """Appointment start as epoch seconds (dates/times are shop-local)."""
+    return datetime.combine(booking.date, booking.time).timestamp()
+
+
+# ------------------------------
+# Scheduling (inside the booking transaction)
+# ------------------------------
+def schedule_booking_jobs(db, booking, now: float | None = None):
+    """Add reminder and follow-up rows for a new booking to the caller's transaction."""
+    if not booking.customer_email or not booking.date or not booking.time:
+        return
+    now = now or time.time()
+    start = booking_start(booking)
+    for hours in REMINDER_HOURS:
+        run_at = start - hours * 3600
+        if run_at > now:   # booked too late for this reminder
+            db.add(ScheduledJob(booking_id=booking.id, kind=f"reminder_{hours}h", run_at=run_at))
+    if FOLLOW_UP_HOURS >= 0:
+        db.add(ScheduledJob(booking_id=booking.id, kind="follow_up",
+                            run_at=start + FOLLOW_UP_HOURS * 3600))
+
+
+async def cancel_booking_jobs(db, booking_id: str):
+    """Drop the pending jobs of a cancelled booking (caller commits)."""
+    await db.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.booking_id == booking_id, ScheduledJob.status == "pending")
+        .values(status="cancelled")
+        .execution_options(synchronize_session=False)
+    )
+
+
+# ------------------------------
+# Running due jobs
+# ------------------------------
+def _email_for(job, booking, now: float):
+    """(subject, html) for a job, or None if it no longer makes sense."""
+    if booking is None or booking.status == "cancelled" or not booking.customer_email:
+        return None
+    if job.kind == "follow_up":
+        return booking_follow_up(booking)
+    if booking_start(booking) <= now:
+        # Reminder is late (e.g. the app was down) and the visit has started
+        return None
+    return booking_reminder(booking, int(job.kind.removeprefix("reminder_").rstrip("h")))
+
+
+async def run_due_jobs(db, limit: int = SCHEDULER_BATCH_SIZE, now: float | None = None) -> int:
+    """Claim and run up to `limit` due jobs in one transaction.
+
+    Cost depends on `limit`, not on how many jobs are waiting: the due rows
+    are the head of the (status, run_at) index. The conditional UPDATE
+    means that when workers race for a job only one gets it, and its
+    email enters the outbox in that same transaction.
+    """
+    now = now or time.time()
+    ids = (await db.execute(
+        select(ScheduledJob.id)
+        .where(ScheduledJob.status == "pending", ScheduledJob.run_at <= now)
+        .order_by(ScheduledJob.run_at)
+        .limit(limit)
+    )).scalars().all()
+    if not ids:
+        return 0
+
+    claimed = (await db.execute(
+        update(ScheduledJob)
+        .where(ScheduledJob.id.in_(ids), ScheduledJob.status == "pending")
+        .values(status="done")
+        .returning(ScheduledJob.id, ScheduledJob.booking_id, ScheduledJob.kind)
+        .execution_options(synchronize_session=False)
+    )).all()
+    bookings = {
+        b.id: b for b in (await db.execute(
+            select(Booking).where(Booking.id.in_({job.booking_id for job in claimed}))
+        )).scalars()
+    }
+
+    skipped = []
+    for job in claimed:
+        email = _email_for(job, bookings.get(job.booking_id), now)
+        if email is None:
+            skipped.append(job.id)
+        else:
+            enqueue_email(db, bookings[job.booking_id].customer_email, *email)
+    if skipped:
+        await db.execute(
+            update(ScheduledJob)
+            .where(ScheduledJob.id.in_(skipped))
+            .values(status="skipped")
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+
+    if len(claimed) > len(skipped):
+        logger.info(f"⏰ Queued {len(claimed) - len(skipped)} reminder emails ({len(skipped)} skipped)")
+    return len(claimed)
+
+
+async def run_scheduler(interval: float = SCHEDULER_POLL_SECONDS):
+    """Background loop: one indexed poll per tick, back to back while busy."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                ran = await run_due_jobs(db)
+        except Exception as e:
+            logger.error(f"Scheduler error: {e}")
+            ran = 0
+        if ran < SCHEDULER_BATCH_SIZE:
+            await asyncio.sleep(interval)
@@ -0,0 +1,156 @@
+"""Server-held chat sessions.
+
+Each session keeps the last SESSION_MAX_TURNS messages verbatim, folds
+older ones into a rolling summary capped at SESSION_SUMMARY_CHARS, and
+carries the booking form filled in by booking_form.py. The prompt built
+from a session therefore stays the same size however long the conversation runs.
+
+With SESSION_BACKEND:
+
+- "db" (default): one chat_sessions row per session, read at the start of
+  a turn and written at its end, so a conversation can move between
+  workers. Rows idle for SESSION_TTL_SECONDS are purged by the sweeper.
+- "memory": worker memory, least recently used dropped beyond
+  SESSION_MAX_COUNT. Only for a single worker.
+
+An id the store doesn't know (expired, from another deployment, made up)
+gets a fresh server-minted session; the client adopts the returned id.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from sqlalchemy import delete
+
+from .database import AsyncSessionLocal, ChatSessionRecord
+
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "db")   # "db" or "memory"
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", "5000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "6"))
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "600"))
+
+
+class ChatSession:
+    def __init__(self, session_id: str):
+        self.id = session_id
+        self.turns: deque[dict] = deque()
+        self.summary = ""
+        self.fields: dict[str, str] = {}      # booking form, see booking_form.py
+        self.expecting: str | None = None     # field the last reply asked for
+        self.last_seen = time.monotonic()
+
+    def add_turn(self, role: str, content: str):
+        self.turns.append({"role": role, "content": content})
+        while len(self.turns) > SESSION_MAX_TURNS:
+            old = self.turns.popleft()
+            line = f"{old['role']}: {' '.join(old['content'].split())[:120]}"
+            self.summary = f"{self.summary} | {line}" if self.summary else line
+            self.summary = self.summary[-SESSION_SUMMARY_CHARS:]
+
+    def to_json(self) -> str:
+        return json.dumps({"turns": list(self.turns), "summary": self.summary,
+                           "fields": self.fields, "expecting": self.expecting})
+
+    @classmethod
+    def from_json(cls, session_id: str, raw: str) -> "ChatSession":
+        data = json.loads(raw)
+        session = cls(session_id)
+        session.turns.extend(data.get("turns", []))
+        session.summary = data.get("summary", "")
+        session.fields = data.get("fields", {})
+        session.expecting = data.get("expecting")
+        return session
+
+    def context(self) -> str:
+        """Extra system-prompt text: known fields and earlier conversation."""
+        parts = []
+        if self.fields:
+            known = ", ".join(f"{k}={v}" for k, v in sorted(self.fields.items()))
+            parts.append(f"Already collected: {known}.")
+        if self.summary:
+            parts.append(f"Earlier in this conversation: {self.summary}")
+        return "\n".join(parts)
+
+
+def _new_session() -> ChatSession:
+    return ChatSession(uuid.uuid4().hex)
+
+
+class MemorySessionStore:
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS, max_count: int = SESSION_MAX_COUNT):
+        self.ttl = ttl
+        self.max_count = max_count
+        self._sessions: OrderedDict[str, ChatSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get_or_create(self, session_id: str | None = None) -> ChatSession:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = _new_session()
+                self._sessions[session.id] = session
+                while len(self._sessions) > self.max_count:
+                    self._sessions.popitem(last=False)
+            self._sessions.move_to_end(session.id)
+            session.last_seen = now
+            return session
+
+    async def save(self, session: ChatSession):
+        pass   # the stored object was updated in place
+
+    def _expire(self, now: float):
+        # Oldest-first order means we can stop at the first live session
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_seen < self.ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class DBSessionStore:
+    """Sessions in the app database: one primary-key read and one write per turn."""
+
+    def __init__(self, ttl: float = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+
+    async def get_or_create(self, session_id: str | None = None) -> ChatSession:
+        if session_id:
+            async with AsyncSessionLocal() as db:
+                row = await db.get(ChatSessionRecord, session_id)
+            if row is not None and row.updated_at >= time.time() - self.ttl:
+                return ChatSession.from_json(row.id, row.state)
+        return _new_session()
+
+    async def save(self, session: ChatSession):
+        async with AsyncSessionLocal() as db:
+            await db.merge(ChatSessionRecord(id=session.id, state=session.to_json(), updated_at=time.time()))
+            await db.commit()
+
+
+def purge_expired(db, now: float | None = None) -> int:
+    """Delete sessions idle past their TTL (sync, for the sweeper)."""
+    now = now or time.time()
+    result = db.execute(
+        delete(ChatSessionRecord)
+        .where(ChatSessionRecord.updated_at < now - SESSION_TTL_SECONDS)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def make_session_store():
+    if SESSION_BACKEND == "memory":
+        return MemorySessionStore()
+    return DBSessionStore()
+
+
+sessions = make_session_store()
@@ -0,0 +1,69 @@
+import json
+
+
+def sse_event(payload: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+class JSONObjectScanner:
+    """Finds the first top-level `{...}` object in a streamed reply.
+
+    `feed()` returns the text that is safe to show the user (everything
+    before the opening brace). Once the matching closing brace arrives,
+    `obj` holds the raw object text and further input is ignored. Braces
+    inside string literals are skipped, so values like "{name}" don't
+    confuse the depth count.
+    """
+
+    def __init__(self):
+        self.obj: str | None = None
+        self._buf: list[str] = []
+        self._depth = 0
+        self._in_string = False
+        self._quote = ""
+        self._escape = False
+
+    @property
+    def started(self) -> bool:
+        return self._depth > 0 or self.obj is not None
+
+    def feed(self, chunk: str) -> str:
+        if self.obj is not None:
+            return ""
+
+        visible = []
+        for ch in chunk:
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf.append(ch)
+                else:
+                    visible.append(ch)
+                continue
+
+            self._buf.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == self._quote:
+                    self._in_string = False
+            elif ch in ("'", '"'):
+                # single quotes too: the reply may be a Python-style dict
+                self._in_string = True
+                self._quote = ch
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.obj = "".join(self._buf)
+                    break
+        return "".join(visible)
+
+    @property
+    def pending(self) -> str:
+        """Buffered text of an object that never closed."""
+        return "".join(self._buf) if self.obj is None else ""
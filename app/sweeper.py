@@ -0,0 +1,48 @@
+import os
+import asyncio
+import logging
+
+from .database import SessionLocal
+from .helpers import clean_expired_slots, clean_stale_bookings
+from .idempotency import purge_expired
+from .sessions import purge_expired as purge_expired_sessions
+from .websocket_manager import publish
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL_SECONDS = float(os.getenv("SWEEP_INTERVAL_SECONDS", "60"))
+
+
+def sweep_once():
+    """Run one cleanup pass in its own session.
+
+    Returns (expired slots, slots freed by stale bookings, stale bookings deleted).
+    """
+    db = SessionLocal()
+    try:
+        expired = clean_expired_slots(db)
+        freed, stale = clean_stale_bookings(db)
+        purge_expired(db)
+        purge_expired_sessions(db)
+        return expired, freed, stale
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_sweeper(interval: float = SWEEP_INTERVAL_SECONDS):
+    """Background loop: sweep on a fixed interval without blocking the event loop."""
+    while True:
+        try:
+            expired, freed, stale = await asyncio.to_thread(sweep_once)
+            if expired:
+                publish("slot_removed", slots=expired)
+            if freed:
+                publish("slot_added", slots=freed)
+            if expired or stale:
+                logger.info(f"🧹 Swept {len(expired)} expired slots, {stale} stale bookings")
+        except Exception as e:
+            logger.error(f"Sweeper error: {e}")
+        await asyncio.sleep(interval)
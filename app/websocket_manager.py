@@ -1,37 +1,263 @@
-from fastapi import WebSocket, WebSocketDisconnect
+import os
+import json
+import time
+import uuid
 import asyncio
+import logging
+from collections import Counter, deque
+from fastapi import WebSocket, WebSocketDisconnect
+
+from .database import AsyncSessionLocal
+from .helpers import get_slots_async, get_bookings_async
+from .pubsub import backplane
+from .metrics import WS_BROADCAST_LATENCY, WS_CONNECTIONS, WS_EVICTIONS, WS_SEND_LATENCY
+
+# ------------------------------
+# Versioned event streams, one per topic
+# ------------------------------
+# Every mutation publishes a small typed delta:
+#   {"seq": 12, "type": "slot_added",   "slots": [{"date": ..., "time": ...}]}
+#   {"seq": 13, "type": "slot_removed", "slots": [...]}
+#   {"seq": 14, "type": "booking_status_changed", "booking": {...}}
+# Deltas travel through the pub/sub backplane so every worker receives
+# them in the same order. Each topic numbers the deltas it carries:
+#   public - availability only (chat visitors)
+#   admin  - everything, including customer bookings (dashboard)
+# A client that sees a gap sends {"type": "resync", "since": N, "epoch": E}
+# and gets the missed deltas, or a full snapshot if they're gone or it is
+# talking to a different worker (epoch mismatch).
+EVENT_LOG_SIZE = int(os.getenv("EVENT_LOG_SIZE", "500"))
+WS_QUEUE_SIZE = int(os.getenv("WS_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+
+logger = logging.getLogger(__name__)
+
+# Identifies this worker's sequence numbering
+EPOCH = uuid.uuid4().hex[:12]
+
+
+class Topic:
+    def __init__(self, name: str, event_types: set[str] | None = None):
+        self.name = name
+        self.event_types = event_types   # None = every event
+        self.seq = 0
+        self.log: deque[dict] = deque(maxlen=EVENT_LOG_SIZE)
+
+    def accepts(self, event_type: str) -> bool:
+        return self.event_types is None or event_type in self.event_types
+
+    def append(self, delta: dict) -> dict:
+        self.seq += 1
+        event = {"seq": self.seq, **delta}
+        self.log.append(event)
+        return event
+
+    def events_since(self, seq: int):
+        """Deltas after `seq`, or None if the log no longer covers that gap."""
+        if seq == self.seq:
+            return []
+        if seq > self.seq or not self.log or seq < self.log[0]["seq"] - 1:
+            return None
+        return [e for e in self.log if e["seq"] > seq]
+
+
+TOPICS = {
+    "public": Topic("public", {"slot_added", "slot_removed"}),
+    "admin": Topic("admin"),
+}
+
+
+def publish(event_type: str, **data):
+    """Send a delta to every worker without blocking the API response."""
+    backplane.send({"type": event_type, **data})
+
+
+def deliver(delta: dict):
+    """Backplane callback: number the delta per topic and fan it out."""
+    for topic in TOPICS.values():
+        if topic.accepts(delta["type"]):
+            start = time.perf_counter()
+            event = topic.append(delta)
+            registry.fan_out(topic.name, json.dumps(event))
+            WS_BROADCAST_LATENCY.labels(topic.name).observe(time.perf_counter() - start)
+
+
+def resync_all():
+    """Backplane callback after a LISTEN outage: deltas may be missing, so
+    every client gets a fresh snapshot (one DB read per topic)."""
+    asyncio.create_task(_resync_all())
+
+
+async def _resync_all():
+    for topic in TOPICS.values():
+        conns = registry.connections(topic.name)
+        if not conns:
+            continue
+        text = json.dumps(await snapshot(topic))
+        for conn in conns:
+            if not conn.offer(text):
+                registry.evict(conn, reason="queue_full")
+
+
+backplane.subscribe(deliver, on_gap=resync_all)
+
+
+async def snapshot(topic: Topic):
+    # Read seq first: deltas racing with the DB read are re-applied, and
+    # applying slot/booking deltas twice is harmless
+    seq = topic.seq
+    async with AsyncSessionLocal() as db:
+        result = {"type": "snapshot", "epoch": EPOCH, "seq": seq,
+                  "slots": await get_slots_async(db)}
+        if topic.accepts("booking_status_changed"):
+            result["bookings"] = await get_bookings_async(db)
+    return result
+
 
-active_connections: list[WebSocket] = []
+# ------------------------------
+# Connections: one bounded queue + writer task per socket
+# ------------------------------
+class Connection:
+    def __init__(self, websocket: WebSocket, topic: Topic, registry: "ConnectionRegistry"):
+        self.ws = websocket
+        self.topic = topic
+        self.registry = registry
+        self.queue: asyncio.Queue[tuple[str, float]] = asyncio.Queue(maxsize=WS_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write())
 
-async def connect_ws(websocket: WebSocket):
+    def offer(self, text: str) -> bool:
+        """Queue a serialised message; False means this consumer is too slow."""
+        try:
+            self.queue.put_nowait((text, time.perf_counter()))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def _write(self):
+        try:
+            while True:
+                text, queued_at = await self.queue.get()
+                await asyncio.wait_for(self.ws.send_text(text), WS_SEND_TIMEOUT_SECONDS)
+                self.registry.record_send(time.perf_counter() - queued_at)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.info(f"WebSocket writer stopped: {e!r}")
+            self.registry.evict(self, reason="send_failed")
+
+
+class ConnectionRegistry:
+    def __init__(self):
+        self._connections: dict[WebSocket, Connection] = {}
+        self.counters = Counter()
+        self.send_seconds_max = 0.0
+
+    def add(self, websocket: WebSocket, topic: Topic) -> Connection:
+        conn = Connection(websocket, topic, self)
+        self._connections[websocket] = conn
+        self.counters["connected"] += 1
+        WS_CONNECTIONS.labels(topic.name).inc()
+        return conn
+
+    def remove(self, websocket: WebSocket):
+        conn = self._connections.pop(websocket, None)
+        if conn:
+            conn.writer.cancel()
+            self.counters["disconnected"] += 1
+            WS_CONNECTIONS.labels(conn.topic.name).dec()
+
+    def evict(self, conn: Connection, reason: str):
+        if self._connections.pop(conn.ws, None) is None:
+            return
+        self.counters[f"evicted_{reason}"] += 1
+        WS_EVICTIONS.labels(reason).inc()
+        WS_CONNECTIONS.labels(conn.topic.name).dec()
+        conn.writer.cancel()
+        asyncio.create_task(self._close(conn.ws))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await websocket.close(code=1013)  # "try again later"
+        except Exception:
+            pass
+
+    def connections(self, topic: str) -> list[Connection]:
+        # A copy: evict() mutates the dict
+        return [c for c in self._connections.values() if c.topic.name == topic]
+
+    def fan_out(self, topic: str, text: str):
+        for conn in self.connections(topic):
+            if not conn.offer(text):
+                self.evict(conn, reason="queue_full")
+
+    def record_send(self, seconds: float):
+        self.counters["sends"] += 1
+        self.counters["send_seconds_total"] += seconds
+        WS_SEND_LATENCY.observe(seconds)
+        self.send_seconds_max = max(self.send_seconds_max, seconds)
+
+    def stats(self):
+        depths = [c.queue.qsize() for c in self._connections.values()]
+        sends = self.counters["sends"]
+        return {
+            **self.counters,
+            "connections": len(self._connections),
+            **{
+                f"connections_{name}": sum(c.topic.name == name for c in self._connections.values())
+                for name in TOPICS
+            },
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "send_seconds_avg": self.counters["send_seconds_total"] / sends if sends else 0.0,
+            "send_seconds_max": self.send_seconds_max,
+        }
+
+    def __len__(self):
+        return len(self._connections)
+
+
+registry = ConnectionRegistry()
+
+
+async def connect_ws(websocket: WebSocket, topic: str = "public"):
     await websocket.accept()
-    active_connections.append(websocket)
+    conn = registry.add(websocket, TOPICS[topic])
     try:
         while True:
             try:
                 # Wait for a message with a timeout
-                await asyncio.wait_for(websocket.receive_text(), timeout=30)
+                raw = await asyncio.wait_for(websocket.receive_text(), timeout=30)
             except asyncio.TimeoutError:
                 # Send ping to keep connection alive
-                await websocket.send_json({"type": "ping"})
-    except WebSocketDisconnect:
-        if websocket in active_connections:
-            active_connections.remove(websocket)
-async def broadcast_update(slots, bookings):
-    print(f"📡 Broadcasting update: {len(active_connections)} connections")
-    payload = {"slots": slots, "bookings": bookings}
-    to_remove = []
-    for ws in active_connections:
-        try:
-            await ws.send_json(payload)
-            print("✅ Sent update to client")
-        except Exception as e:
-            print("❌ Failed to send update:", e)
-            to_remove.append(ws)
-    for ws in to_remove:
-        active_connections.remove(ws)
+                conn.offer(json.dumps({"type": "ping"}))
+                continue
+            handle_client_message(conn, raw)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        registry.remove(websocket)
+
+
+def handle_client_message(conn: Connection, raw: str):
+    try:
+        message = json.loads(raw)
+    except ValueError:
+        return
+    if not isinstance(message, dict) or message.get("type") != "resync":
+        return
+
+    since = message.get("since")
+    missed = None
+    if isinstance(since, int) and message.get("epoch") == EPOCH:
+        missed = conn.topic.events_since(since)
+    # A long backlog would overflow the queue; a snapshot is one message
+    if missed is None or len(missed) > WS_QUEUE_SIZE - conn.queue.qsize():
+        asyncio.create_task(_send_snapshot(conn))
+        return
+    for event in missed:
+        conn.offer(json.dumps(event))
 
 
-def trigger_broadcast(slots, bookings):
-    """Schedule broadcast without blocking API response."""
-    asyncio.create_task(broadcast_update(slots, bookings))
+async def _send_snapshot(conn: Connection):
+    conn.offer(json.dumps(await snapshot(conn.topic)))
@@ -0,0 +1,112 @@
+"""Rate limiter and LLM admission gate under load.
+
+1. Buckets: W worker processes hammer one client key for a few seconds.
+   With the memory backend each worker has its own bucket, so the client
+   gets about W times its rate; the SQLite backend shares the bucket and
+   holds the total near burst + rate * seconds.
+2. Gate: more concurrent "LLM calls" (sleeps) than the limit plus queue.
+   Reports how many were admitted, turned away (queue_full/wait_timeout)
+   and the queue wait of admitted calls.
+
+    python -m benchmarks.bench_admission --workers 4 --seconds 3
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+
+def _hammer(backend: str, path: str, seconds: float, rate: float, burst: int, out):
+    os.environ["RATE_LIMIT_BACKEND"] = backend
+    os.environ["RATE_LIMIT_SQLITE_PATH"] = path
+    from app.admission import make_buckets
+
+    async def run():
+        buckets = make_buckets()
+        allowed = denied = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if await buckets.take("chat:ip:203.0.113.7", burst, rate) == 0:
+                allowed += 1
+            else:
+                denied += 1
+        return allowed, denied
+
+    out.put(asyncio.run(run()))
+
+
+def bench_buckets(backend: str, args):
+    path = os.path.join(tempfile.mkdtemp(), "ratelimit.db")
+    out = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_hammer, args=(backend, path, args.seconds, args.rate, args.burst, out))
+        for _ in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    allowed = sum(a for a, _ in results)
+    return {
+        "allowed": allowed,
+        "denied": sum(d for _, d in results),
+        "limit": round(args.burst + args.rate * args.seconds, 1),
+        "checks_per_second": round((allowed + sum(d for _, d in results)) / args.seconds),
+    }
+
+
+async def bench_gate(args):
+    from app.admission import AdmissionGate, Overloaded
+
+    gate = AdmissionGate(args.limit, max_waiting=args.max_waiting, max_wait=args.max_wait)
+    outcomes, waits = {"admitted": 0, "queue_full": 0, "wait_timeout": 0}, []
+
+    async def call():
+        start = time.perf_counter()
+        try:
+            async with gate.slot():
+                waits.append(time.perf_counter() - start)
+                await asyncio.sleep(args.call_seconds)
+            outcomes["admitted"] += 1
+        except Overloaded as e:
+            outcomes[e.reason] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(args.calls)))
+    waits.sort()
+    return {
+        "calls": args.calls,
+        "limit": args.limit,
+        "max_waiting": args.max_waiting,
+        "max_wait_s": args.max_wait,
+        "call_s": args.call_seconds,
+        **outcomes,
+        "queue_wait_ms_p50": round(statistics.median(waits) * 1000, 1) if waits else None,
+        "queue_wait_ms_max": round(waits[-1] * 1000, 1) if waits else None,
+        "elapsed_s": round(time.perf_counter() - start, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--rate", type=float, default=20 / 60, help="tokens per second")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=16)
+    parser.add_argument("--max-waiting", type=int, default=64)
+    parser.add_argument("--max-wait", type=float, default=1.0)
+    parser.add_argument("--call-seconds", type=float, default=0.4)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    print(json.dumps({
+        "buckets": {backend: bench_buckets(backend, args) for backend in ("memory", "sqlite")},
+        "gate": asyncio.run(bench_gate(args)),
+    }, indent=2))
@@ -0,0 +1,167 @@
+"""Availability queries: row-per-slot scan vs the interval index.
+
+Both sides answer the same questions over the same random bookings: "which
+start times fit a service of N minutes on day D" and "first window of N
+minutes after t". The baseline materialises one row per resource per
+15-minute step and looks for runs of consecutive free rows, the way a
+slot table would have to. Pure Python, no database.
+
+    python -m benchmarks.bench_availability --resources 8 --days 60
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+STEP = 15
+OPEN, CLOSE = 9 * 60, 19 * 60
+
+
+def random_bookings(rng, resources, days, fill):
+    """{(rid, day): [(start, end)]} covering roughly `fill` of each shift."""
+    busy = {}
+    for rid in range(1, resources + 1):
+        for d in range(days):
+            cursor, intervals = OPEN, []
+            while cursor < CLOSE:
+                length = rng.choice((30, 45, 60))
+                if rng.random() < fill and cursor + length <= CLOSE:
+                    intervals.append((cursor, cursor + length))
+                cursor += length
+            busy[(rid, d)] = intervals
+    return busy
+
+
+# ------------------------------
+# Baseline: one row per resource per step
+# ------------------------------
+def build_grid(busy, resources, days):
+    grid = {}
+    for (rid, d), intervals in busy.items():
+        row = [True] * ((CLOSE - OPEN) // STEP)
+        for s, e in intervals:
+            for m in range(s, e, STEP):
+                row[(m - OPEN) // STEP] = False
+        grid[(rid, d)] = row
+    return grid
+
+
+def grid_start_times(grid, resources, d, minutes, after=0):
+    need = -(-minutes // STEP)
+    found = set()
+    for rid in range(1, resources + 1):
+        row = grid[(rid, d)]
+        for i in range(len(row) - need + 1):
+            m = OPEN + i * STEP
+            if m >= after and all(row[i:i + need]):
+                found.add(m)
+    return sorted(found)
+
+
+def grid_first_free(grid, resources, days, minutes, after_day, after):
+    need = -(-minutes // STEP)
+    for d in range(after_day, days):
+        best = None
+        for rid in range(1, resources + 1):
+            row = grid[(rid, d)]
+            for i in range(len(row) - need + 1):
+                m = OPEN + i * STEP
+                if (d > after_day or m >= after) and all(row[i:i + need]):
+                    best = m if best is None else min(best, m)
+                    break
+        if best is not None:
+            return d, best
+    return None
+
+
+# ------------------------------
+# Interval index
+# ------------------------------
+class _Row:
+    def __init__(self, **kw):
+        self.__dict__.update(kw)
+
+
+def build_capacity(busy, resources, days, day0):
+    from datetime import time as time_of
+    from app.availability import Capacity, from_minutes
+
+    res = [_Row(id=rid, name=f"Chair {rid}") for rid in range(1, resources + 1)]
+    services = [_Row(name="Haircut", duration_minutes=45)]
+    hours = [_Row(resource_id=rid, weekday=w, open_time=time_of(OPEN // 60), close_time=time_of(CLOSE // 60))
+             for rid in range(1, resources + 1) for w in range(7)]
+    bookings = [_Row(resource_id=rid, date=day0 + timedelta(days=d), time=from_minutes(s), duration_minutes=e - s)
+                for (rid, d), intervals in busy.items() for s, e in intervals]
+    return Capacity(res, services, hours, bookings, day0, day0 + timedelta(days=days - 1))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return round(statistics.median(samples), 1)
+
+
+def main(args):
+    from app.availability import to_minutes
+
+    rng = random.Random(args.seed)
+    busy = random_bookings(rng, args.resources, args.days, args.fill)
+    day0 = date(2030, 1, 7)
+
+    start = time.perf_counter()
+    grid = build_grid(busy, args.resources, args.days)
+    grid_build = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    capacity = build_capacity(busy, args.resources, args.days, day0)
+    index_build = (time.perf_counter() - start) * 1000
+
+    queries = [(rng.randrange(args.days), rng.choice((30, 45, 60, 90)), rng.randrange(OPEN, CLOSE, STEP))
+               for _ in range(args.queries)]
+
+    # Same answers on both sides before timing anything
+    for d, minutes, after in queries:
+        day = day0 + timedelta(days=d)
+        expect = grid_start_times(grid, args.resources, d, minutes)
+        got = sorted(to_minutes(datetime.strptime(k, "%H:%M").time())
+                     for k in capacity.free_starts(day, minutes))
+        assert got == expect, (d, minutes)
+        expect = grid_first_free(grid, args.resources, args.days, minutes, d, after)
+        found = capacity.first_free(minutes, datetime.combine(day, datetime.min.time()) + timedelta(minutes=after - 1))
+        got = found and ((found[0] - day0).days, to_minutes(found[1]))
+        assert got == expect, (d, minutes, after, got, expect)
+
+    d, minutes, after = queries[0]
+    day = day0 + timedelta(days=d)
+    after_dt = datetime.combine(day, datetime.min.time()) + timedelta(minutes=after - 1)
+    print(json.dumps({
+        "resources": args.resources,
+        "days": args.days,
+        "fill": args.fill,
+        "bookings": sum(len(v) for v in busy.values()),
+        "build_ms": {"grid": round(grid_build, 2), "interval_index": round(index_build, 2)},
+        "day_start_times_us": {
+            "grid": timed(lambda: grid_start_times(grid, args.resources, d, minutes), args.repeat),
+            "interval_index": timed(lambda: capacity.free_starts(day, minutes), args.repeat),
+        },
+        "first_free_us": {
+            "grid": timed(lambda: grid_first_free(grid, args.resources, args.days, 90, d, after), args.repeat),
+            "interval_index": timed(lambda: capacity.first_free(90, after_dt), args.repeat),
+        },
+        "checked_queries": len(queries),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resources", type=int, default=8)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--fill", type=float, default=0.8, help="share of each shift already booked")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    main(parser.parse_args())
@@ -0,0 +1,126 @@
+"""Bookings listing cost as history grows: full list vs indexed keyset page.
+
+Seeds bookings in steps (default up to 100k, spread over past and future
+days) and, at each size, times the old unbounded "every non-pending
+booking" load against the first page and a deep page of the new
+paginated query. Page time should stay flat while the full load grows
+with the table.
+
+    python -m benchmarks.bench_bookings_page --total 100000
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_bookings_page
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+STATUSES = ("paid", "cancelled", "pending")
+
+
+def seed(start_index: int, count: int):
+    from sqlalchemy import insert
+    from app.database import SessionLocal, Booking
+
+    # Bookings run backwards from 60 days ahead: growth is mostly history
+    first_day = date.today() + timedelta(days=60)
+    rows = []
+    for i in range(start_index, start_index + count):
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "customer_name": f"Customer {i}",
+            "customer_email": f"customer{i % 5000}@example.com",
+            "service": "Haircut",
+            "date": first_day - timedelta(days=i // 16),
+            "time": (datetime(2000, 1, 1, 9) + timedelta(minutes=30 * (i % 16))).time(),
+            "status": STATUSES[i % 3],
+            "created_at": datetime.utcnow().isoformat(),
+        })
+    db = SessionLocal()
+    try:
+        for i in range(0, len(rows), 5000):
+            db.execute(insert(Booking), rows[i:i + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def timed(fn, repeats: int):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+async def measure(size: int, repeats: int):
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal, Booking
+    from app.helpers import _format_bookings, decode_cursor, get_bookings_page
+
+    async def full_list():
+        # What GET /api/bookings used to return
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(select(Booking).where(Booking.status != "pending"))).scalars()
+            return _format_bookings(rows)
+
+    async def first_page():
+        async with AsyncSessionLocal() as db:
+            return await get_bookings_page(db, limit=50, date_from=date.today())
+
+    async def deep_page():
+        # Walk 20 pages back into history via the cursor
+        async with AsyncSessionLocal() as db:
+            after = None
+            for _ in range(20):
+                _, cursor = await get_bookings_page(
+                    db, limit=50, date_from=date.today() - timedelta(days=365), after=after
+                )
+                after = decode_cursor(cursor) if cursor else None
+
+    async with AsyncSessionLocal() as db:
+        full_rows = len(_format_bookings((await db.execute(
+            select(Booking).where(Booking.status != "pending")
+        )).scalars()))
+
+    return {
+        "bookings": size,
+        "full_list_rows": full_rows,
+        "full_list_ms": await timed(full_list, repeats),
+        "first_page_ms": await timed(first_page, repeats),
+        "twenty_pages_ms": await timed(deep_page, repeats),
+    }
+
+
+async def main(args):
+    from app.database import async_engine
+
+    results, seeded = [], 0
+    for size in args.steps:
+        seed(seeded, size - seeded)
+        seeded = size
+        results.append(await measure(size, args.repeats))
+    await async_engine.dispose()
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split("@")[-1],
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    args.steps = sorted({s for s in (1_000, 10_000, args.total) if s <= args.total})
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from app.database import migrate
+    migrate()
+    asyncio.run(main(args))
@@ -0,0 +1,95 @@
+"""LLM calls per completed booking: model-only chat vs the booking form.
+
+Replays the scripted conversations in fixtures/chat_conversations.jsonl
+through booking_form.plan_turn, the same decision /chat makes before it
+calls the model. Model-only, every turn is an LLM call. With the form, only
+"llm" turns are; the rest are answered or reserved locally.
+
+Model turns are simulated by an oracle that understands any expected field
+spelled out in the conversation so far and emits the booking JSON once it
+has all four. Locally reserved bookings are checked against the expected
+fields, so an extractor mistake shows up as an error, not a saving.
+
+    python -m benchmarks.bench_chat_form
+"""
+import json
+import statistics
+from datetime import date, timedelta
+from pathlib import Path
+
+CORPUS = Path(__file__).parent / "fixtures" / "chat_conversations.jsonl"
+TODAY = date(2030, 1, 7)   # a Monday; the corpus dates are relative to it
+TAKEN = {("2030-01-08", "10:00")}
+
+
+def _slots():
+    times = [f"{h:02d}:{m:02d}" for h in range(9, 18) for m in (0, 30)]
+    slots = {}
+    for i in range(60):
+        day = (TODAY + timedelta(days=i)).isoformat()
+        slots[day] = [t for t in times if (day, t) not in TAKEN]
+    return slots
+
+
+def _model_knows(expect: dict, said: list[str], form: dict) -> dict:
+    text = " ".join(said).lower()
+    known = dict(form)
+    for field, value in expect.items():
+        if field not in known and value.lower() in text:
+            known[field] = value
+    return known
+
+
+def replay(conversation: dict, slots: dict):
+    from app import booking_form
+
+    expect = conversation["expect"]
+    form, expecting, said = {}, None, []
+    calls = local = 0
+    for message in conversation["turns"]:
+        said.append(message)
+        action, form, _ = booking_form.plan_turn(form, message, slots, expecting, TODAY)
+        if action == "reserve":
+            booked = {f: form[f] for f in booking_form.REQUIRED_FIELDS}
+            return {"llm_calls": calls, "local_turns": local, "booked_by": "form",
+                    "correct": booked == expect}
+        if action == "ask":
+            local += 1
+            expecting = booking_form.next_missing(form)
+            continue
+        calls += 1
+        expecting = booking_form.after_model(message, expecting, TODAY)
+        known = _model_knows(expect, said, form)
+        if booking_form.next_missing(known) is None:
+            return {"llm_calls": calls, "local_turns": local, "booked_by": "model",
+                    "correct": known == expect}
+    return {"llm_calls": calls, "local_turns": local, "booked_by": None, "correct": False}
+
+
+def main():
+    with open(CORPUS) as f:
+        conversations = [json.loads(line) for line in f if line.strip()]
+    slots = _slots()
+
+    rows = [replay(c, slots) for c in conversations]
+    baseline = [len(c["turns"]) for c in conversations]
+    completed = [r for r in rows if r["booked_by"]]
+    print(json.dumps({
+        "conversations": len(rows),
+        "completed": len(completed),
+        "correct": sum(r["correct"] for r in rows),
+        "booked_by_form": sum(r["booked_by"] == "form" for r in rows),
+        "llm_calls_per_booking": {
+            "model_only": round(sum(baseline) / len(baseline), 2),
+            "with_form": round(sum(r["llm_calls"] for r in completed) / max(len(completed), 1), 2),
+            "with_form_p50": statistics.median(r["llm_calls"] for r in completed) if completed else None,
+        },
+        "llm_calls_total": {"model_only": sum(baseline), "with_form": sum(r["llm_calls"] for r in rows)},
+        "mistakes": [
+            {"turns": c["turns"], **r} for c, r in zip(conversations, rows) if not r["correct"]
+        ],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
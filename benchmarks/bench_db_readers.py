@@ -0,0 +1,110 @@
+"""Concurrent readers: sync ORM calls inside coroutines vs the async engine.
+
+Seeds N future slots, then runs C concurrent readers that each load the
+available-slots query R times (the cache-miss path of /api/slots). Reports
+p50/p99 per-read latency, wall time and the worst event-loop stall.
+
+    python -m benchmarks.bench_db_readers --slots 5000 --readers 50
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_db_readers
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def seed(n: int):
+    from app.database import SessionLocal, Slot
+
+    db = SessionLocal()
+    try:
+        db.query(Slot).delete()
+        start = date.today() + timedelta(days=1)
+        for i in range(n):
+            day = start + timedelta(days=i // 16)
+            t = (datetime(2000, 1, 1, 9) + timedelta(minutes=30 * (i % 16))).time()
+            db.add(Slot(date=day, time=t, available=True))
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.005):
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def run(read_once, readers: int, reads: int):
+    samples = []
+
+    async def reader():
+        for _ in range(reads):
+            start = time.perf_counter()
+            await read_once()
+            samples.append(time.perf_counter() - start)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(reader() for _ in range(readers)))
+    wall = time.perf_counter() - start
+    stop.set()
+    return {
+        "p50_ms": round(_pct(samples, 0.50) * 1000, 2),
+        "p99_ms": round(_pct(samples, 0.99) * 1000, 2),
+        "wall_s": round(wall, 3),
+        "max_loop_stall_ms": round(await ticker * 1000, 2),
+    }
+
+
+async def main(args):
+    from app.database import SessionLocal, AsyncSessionLocal
+    from app.helpers import _load_slots, _aload_slots
+
+    async def sync_read():
+        # What the routes used to do: blocking ORM work on the event loop
+        db = SessionLocal()
+        try:
+            _load_slots(db)
+        finally:
+            db.close()
+
+    async def async_read():
+        async with AsyncSessionLocal() as db:
+            await _aload_slots(db)
+
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split("@")[-1],
+        "slots": args.slots,
+        "readers": args.readers,
+        "reads_per_reader": args.reads,
+        "sync_session": await run(sync_read, args.readers, args.reads),
+        "async_session": await run(async_read, args.readers, args.reads),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from app.database import migrate
+    migrate()
+    seed(args.slots)
+    asyncio.run(main(args))
@@ -0,0 +1,160 @@
+"""Cold-start profile: how long a fresh worker takes before it can serve.
+
+Every phase runs in a new interpreter, --repeats times (median reported):
+
+    import            `import app.main` against an empty SQLite file
+    migrate_fresh     migrate() on an empty database (the one-off DDL)
+    migrate_current   migrate() on a migrated database (the per-worker check)
+    ready             uvicorn start until GET /api/slots answers 200
+
+It also runs `python -X importtime -c "import app.main"` once and lists
+the packages with the most self time, so a regression points at a module.
+Results are JSON that includes the git commit. --root profiles another
+checkout (a git worktree of the baseline), so a before/after needs no
+stash; phases the older tree can't run (no migrate()) come out as null:
+
+    git worktree add /tmp/base main
+    python -m benchmarks.bench_import_time --root /tmp/base --out before.json
+    python -m benchmarks.bench_import_time --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+from .run_suite import ROOT
+
+APP_PORT = 8907
+
+# name: (untimed setup, timed code)
+_PHASES = {
+    "import": ("", "import app.main"),
+    "migrate_fresh": ("from app.database import migrate", "migrate()"),
+    "migrate_current": ("from app.database import migrate; migrate()", "migrate()"),
+}
+
+_TIMED = """
+import json, time
+{setup}
+start = time.perf_counter()
+{code}
+print(json.dumps(time.perf_counter() - start))
+"""
+
+
+def _env():
+    return {**os.environ,
+            "DATABASE_URL": f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+            "LOG_LEVEL": "WARNING"}
+
+
+def git_commit(root: Path):
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root, text=True).strip()
+    except Exception:
+        return None
+
+
+def time_phase(root: Path, setup: str, code: str) -> float | None:
+    out = subprocess.run([sys.executable, "-c", _TIMED.format(setup=setup, code=code)], cwd=root,
+                         env=_env(), capture_output=True, text=True)
+    if out.returncode != 0:
+        return None
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def time_ready(root: Path, timeout: float = 60) -> float:
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(APP_PORT),
+                             "--log-level", "warning"], cwd=root, env=_env())
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("app exited during startup")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{APP_PORT}/api/slots", timeout=1) as res:
+                    if res.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError("app not ready in time")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def import_profile(root: Path, top: int):
+    """Self time per top-level package from -X importtime, largest first."""
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"], cwd=root,
+                         env=_env(), capture_output=True, text=True, check=True)
+    by_package, total = defaultdict(int), 0
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        by_package[name.strip().split(".")[0]] += int(self_us)
+        total += int(self_us)
+    ranked = sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+    return {"total_ms": round(total / 1000, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in ranked}}
+
+
+def main(args):
+    root = Path(args.root).resolve()
+    phases = {}
+    for name, (setup, code) in _PHASES.items():
+        samples = [time_phase(root, setup, code) for _ in range(args.repeats)]
+        phases[name] = None if None in samples else round(statistics.median(samples) * 1000, 1)
+    if not args.no_serve:
+        phases["ready"] = round(statistics.median(time_ready(root) for _ in range(args.repeats)) * 1000, 1)
+    return {
+        "meta": {
+            "commit": git_commit(root),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "repeats": args.repeats,
+        },
+        "phases_ms": phases,
+        "importtime": import_profile(root, args.top),
+    }
+
+
+def compare(old: dict, new: dict):
+    def change(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+
+    return {
+        "baseline_commit": old["meta"].get("commit"),
+        "phases": {name: change(old["phases_ms"].get(name), ms) for name, ms in new["phases_ms"].items()},
+        "importtime_total": change(old["importtime"]["total_ms"], new["importtime"]["total_ms"]),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--root", default=str(ROOT), help="checkout to profile")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="packages listed from -X importtime")
+    parser.add_argument("--no-serve", action="store_true", help="skip the uvicorn ready phase")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+    results = main(args)
+    if args.compare:
+        results["comparison"] = compare(json.loads(Path(args.compare).read_text()), results)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(output)
+    print(output)
@@ -0,0 +1,124 @@
+"""Local intent fast path vs the LLM-only /intent path.
+
+Runs every message in fixtures/intent_corpus.jsonl through the rules, the
+rules + token scorer (leave-one-out, so the scorer never sees the message
+it is tested on) and the LLM. By default the LLM is the local stub, which
+gives latency but not accuracy (it answers "other" to everything); pass
+--live to use the real API. Live runs score the LLM against the same
+labels and compare it with the rules on the messages the rules answered.
+
+    python -m benchmarks.bench_intent [--live] [--latency 0.4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from pathlib import Path
+
+CORPUS = Path(__file__).parent / "fixtures" / "intent_corpus.jsonl"
+PORT = 8902
+
+
+def _load():
+    with open(CORPUS) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _summary(latencies, answered, correct, total):
+    return {
+        "coverage": round(answered / total, 4),
+        "accuracy_on_answered": round(correct / answered, 4) if answered else None,
+        "p50_us": round(statistics.median(latencies) * 1e6, 2),
+        "max_us": round(max(latencies) * 1e6, 2),
+    }
+
+
+def bench_local(rows, use_model: bool):
+    from app import intent_rules
+
+    latencies, answered, correct, predicted = [], 0, 0, []
+    for i, row in enumerate(rows):
+        scorer = None
+        if use_model:
+            rest = [(r["message"], r["intent"]) for j, r in enumerate(rows) if j != i]
+            scorer = intent_rules.TokenScorer.train(rest)
+        start = time.perf_counter()
+        intent, _, _ = intent_rules.classify(row["message"], scorer=scorer)
+        latencies.append(time.perf_counter() - start)
+        predicted.append(intent)
+        if intent:
+            answered += 1
+            correct += intent == row["intent"]
+    return _summary(latencies, answered, correct, len(rows)), predicted
+
+
+async def bench_llm(rows, live: bool):
+    from app.llm import chat_completion
+
+    latencies, correct, predicted = [], 0, []
+    for row in rows:
+        start = time.perf_counter()
+        response = await chat_completion([
+            {"role": "system", "content": "You are an intent classifier. Decide if the user wants to BOOK an appointment (haircut). Answer only 'book' or 'other'."},
+            {"role": "user", "content": row["message"]},
+        ])
+        latencies.append(time.perf_counter() - start)
+        intent = "book" if "book" in response.choices[0].message.content.lower() else "other"
+        predicted.append(intent)
+        correct += intent == row["intent"]
+    result = {
+        "coverage": 1.0,
+        "accuracy_on_answered": round(correct / len(rows), 4) if live else None,
+        "p50_ms": round(statistics.median(latencies) * 1e3, 2),
+        "total_s": round(sum(latencies), 3),
+    }
+    if not live:
+        result["accuracy_note"] = "not measured: the stub answers 'other' to everything; run with --live"
+    return result, predicted
+
+
+def compare(rows, local, llm):
+    """Rules vs LLM accuracy on the messages the rules answered (same labels)."""
+    subset = [i for i, intent in enumerate(local) if intent]
+    if not subset:
+        return None
+    return {
+        "messages": len(subset),
+        "rules_accuracy": round(sum(local[i] == rows[i]["intent"] for i in subset) / len(subset), 4),
+        "llm_accuracy": round(sum(llm[i] == rows[i]["intent"] for i in subset) / len(subset), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--live", action="store_true", help="call the real OpenAI API")
+    parser.add_argument("--latency", type=float, default=0.4, help="stub latency (s)")
+    args = parser.parse_args()
+
+    if not args.live:
+        os.environ.setdefault("OPENAI_API_KEY", "stub")
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+        from benchmarks.stub_openai import serve_in_thread
+        serve_in_thread(port=PORT, latency=args.latency)
+
+    rows = _load()
+    rules, _ = bench_local(rows, use_model=False)
+    model, local_predicted = bench_local(rows, use_model=True)
+    llm, llm_predicted = asyncio.run(bench_llm(rows, args.live))
+
+    # With the fast path only the unanswered share pays for an LLM call
+    escalated = round(len(rows) * (1 - model["coverage"]))
+    print(json.dumps({
+        "messages": len(rows),
+        "rules": rules,
+        "rules_plus_model": model,
+        "llm_only": llm,
+        "rules_plus_model_vs_llm": compare(rows, local_predicted, llm_predicted) if args.live else None,
+        "llm_calls_saved": len(rows) - escalated,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
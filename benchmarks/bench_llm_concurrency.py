@@ -0,0 +1,90 @@
+"""Concurrent /intent calls against a stub OpenAI server.
+
+Compares the old pattern (sync OpenAI client called from an async handler)
+with the pooled AsyncOpenAI layer in app/llm.py. Reports wall time and the
+worst event-loop stall seen by a ticker coroutine running alongside.
+
+    python -m benchmarks.bench_llm_concurrency --requests 50 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+PORT = 8901
+
+
+def _configure_env():
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    # Every request comes from one client address
+    os.environ.setdefault("RATE_LIMIT_INTENT_PER_MINUTE", "0")
+    os.environ.setdefault(
+        "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    )
+    from app.database import migrate
+    migrate()
+
+
+async def _loop_lag(stop: asyncio.Event, interval: float = 0.01):
+    """Largest delay between when the ticker should wake and when it did."""
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - start - interval)
+    return worst
+
+
+async def _run(make_call, n: int):
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call(i) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return {"wall_s": round(elapsed, 3), "max_loop_stall_s": round(await ticker, 3)}
+
+
+async def main(n: int, latency: float):
+    from openai import OpenAI
+    import httpx
+    from app.main import app
+
+    sync_client = OpenAI(api_key="stub", base_url=os.environ["OPENAI_BASE_URL"])
+
+    async def blocking_call(i):
+        # What detect_intent used to do: a sync call inside async def
+        sync_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[{"role": "user", "content": f"hello {i}"}],
+        )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as http:
+        async def async_call(i):
+            res = await http.post("/intent", json={"message": f"hello {i}"})
+            res.raise_for_status()
+
+        results = {
+            "requests": n,
+            "stub_latency_s": latency,
+            "sync_client": await _run(blocking_call, n),
+            "async_client": await _run(async_call, n),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    _configure_env()
+    from benchmarks.stub_openai import serve_in_thread
+
+    serve_in_thread(port=PORT, latency=args.latency)
+    asyncio.run(main(args.requests, args.latency))
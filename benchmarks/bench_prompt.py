@@ -0,0 +1,107 @@
+"""System prompt size and latency: full slot dump vs compressed ranges.
+
+Builds schedules of 10, 1 000 and 10 000 half-hour slots and compares the
+old prompt (every slot joined into one line) with app.prompt. Token counts
+use tiktoken when installed, otherwise a chars/4 estimate. Latency is
+measured against the stub OpenAI server with a per-1000-chars prefill cost.
+
+    python -m benchmarks.bench_prompt [--per-kchar 0.02]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from datetime import date, datetime, timedelta
+
+PORT = 8903
+SIZES = (10, 1_000, 10_000)
+
+
+def make_schedule(n: int, start: date):
+    """n slots, 09:00–16:30 every 30m, filling consecutive days."""
+    slots: dict[str, list[str]] = {}
+    day = start
+    while n > 0:
+        for k in range(min(n, 16)):
+            t = datetime(2000, 1, 1, 9) + timedelta(minutes=30 * k)
+            slots.setdefault(day.isoformat(), []).append(t.strftime("%H:%M"))
+        n -= 16
+        day += timedelta(days=1)
+    return slots
+
+
+def old_prompt(slots):
+    """The system prompt chat_with_agent used to build."""
+    future_slots = [f"{d} {t}" for d, times in slots.items() for t in times]
+    slot_info = ", ".join(future_slots) if future_slots else "No slots available"
+    return (
+        "You are a polite barbershop assistant. "
+        f"Available slots are: {slot_info}.\n\n"
+        "Your task:\n"
+        "- Collect the customer's name\n"
+        "- Collect the customer's email\n"
+        "- Collect a valid available date (YYYY-MM-DD)\n"
+        "- Collect a valid available time (HH:MM)\n\n"
+        "Rules:\n"
+        '- If the user already gave all four (name, email, date, time), respond ONLY with valid JSON:\n'
+        '{"service":"Haircut","date":"YYYY-MM-DD","time":"HH:MM","customer_name":"NAME","customer_email":"EMAIL"}\n'
+        "- Use double quotes for all keys and string values.\n"
+        "- Do NOT add any extra words or formatting. If something is missing, only ask for that piece."
+    )
+
+
+def token_counter():
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(enc.encode(text)), "tiktoken"
+    except ImportError:
+        return lambda text: len(text) // 4, "chars/4"
+
+
+async def timed(messages, reps: int):
+    from app.llm import chat_completion
+
+    samples = []
+    for _ in range(reps):
+        start = time.perf_counter()
+        await chat_completion(messages)
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 1)
+
+
+async def main(reps: int):
+    from app.prompt import build_system_prompt
+
+    count, method = token_counter()
+    today = date.today()
+    results = {"token_count": method, "sizes": {}}
+    for n in SIZES:
+        slots = make_schedule(n, today)
+        old = old_prompt(slots)
+        new = build_system_prompt(slots, today)
+        user = {"role": "user", "content": "I'd like a haircut"}
+        results["sizes"][n] = {
+            "old_tokens": count(old),
+            "new_tokens": count(new),
+            "old_latency_ms": await timed([{"role": "system", "content": old}, user], reps),
+            "new_latency_ms": await timed([{"role": "system", "content": new}, user], reps),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--per-kchar", type=float, default=0.02)
+    parser.add_argument("--reps", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+    from benchmarks.stub_openai import serve_in_thread
+
+    serve_in_thread(port=PORT, latency=args.latency, per_kchar=args.per_kchar)
+    asyncio.run(main(args.reps))
@@ -0,0 +1,118 @@
+"""Reminder scheduler tick cost as the number of pending jobs grows.
+
+Seeds bookings with their reminder/follow-up jobs in steps (default up to
+50k pending jobs, almost all in the future), makes a fixed number of them
+due, and times run_due_jobs ticks. A tick only reads the due head of the
+(status, run_at) index, so its time should stay flat as the table grows.
+Idle ticks (nothing due) are timed too.
+
+    python -m benchmarks.bench_scheduler --total 50000
+    DATABASE_URL=postgresql://... python -m benchmarks.bench_scheduler
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+
+def seed(start_index: int, count: int):
+    from sqlalchemy import insert
+    from app.database import SessionLocal, Booking, ScheduledJob
+
+    bookings, jobs = [], []
+    for i in range(start_index, start_index + count):
+        booking_id = str(uuid.uuid4())
+        start = datetime.combine(date.today() + timedelta(days=2 + i // 16), datetime.min.time()) \
+            + timedelta(hours=9, minutes=30 * (i % 16))
+        bookings.append({
+            "id": booking_id, "customer_name": f"Customer {i}", "service": "Haircut",
+            "customer_email": f"customer{i}@example.com", "status": "paid",
+            "date": start.date(), "time": start.time(),
+        })
+        jobs.append({"booking_id": booking_id, "kind": "reminder_24h", "status": "pending",
+                     "run_at": start.timestamp() - 86400})
+    db = SessionLocal()
+    try:
+        for i in range(0, count, 5000):
+            db.execute(insert(Booking), bookings[i:i + 5000])
+            db.execute(insert(ScheduledJob), jobs[i:i + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+async def make_due(n: int):
+    from sqlalchemy import select, update
+    from app.database import AsyncSessionLocal, ScheduledJob
+
+    async with AsyncSessionLocal() as db:
+        ids = (await db.execute(
+            select(ScheduledJob.id).where(ScheduledJob.status == "pending")
+            .order_by(ScheduledJob.run_at.desc()).limit(n)
+        )).scalars().all()
+        await db.execute(update(ScheduledJob).where(ScheduledJob.id.in_(ids)).values(run_at=0))
+        await db.commit()
+
+
+async def tick_ms(limit: int):
+    from app.database import AsyncSessionLocal
+    from app.scheduler import run_due_jobs
+
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        ran = await run_due_jobs(db, limit=limit)
+    return (time.perf_counter() - start) * 1000, ran
+
+
+async def main(args):
+    from sqlalchemy import func, select
+    from app.database import AsyncSessionLocal, ScheduledJob, async_engine
+
+    results, seeded = [], 0
+    for size in args.steps:
+        seed(seeded, size - seeded)
+        seeded = size
+
+        busy, idle = [], []
+        for _ in range(args.ticks):
+            await make_due(args.batch)
+            ms, ran = await tick_ms(args.batch)
+            busy.append(ms)
+            ms, _ = await tick_ms(args.batch)
+            idle.append(ms)
+        async with AsyncSessionLocal() as db:
+            pending = (await db.execute(
+                select(func.count()).where(ScheduledJob.status == "pending")
+            )).scalar()
+        results.append({
+            "pending_jobs": pending,
+            "due_per_tick": args.batch,
+            "busy_tick_ms_p50": round(statistics.median(busy), 2),
+            "idle_tick_ms_p50": round(statistics.median(idle), 2),
+        })
+    await async_engine.dispose()
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split("@")[-1],
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--total", type=int, default=50_000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--ticks", type=int, default=5)
+    args = parser.parse_args()
+    args.steps = sorted({s for s in (1_000, 10_000, args.total) if s <= args.total})
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from app.database import migrate
+    migrate()
+    asyncio.run(main(args))
@@ -0,0 +1,119 @@
+"""Broadcast completion time across many local WebSocket clients.
+
+Starts the real connection registry behind uvicorn, opens N clients, then
+publishes R events and measures how long each takes to reach every
+client. Optional --slow clients never read, to show they get evicted
+instead of holding everyone else back.
+
+    python -m benchmarks.bench_ws_fanout --clients 1000 --rounds 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+
+PORT = 8904
+
+
+def build_server():
+    import uvicorn
+    from fastapi import FastAPI, WebSocket
+    from app.websocket_manager import connect_ws, publish, registry
+
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def ws(websocket: WebSocket):
+        await connect_ws(websocket, topic="admin")  # admin carries every event type
+
+    @app.post("/fire")
+    async def fire(pad: int = 0):
+        publish("bench", sent_at=time.perf_counter(), pad="x" * pad)
+        return {"connections": len(registry)}
+
+    @app.get("/stats")
+    async def stats():
+        return registry.stats()
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=PORT, log_level="warning",
+                            ws_max_queue=1024, backlog=4096)
+    return uvicorn.Server(config)
+
+
+async def main(args):
+    import httpx
+    import websockets
+
+    uri = f"http://127.0.0.1:{PORT}"
+    arrivals: dict[int, list[float]] = {}
+
+    async def client():
+        async with websockets.connect(f"ws://127.0.0.1:{PORT}/ws", max_queue=None) as ws:
+            async for raw in ws:
+                data = json.loads(raw)
+                if data.get("type") == "bench":
+                    arrivals.setdefault(data["seq"], []).append(
+                        time.perf_counter() - data["sent_at"]
+                    )
+
+    async def slow_client():
+        # Tiny receive queue and never read: the server-side queue backs up
+        async with websockets.connect(f"ws://127.0.0.1:{PORT}/ws", max_queue=1):
+            await asyncio.sleep(3600)
+
+    tasks = [asyncio.create_task(client()) for _ in range(args.clients)]
+    tasks += [asyncio.create_task(slow_client()) for _ in range(args.slow)]
+
+    async with httpx.AsyncClient(base_url=uri, timeout=30) as http:
+        while (await http.post("/fire")).json()["connections"] < args.clients + args.slow:
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(0.5)
+        arrivals.clear()
+
+        for _ in range(args.rounds):
+            await http.post("/fire", params={"pad": args.payload_bytes})
+            await asyncio.sleep(args.gap)
+        await asyncio.sleep(1.0)
+        stats = (await http.get("/stats")).json()
+
+    for t in tasks:
+        t.cancel()
+
+    complete = [max(v) for v in arrivals.values() if len(v) >= args.clients]
+    print(json.dumps({
+        "clients": args.clients,
+        "slow_clients": args.slow,
+        "rounds": args.rounds,
+        "payload_bytes": args.payload_bytes,
+        "rounds_fully_delivered": len(complete),
+        "broadcast_completion_ms_p50": round(statistics.median(complete) * 1000, 2) if complete else None,
+        "broadcast_completion_ms_max": round(max(complete) * 1000, 2) if complete else None,
+        "registry": stats,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--payload-bytes", type=int, default=200)
+    parser.add_argument("--gap", type=float, default=0.1)
+    args = parser.parse_args()
+
+    # Each client needs two sockets in this process
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 4 * (args.clients + args.slow) + 256)), hard))
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    server = build_server()
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    asyncio.run(main(args))
@@ -0,0 +1,365 @@
+"""End-to-end load test of the booking flows, fully local.
+
+Seeds a database with configurable slot and booking volumes, starts the
+OpenAI stub and the real app (uvicorn subprocesses), then drives these
+scenarios at the same time for --duration seconds:
+
+    chat          POST /chat with unique messages (LLM stub in the loop)
+    intent        POST /intent over the intent corpus
+    slots         GET /api/slots
+    slots_etag    GET /api/slots revalidating with If-None-Match
+    bookings      GET /api/bookings (first page)
+    slot_writes   POST + DELETE /api/slots, which generate WebSocket deltas
+
+--ws-clients WebSocket clients stay connected throughout. The run reports
+snapshot time and how long each slot_added delta takes to reach them.
+For every scenario it reports throughput, p50/p95/p99 latency, errors
+and SQL queries per request (taken from the app's /metrics). All load
+comes from one address, so the per-client rate limits are switched off
+unless --rate-limit is given.
+
+Results are JSON that includes the git commit. Pass --compare to diff
+against an earlier run:
+
+    python -m benchmarks.run_suite --out before.json
+    git checkout my-branch
+    python -m benchmarks.run_suite --compare before.json
+    DATABASE_URL=postgresql://... python -m benchmarks.run_suite --slots 5000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+CORPUS = Path(__file__).parent / "fixtures" / "intent_corpus.jsonl"
+STUB_PORT = 8905
+APP_PORT = 8906
+
+SCENARIO_ROUTES = {
+    "chat": "/chat",
+    "intent": "/intent",
+    "slots": "/api/slots",
+    "slots_etag": "/api/slots",
+    "bookings": "/api/bookings",
+    "slot_writes": "/api/slots",
+}
+
+
+# ------------------------------
+# Setup
+# ------------------------------
+def seed(slots: int, bookings: int):
+    from sqlalchemy import delete, insert
+    from app.database import SessionLocal, Slot, Booking
+
+    first = date.today() + timedelta(days=1)
+    slot_rows = [
+        {"date": first + timedelta(days=i // 16),
+         "time": (datetime(2000, 1, 1, 9) + timedelta(minutes=30 * (i % 16))).time(),
+         "available": True}
+        for i in range(slots)
+    ]
+    booking_rows = [
+        {"id": str(uuid.uuid4()), "customer_name": f"Customer {i}", "service": "Haircut",
+         "customer_email": f"customer{i}@example.com", "status": ("paid", "cancelled")[i % 2],
+         "date": first + timedelta(days=30 - i // 16),
+         "time": (datetime(2000, 1, 1, 9) + timedelta(minutes=30 * (i % 16))).time(),
+         "created_at": datetime.utcnow().isoformat()}
+        for i in range(bookings)
+    ]
+    db = SessionLocal()
+    try:
+        db.execute(delete(Slot))
+        db.execute(delete(Booking))
+        for i in range(0, len(slot_rows), 5000):
+            db.execute(insert(Slot), slot_rows[i:i + 5000])
+        for i in range(0, len(booking_rows), 5000):
+            db.execute(insert(Booking), booking_rows[i:i + 5000])
+        db.commit()
+    finally:
+        db.close()
+
+
+def start_process(args: list[str], env: dict):
+    # stderr to a file: a pipe nobody reads can fill up and stall the server
+    return subprocess.Popen([sys.executable, *args], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=tempfile.TemporaryFile())
+
+
+async def wait_ready(http, url: str, proc, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{' '.join(proc.args[1:])} exited with code {proc.returncode}")
+        try:
+            if (await http.get(url)).status_code < 500:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+# ------------------------------
+# /metrics scraping (SQL queries per request)
+# ------------------------------
+_SERIES = re.compile(r'^db_queries_per_request_(sum|count)\{route="([^"]*)"\} (\S+)$', re.M)
+
+
+async def query_counters(http):
+    text = (await http.get("/metrics")).text
+    totals = defaultdict(dict)
+    for kind, route, value in _SERIES.findall(text):
+        totals[route][kind] = float(value)
+    return totals
+
+
+# ------------------------------
+# Load generation
+# ------------------------------
+def _pct(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def summary(self, name: str, seconds: float, queries: float | None):
+        lat = self.latencies[name]
+        ms = lambda v: round(v * 1000, 2) if v is not None else None
+        return {
+            "requests": len(lat),
+            "errors": self.errors[name],
+            "throughput_rps": round(len(lat) / seconds, 2),
+            "p50_ms": ms(_pct(lat, 0.50)),
+            "p95_ms": ms(_pct(lat, 0.95)),
+            "p99_ms": ms(_pct(lat, 0.99)),
+            "queries_per_request": queries,
+        }
+
+
+async def run_load(http, args, rec: Recorder, ws_sent: dict):
+    intents = [json.loads(line)["message"] for line in CORPUS.read_text().splitlines() if line.strip()]
+    stop_at = time.monotonic() + args.duration
+    etag = {"value": None}
+    counter = iter(range(10**9))
+
+    async def timed(name, request):
+        start = time.perf_counter()
+        try:
+            response = await request()
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+            response = None
+        elapsed = time.perf_counter() - start
+        if ok:
+            rec.latencies[name].append(elapsed)
+        else:
+            rec.errors[name] += 1
+        return response
+
+    async def chat():
+        n = next(counter)
+        await timed("chat", lambda: http.post("/chat", json={"message": f"Do you have a haircut slot on Friday? ({n})"}))
+
+    async def intent():
+        await timed("intent", lambda: http.post("/intent", json={"message": random.choice(intents)}))
+
+    async def slots():
+        await timed("slots", lambda: http.get("/api/slots"))
+
+    async def slots_etag():
+        headers = {"If-None-Match": etag["value"]} if etag["value"] else {}
+        response = await timed("slots_etag", lambda: http.get("/api/slots", headers=headers))
+        if response is not None and response.headers.get("etag"):
+            etag["value"] = response.headers["etag"]
+
+    async def bookings():
+        await timed("bookings", lambda: http.get("/api/bookings", params={"limit": 50}))
+
+    async def slot_writes():
+        n = next(counter)
+        # Far-future, 01:00-22:30, so they never collide with seeded slots
+        day = (date.today() + timedelta(days=400 + n // 44)).isoformat()
+        at = f"{1 + (n % 44) // 2:02d}:{30 * (n % 2):02d}"
+        ws_sent[(day, at)] = time.perf_counter()
+        await timed("slot_writes", lambda: http.post("/api/slots", json={"date": day, "time": at}))
+        await timed("slot_writes", lambda: http.request("DELETE", "/api/slots", params={"date": day, "time": at}))
+
+    scenarios = {"chat": chat, "intent": intent, "slots": slots, "slots_etag": slots_etag,
+                 "bookings": bookings, "slot_writes": slot_writes}
+    selected = {name: scenarios[name] for name in args.scenarios}
+
+    async def worker(fn):
+        while time.monotonic() < stop_at:
+            await fn()
+
+    await asyncio.gather(*(
+        worker(fn) for fn in selected.values() for _ in range(args.concurrency)
+    ))
+
+
+async def ws_client(url: str, stats: dict, ws_sent: dict, stop: asyncio.Event):
+    import websockets
+
+    try:
+        async with websockets.connect(url, max_queue=None) as ws:
+            start = time.perf_counter()
+            await ws.send(json.dumps({"type": "resync", "since": -1}))
+            while not stop.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=0.5)
+                except asyncio.TimeoutError:
+                    continue
+                data = json.loads(raw)
+                if data.get("type") == "snapshot":
+                    stats["snapshot_s"].append(time.perf_counter() - start)
+                elif data.get("type") == "slot_added":
+                    for s in data["slots"]:
+                        sent = ws_sent.get((s["date"], s["time"]))
+                        if sent:
+                            stats["delta_s"].append(time.perf_counter() - sent)
+                stats["messages"] += 1
+    except Exception:
+        stats["disconnects"] += 1
+
+
+# ------------------------------
+# Main
+# ------------------------------
+async def main(args):
+    import httpx
+
+    env = {**os.environ,
+           "OPENAI_BASE_URL": f"http://127.0.0.1:{STUB_PORT}/v1",
+           "LOG_LEVEL": "WARNING"}
+    stub = start_process(["-m", "benchmarks.stub_openai", "--port", str(STUB_PORT),
+                          "--latency", str(args.llm_latency), "--reply", "Which time works for you?"], env)
+    app = start_process(["-m", "uvicorn", "app.main:app", "--port", str(APP_PORT),
+                         "--workers", str(args.workers), "--log-level", "warning"], env)
+    base = f"http://127.0.0.1:{APP_PORT}"
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency * 8, max_keepalive_connections=args.concurrency * 8)
+        async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as http:
+            await wait_ready(http, "/api/slots", app)
+            await wait_ready(http, f"http://127.0.0.1:{STUB_PORT}/docs", stub)
+
+            before = await query_counters(http)
+            rec, ws_sent = Recorder(), {}
+            ws_stats = {"snapshot_s": [], "delta_s": [], "messages": 0, "disconnects": 0}
+            stop = asyncio.Event()
+            clients = [asyncio.create_task(ws_client(f"ws://127.0.0.1:{APP_PORT}/ws", ws_stats, ws_sent, stop))
+                       for _ in range(args.ws_clients)]
+
+            start = time.perf_counter()
+            await run_load(http, args, rec, ws_sent)
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep(0.5)
+            stop.set()
+            await asyncio.gather(*clients)
+            after = await query_counters(http)
+    finally:
+        for proc in (app, stub):
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    def queries(route):
+        a, b = after.get(route, {}), before.get(route, {})
+        count = a.get("count", 0) - b.get("count", 0)
+        return round((a.get("sum", 0) - b.get("sum", 0)) / count, 2) if count else None
+
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "database": os.environ["DATABASE_URL"].split("@")[-1],
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        # Routes are shared (slots/slots_etag/slot_writes), so queries are per route
+        "scenarios": {name: rec.summary(name, elapsed, queries(SCENARIO_ROUTES[name]))
+                      for name in args.scenarios},
+        "websocket": {
+            "clients": args.ws_clients,
+            "messages": ws_stats["messages"],
+            "disconnects": ws_stats["disconnects"],
+            "snapshot_p50_ms": ms(_pct(ws_stats["snapshot_s"], 0.50)),
+            "delta_p50_ms": ms(_pct(ws_stats["delta_s"], 0.50)),
+            "delta_p99_ms": ms(_pct(ws_stats["delta_s"], 0.99)),
+        },
+    }
+
+
+def compare(old: dict, new: dict):
+    """Percent change per scenario for throughput and latency."""
+    def change(a, b):
+        return f"{(b - a) / a * 100:+.1f}%" if a and b is not None else "n/a"
+
+    result = {}
+    for name, cur in new["scenarios"].items():
+        prev = old["scenarios"].get(name)
+        if prev:
+            result[name] = {k: change(prev[k], cur[k])
+                            for k in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms")}
+    return {"baseline_commit": old["meta"].get("commit"), "changes": result}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots", type=int, default=2000)
+    parser.add_argument("--bookings", type=int, default=10000)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=8, help="workers per scenario")
+    parser.add_argument("--ws-clients", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIO_ROUTES), choices=list(SCENARIO_ROUTES))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the app's per-client rate limits (the load comes from one IP)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    if not args.rate_limit:
+        os.environ.setdefault("RATE_LIMIT_CHAT_PER_MINUTE", "0")
+        os.environ.setdefault("RATE_LIMIT_INTENT_PER_MINUTE", "0")
+    from app.database import migrate
+    migrate()
+    seed(args.slots, args.bookings)
+
+    results = asyncio.run(main(args))
+    if args.compare:
+        results["comparison"] = compare(json.loads(Path(args.compare).read_text()), results)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        Path(args.out).write_text(output)
+    print(output)
@@ -0,0 +1,153 @@
+"""Replayed requests with one Idempotency-Key must act exactly once.
+
+Drives the app in-process (httpx ASGI transport, no LLM: the booking form
+answers every turn locally). A chat session is brought to the last missing
+field, then N clients send the final turn at the same moment with the same
+key: half to /chat/stream, half to its /chat fallback. Afterwards N clients
+mark the booking paid with one key. Checks:
+
+- one booking, one confirmation email, one set of reminder jobs
+- one set of broadcasts per action on the admin topic (a reservation
+  sends slot_removed + booking_status_changed)
+- every client got the same booking id; all but one were replays
+
+With --no-key the same burst runs without keys, for comparison. Exits
+non-zero if any check fails.
+
+    python -m benchmarks.stress_idempotency --clients 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+
+def _result(response):
+    """The /chat body, or the `done` event of a /chat/stream response."""
+    if response.headers.get("content-type", "").startswith("text/event-stream"):
+        for block in response.text.split("\n\n"):
+            if block.startswith("data: "):
+                event = json.loads(block[6:])
+                if event.get("type") == "done":
+                    return event
+        return {}
+    return response.json()
+
+
+async def main(args) -> bool:
+    import httpx
+    from sqlalchemy import delete, func, select
+    from app.main import app
+    from app.database import (
+        AsyncSessionLocal, Booking, IdempotencyKey, OutboxEmail, ScheduledJob, Slot, async_engine,
+    )
+    from app.pubsub import backplane
+    from app.websocket_manager import TOPICS
+
+    day = date.today() + timedelta(days=2)
+    at = datetime(2000, 1, 1, 10).time()
+    async with AsyncSessionLocal() as db:
+        for model in (Booking, Slot, OutboxEmail, ScheduledJob, IdempotencyKey):
+            await db.execute(delete(model))
+        db.add(Slot(date=day, time=at, available=True))
+        await db.commit()
+    await backplane.start()
+
+    async def count(model):
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(select(func.count()).select_from(model))).scalar()
+
+    async def burst(paths, body, key):
+        headers = {"Idempotency-Key": key} if key else {}
+        start = asyncio.Event()
+
+        async def one(path):
+            await start.wait()
+            return await client.post(path, json=body, headers=headers)
+
+        tasks = [asyncio.create_task(one(p)) for p in paths]
+        await asyncio.sleep(0.05)
+        start.set()
+        responses = await asyncio.gather(*tasks)
+        await asyncio.sleep(0.1)   # let the backplane deliver
+        return responses
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=120) as client:
+        # Bring a session to "what's your email?" without the model
+        first = (await client.post("/chat", json={"message": f"I want {day} at 10:00"})).json()
+        sid = first["session_id"]
+        await client.post("/chat", json={"message": "Dana Kim", "session_id": sid})
+
+        admin = TOPICS["admin"]
+        seq0 = admin.seq
+        paths = ["/chat/stream" if i % 2 else "/chat" for i in range(args.clients)]
+        key = None if args.no_key else str(uuid.uuid4())
+        responses = await burst(paths, {"message": "dana@example.com", "session_id": sid}, key)
+        results = [_result(r) for r in responses]
+        booking_ids = Counter(r.get("booking_id") for r in results)
+        reserve = {
+            "status_codes": dict(Counter(r.status_code for r in responses)),
+            "outcomes": dict(Counter(r.get("status") for r in results)),
+            "distinct_booking_ids": len([b for b in booking_ids if b]),
+            "replayed": sum(r.headers.get("idempotent-replayed") == "true" for r in responses),
+            "bookings": await count(Booking),
+            "emails": await count(OutboxEmail),
+            "scheduled_jobs": await count(ScheduledJob),
+            "admin_broadcasts": admin.seq - seq0,
+        }
+
+        booking_id = next((b for b in booking_ids if b), None)
+        paid = None
+        if booking_id:
+            seq0 = admin.seq
+            responses = await burst([f"/api/bookings/{booking_id}/paid"] * args.clients, None,
+                                    None if args.no_key else f"paid-{booking_id}")
+            paid = {
+                "status_codes": dict(Counter(r.status_code for r in responses)),
+                "replayed": sum(r.headers.get("idempotent-replayed") == "true" for r in responses),
+                "admin_broadcasts": admin.seq - seq0,
+            }
+
+    await backplane.stop()
+    await async_engine.dispose()
+
+    ok = (
+        reserve["bookings"] == 1 and reserve["emails"] == 1
+        and reserve["admin_broadcasts"] == 2 and paid is not None and paid["admin_broadcasts"] == 1
+    )
+    if not args.no_key:
+        ok = ok and reserve["outcomes"] == {"reserved": args.clients} \
+            and reserve["distinct_booking_ids"] == 1 and reserve["replayed"] == args.clients - 1 \
+            and paid["replayed"] == args.clients - 1
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split("@")[-1],
+        "clients": args.clients,
+        "idempotency_key": not args.no_key,
+        "reserve": reserve,
+        "paid": paid,
+        "passed": ok,
+    }, indent=2))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--no-key", action="store_true", help="send the burst without Idempotency-Key")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("EMAIL_TRANSPORT", "fake")
+    os.environ.setdefault("PUBSUB_BACKEND", "memory")
+    # The burst and its setup turns come from one client; measure replays, not the limiter
+    os.environ.setdefault("RATE_LIMIT_CHAT_PER_MINUTE", "0")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from app.database import migrate
+    migrate()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
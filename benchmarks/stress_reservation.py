@@ -0,0 +1,79 @@
+"""Concurrent reservations for one slot must produce exactly one booking.
+
+Seeds a single future slot, then fires N simultaneous create_reservation
+calls (each on its own session, like N chat requests) and checks that
+exactly one succeeds, one booking exists and the slot is taken. Exits
+non-zero on a double booking.
+
+    python -m benchmarks.stress_reservation --clients 300
+    DATABASE_URL=postgresql://... python -m benchmarks.stress_reservation
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+
+async def main(args) -> bool:
+    from sqlalchemy import delete, func, select
+    from app.database import AsyncSessionLocal, Booking, Slot, async_engine
+    from app.helpers import create_reservation
+
+    day = date.today() + timedelta(days=1)
+    at = datetime(2000, 1, 1, 10).time()
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(Booking))
+        await db.execute(delete(Slot))
+        db.add(Slot(date=day, time=at, available=True))
+        await db.commit()
+
+    start = asyncio.Event()
+
+    async def attempt(i: int):
+        async with AsyncSessionLocal() as db:
+            await start.wait()
+            try:
+                booking = await create_reservation(
+                    db, customer_name=f"Racer {i}", service="Haircut", date=day, time=at,
+                )
+                return "won" if booking else "lost"
+            except Exception as e:
+                # e.g. SQLite "database is locked" under heavy write contention
+                return f"error: {type(e).__name__}"
+
+    tasks = [asyncio.create_task(attempt(i)) for i in range(args.clients)]
+    await asyncio.sleep(0.1)
+    start.set()
+    outcomes = Counter(await asyncio.gather(*tasks))
+
+    async with AsyncSessionLocal() as db:
+        bookings = (await db.execute(select(func.count()).select_from(Booking))).scalar()
+        available = (await db.execute(select(Slot.available))).scalar()
+    await async_engine.dispose()
+
+    ok = outcomes["won"] == 1 and bookings == 1 and available is False
+    print(json.dumps({
+        "database": os.environ["DATABASE_URL"].split("@")[-1],
+        "clients": args.clients,
+        "outcomes": dict(outcomes),
+        "bookings_written": bookings,
+        "slot_available_after": available,
+        "exactly_one_winner": ok,
+    }, indent=2))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=300)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    from app.database import migrate
+    migrate()
+    sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,102 @@
+"""Local stand-in for the OpenAI chat completions API.
+
+Replies after a fixed delay (plus an optional per-1000-prompt-characters
+"prefill" cost) so benchmarks can measure how the app behaves while LLM
+calls are in flight, without network access or API cost.
+
+    python -m benchmarks.stub_openai --port 8900 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+app.state.latency = 0.3
+app.state.reply = "other"
+app.state.per_kchar = 0.0
+app.state.calls = 0
+
+
+def _prefill_delay(body: dict) -> float:
+    chars = sum(len(m.get("content") or "") for m in body.get("messages", []))
+    return app.state.per_kchar * chars / 1000
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    app.state.calls += 1
+    if body.get("stream"):
+        return StreamingResponse(_stream(body), media_type="text/event-stream")
+    await asyncio.sleep(app.state.latency + _prefill_delay(body))
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": app.state.reply},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 1, "total_tokens": 1},
+    }
+
+
+async def _stream(body: dict):
+    """Same total latency as the plain reply, spread across word-sized chunks."""
+    words = app.state.reply.split(" ")
+    delay = app.state.latency / max(len(words), 1)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    await asyncio.sleep(_prefill_delay(body))
+    for i, word in enumerate(words):
+        await asyncio.sleep(delay)
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "delta": {"content": word if i == 0 else " " + word},
+                "finish_reason": None,
+            }],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def serve_in_thread(port: int = 8900, latency: float = 0.3, reply: str = "other",
+                    per_kchar: float = 0.0):
+    """Start the stub on a daemon thread and wait until it accepts requests."""
+    app.state.latency = latency
+    app.state.reply = reply
+    app.state.per_kchar = per_kchar
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--reply", default="other")
+    parser.add_argument("--per-kchar", type=float, default=0.0)
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.reply = args.reply
+    app.state.per_kchar = args.per_kchar
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -1,7 +1,15 @@
 const chat = document.getElementById("chat");
 const input = document.getElementById("userInput");
 const suggestions = document.getElementById("suggestions");
-const conversation = [];
+let sessionId = null;  // server keeps the conversation; we only send its id
+
+// One key per user message, reused by retries and the /chat fallback so a
+// turn can't book twice
+function newIdempotencyKey() {
+  return window.crypto && crypto.randomUUID
+    ? crypto.randomUUID()
+    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
 
 function scrollToBottom() {
   chat.scrollTop = chat.scrollHeight;
@@ -13,10 +21,6 @@ function appendMessage(text, sender = "bot") {
   div.textContent = text;
   chat.appendChild(div);
   scrollToBottom();
-
-  if (sender === "bot") conversation.push({ role: "assistant", content: text });
-  if (sender === "user") conversation.push({ role: "user", content: text });
-  if (conversation.length > 16) conversation.shift();
 }
 
 function quickAsk(text) {
@@ -48,22 +52,43 @@ async function sendMessage() {
     console.warn("Intent check failed", err);
   }
 
-  // loading indicator
+  await askAgent(text);
+}
+
+// ------------------------------
+// Agent round-trip: stream tokens over SSE, fall back to plain /chat
+// ------------------------------
+async function askAgent(text) {
   const loading = document.createElement("span");
   loading.className = "loading";
   loading.innerText = "⏳...";
   chat.appendChild(loading);
   scrollToBottom();
 
+  const key = newIdempotencyKey();
+  let data;
   try {
-    const res = await fetch("/chat", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message: text, history: conversation }),
-    });
-    const data = await res.json();
+    data = await streamChat(text, loading, key);
+  } catch (err) {
+    console.warn("Streaming failed, falling back", err);
+  }
+
+  try {
+    if (!data) {
+      const res = await fetch("/chat", {
+        method: "POST",
+        headers: { "Content-Type": "application/json", "Idempotency-Key": key },
+        body: JSON.stringify({ message: text, session_id: sessionId }),
+      });
+      data = res.ok ? await res.json() : await busyReply(res);
+    }
     loading.remove();
-    appendMessage(data.reply, "bot");
+    if (data.session_id) sessionId = data.session_id;
+    if (data.bubble) {
+      data.bubble.textContent = data.reply;
+    } else {
+      appendMessage(data.reply, "bot");
+    }
 
     if (data.status === "reserved") {
       appendMessage("✅ Your booking is confirmed! Check your email for details.", "bot");
@@ -74,10 +99,66 @@ async function sendMessage() {
   }
 }
 
+async function busyReply(res) {
+  const wait = res.headers.get("Retry-After");
+  const err = await res.json().catch(() => ({}));
+  const detail = err.detail || "Something went wrong, please try again.";
+  return { reply: "⚠️ " + detail + (wait ? ` (try again in ${wait}s)` : "") };
+}
+
+async function streamChat(text, loading, key) {
+  const res = await fetch("/chat/stream", {
+    method: "POST",
+    headers: { "Content-Type": "application/json", "Idempotency-Key": key },
+    body: JSON.stringify({ message: text, session_id: sessionId }),
+  });
+  // Rate limited / overloaded: the fallback would be turned away too
+  if (res.status === 429 || res.status === 503) return busyReply(res);
+  if (!res.ok || !res.body) return null;
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let bubble = null;
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const line = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+      if (!line.startsWith("data: ")) continue;
+      const event = JSON.parse(line.slice(6));
+
+      if (event.type === "token") {
+        if (!bubble) {
+          loading.remove();
+          bubble = document.createElement("div");
+          bubble.className = "msg bot";
+          chat.appendChild(bubble);
+        }
+        bubble.textContent += event.text;
+        scrollToBottom();
+      } else if (event.type === "done") {
+        return { ...event, bubble };
+      } else if (event.type === "error") {
+        throw new Error(event.detail);
+      }
+    }
+  }
+  return null;
+}
+
 async function showCalendar() {
   try {
-    const res = await fetch("/api/slots");
-    const slots = await res.json();
+    let slots = liveSlots;
+    if (!slots) {
+      const res = await fetch("/api/slots");
+      slots = await res.json();
+    }
     const cal = buildCalendar(slots);
     chat.appendChild(cal);
     scrollToBottom();
@@ -182,29 +263,9 @@ function showTimes(date, times, cal) {
 
 async function sendBooking(date, time) {
   if (time.length === 8) time = time.slice(0, 5);
-  appendMessage(`I want ${date} at ${time}`, "user");
-  const loading = document.createElement("span");
-  loading.className = "loading";
-  loading.innerText = "⏳...";
-  chat.appendChild(loading);
-  scrollToBottom();
-
-  try {
-    const res = await fetch("/chat", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ message: `I want ${date} at ${time}`, history: conversation }),
-    });
-    const data = await res.json();
-    loading.remove();
-    appendMessage(data.reply, "bot");
-    if (data.status === "reserved") {
-      appendMessage("✅ Your booking is confirmed! Check your email for details.", "bot");
-    }
-  } catch (err) {
-    loading.remove();
-    appendMessage("⚠️ Error: " + err.message, "bot");
-  }
+  const text = `I want ${date} at ${time}`;
+  appendMessage(text, "user");
+  await askAgent(text);
 }
 
 // ------------------------------
@@ -212,15 +273,37 @@ async function sendBooking(date, time) {
 // ------------------------------
 const protocol = window.location.protocol === "https:" ? "wss" : "ws";
 const ws = new WebSocket(`${protocol}://${window.location.host}/ws`);
+let liveSlots = null;  // kept current from deltas once the first snapshot lands
+let lastSeq = null;
+let epoch = null;
+
+function applySlotDelta(list, add) {
+  list.forEach(({ date, time }) => {
+    const times = new Set(liveSlots[date] || []);
+    add ? times.add(time) : times.delete(time);
+    if (times.size) liveSlots[date] = [...times].sort();
+    else delete liveSlots[date];
+  });
+}
+
+ws.onopen = () => ws.send(JSON.stringify({ type: "resync", since: -1 }));
 
 ws.onmessage = (event) => {
   const data = JSON.parse(event.data);
-  if (data.slots) {
-    console.log("🔄 Slots updated", data.slots);
-  }
-  if (data.bookings) {
-    console.log("🔄 Bookings updated", data.bookings);
+  if (data.type === "ping" || data.seq === undefined) return;
+  if (data.type === "snapshot") {
+    liveSlots = data.slots;
+    epoch = data.epoch;
+  } else {
+    if (lastSeq === null || data.seq <= lastSeq) return;
+    if (data.seq !== lastSeq + 1) {
+      ws.send(JSON.stringify({ type: "resync", since: lastSeq, epoch }));
+      return;
+    }
+    if (data.type === "slot_added") applySlotDelta(data.slots, true);
+    if (data.type === "slot_removed") applySlotDelta(data.slots, false);
   }
+  lastSeq = data.seq;
 };
 
 input.addEventListener("keypress", (e) => {
@@ -63,6 +63,42 @@ document.getElementById("slotForm").addEventListener("submit", async (e) => {
   }
 });
 
+// Bulk range form
+function bulkRange() {
+  return {
+    date_from: document.getElementById("bulkFrom").value,
+    date_to: document.getElementById("bulkTo").value,
+    open_time: document.getElementById("bulkOpen").value.slice(0, 5),
+    close_time: document.getElementById("bulkClose").value.slice(0, 5),
+    interval_minutes: Number(document.getElementById("bulkInterval").value) || 30,
+    weekdays: [...document.querySelectorAll("#bulkWeekdays input:checked")].map(c => Number(c.value)),
+  };
+}
+
+async function sendBulk(method) {
+  const res = await fetch("/api/slots/bulk", {
+    method,
+    headers: {"Content-Type": "application/json"},
+    body: JSON.stringify(bulkRange())
+  });
+  const data = await res.json().catch(() => ({}));
+  if (!res.ok) {
+    alert("⚠️ Could not update slots: " + (data.detail || res.statusText));
+  } else if (method === "POST") {
+    alert(`✅ ${data.created} slots added, ${data.skipped} already existed`);
+  } else {
+    alert(`🗑️ ${data.deleted} slots removed, ${data.skipped} booked or missing`);
+  }
+}
+
+document.getElementById("bulkForm").addEventListener("submit", (e) => {
+  e.preventDefault();
+  sendBulk("POST");
+});
+document.getElementById("bulkDelete").addEventListener("click", () => {
+  if (document.getElementById("bulkForm").reportValidity()) sendBulk("DELETE");
+});
+
 // Slot + Booking actions
 async function deleteSlot(date, time) {
   const res = await fetch(`/api/slots?date=${date}&time=${time}`, { method: "DELETE" });
@@ -71,15 +107,40 @@ async function deleteSlot(date, time) {
     alert("⚠️ Could not delete slot: " + (err.detail || res.statusText));
   }
 }
+// One key per click, reused only when that same request is retried after a
+// network error; a click while the first is still in flight joins it
+function newIdempotencyKey() {
+  return window.crypto && crypto.randomUUID
+    ? crypto.randomUUID()
+    : Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+const pendingActions = new Map();
+
+function bookingAction(id, action) {
+  const name = `${action}-${id}`;
+  if (pendingActions.has(name)) return pendingActions.get(name);
+  const key = newIdempotencyKey();
+  const send = () => fetch(`/api/bookings/${id}/${action}`, {
+    method: "POST",
+    headers: { "Idempotency-Key": key },
+  });
+  const request = send()
+    .catch(() => send())
+    .finally(() => pendingActions.delete(name));
+  pendingActions.set(name, request);
+  return request;
+}
+
 async function cancelBooking(id) {
-  const res = await fetch(`/api/bookings/${id}/cancel`, { method: "POST" });
-  if (!res.ok) {
+  const res = await bookingAction(id, "cancel").catch(() => null);
+  if (!res || !res.ok) {
     alert("⚠️ Could not cancel booking");
   }
 }
 async function markPaid(id) {
-  const res = await fetch(`/api/bookings/${id}/paid`, { method: "POST" });
-  if (!res.ok) {
+  const res = await bookingAction(id, "paid").catch(() => null);
+  if (!res || !res.ok) {
     alert("⚠️ Could not mark booking paid");
   }
 }
@@ -89,28 +150,67 @@ function updateTimestamp() {
   lastUpdated.innerText = "Last updated: " + new Date().toLocaleTimeString();
 }
 
+// ------------------------------
+// Live state: snapshot + versioned deltas
+// ------------------------------
+let slotsState = {};
+let bookingsState = [];
+let lastSeq = null;  // null until the first snapshot arrives
+let epoch = null;    // which server numbered our seqs
+
+function applySlots(list, add) {
+  list.forEach(({ date, time }) => {
+    const times = new Set(slotsState[date] || []);
+    add ? times.add(time) : times.delete(time);
+    if (times.size) slotsState[date] = [...times].sort();
+    else delete slotsState[date];
+  });
+  slotsState = Object.fromEntries(Object.entries(slotsState).sort());
+}
+
+function applyBooking(booking) {
+  bookingsState = bookingsState.filter(b => b.id !== booking.id);
+  if (booking.status !== "pending") bookingsState.push(booking);  // same filter as /api/bookings
+}
+
+function applyEvent(data) {
+  if (data.type === "snapshot") {
+    slotsState = data.slots;
+    bookingsState = data.bookings;
+    epoch = data.epoch;
+  } else if (data.type === "slot_added") {
+    applySlots(data.slots, true);
+  } else if (data.type === "slot_removed") {
+    applySlots(data.slots, false);
+  } else if (data.type === "booking_status_changed") {
+    applyBooking(data.booking);
+  }
+  lastSeq = data.seq;
+  renderSlots(slotsState);
+  renderBookings(bookingsState);
+  updateTimestamp();
+}
+
 // WebSocket connection
 const protocol = window.location.protocol === "https:" ? "wss" : "ws";
-const ws = new WebSocket(`${protocol}://${window.location.host}/ws`);
+const ws = new WebSocket(`${protocol}://${window.location.host}/ws/dashboard`);
+
+function resync() {
+  ws.send(JSON.stringify({ type: "resync", since: lastSeq ?? -1, epoch }));
+}
 
 ws.onmessage = (event) => {
   const data = JSON.parse(event.data);
-  if (data.slots) renderSlots(data.slots);
-  if (data.bookings) renderBookings(data.bookings);
-  updateTimestamp();
+  if (data.type === "ping" || data.seq === undefined) return;
+  if (data.type !== "snapshot") {
+    if (lastSeq === null || data.seq <= lastSeq) return;  // not synced yet / already applied
+    if (data.seq !== lastSeq + 1) return resync();        // missed something
+  }
+  applyEvent(data);
 };
 
-ws.onopen = () => console.log("✅ Connected to live updates");
+ws.onopen = () => {
+  console.log("✅ Connected to live updates");
+  resync();
+};
 ws.onclose = () => console.log("❌ Disconnected from live updates");
-
-// Initial load
-async function initialLoad() {
-  const slotsRes = await fetch("/api/slots?ts=" + Date.now(), { cache: "no-store" });
-  renderSlots(await slotsRes.json());
-
-  const bookingsRes = await fetch("/api/bookings?ts=" + Date.now(), { cache: "no-store" });
-  renderBookings(await bookingsRes.json());
-
-  updateTimestamp();
-}
-initialLoad();